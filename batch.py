@@ -0,0 +1,89 @@
+import time
+
+import dropbox
+
+
+# The batch endpoints accept at most this many entries per call
+MAX_BATCH_SIZE = 1000
+
+
+class BatchResult:
+
+    def __init__(self, path, metadata=None, error=None):
+        self.path = path
+        self.metadata = metadata
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _wait(launch, check, poll_interval):
+    """
+    Resolve a batch launch to its completed result, polling the async job
+    until it finishes.  A job that fails, or reports a status this client
+    doesn't know, raises DropboxException.
+    """
+    if launch.is_complete():
+        return launch.get_complete()
+    if not launch.is_async_job_id():
+        raise dropbox.exceptions.DropboxException('Unexpected batch launch result: {}'.format(launch))
+    job_id = launch.get_async_job_id()
+    while True:
+        status = check(job_id)
+        if status.is_complete():
+            return status.get_complete()
+        if hasattr(status, 'is_failed') and status.is_failed():
+            raise dropbox.exceptions.DropboxException('Batch job {} failed: {}'.format(job_id, status.get_failed()))
+        if not status.is_in_progress():
+            raise dropbox.exceptions.DropboxException('Batch job {} ended with status {}'.format(job_id, status))
+        time.sleep(poll_interval)
+
+
+def _chunks(items):
+    for start in range(0, len(items), MAX_BATCH_SIZE):
+        yield items[start:start + MAX_BATCH_SIZE]
+
+
+def delete_batch(client, paths, poll_interval=0.5):
+    """
+    Delete `paths` with files_delete_batch and return a BatchResult per path.
+    """
+    results = []
+    for chunk in _chunks(list(paths)):
+        launch = client.files_delete_batch([dropbox.files.DeleteArg(path) for path in chunk])
+        entries = _wait(launch, client.files_delete_batch_check, poll_interval).entries
+        for path, entry in zip(chunk, entries):
+            if entry.is_success():
+                results.append(BatchResult(path, metadata=entry.get_success().metadata))
+            else:
+                results.append(BatchResult(path, error=entry.get_failure()))
+    return results
+
+
+def _relocate_batch(launch_batch, check, pairs, poll_interval):
+    results = []
+    for chunk in _chunks(list(pairs)):
+        launch = launch_batch([dropbox.files.RelocationPath(from_path, to_path) for from_path, to_path in chunk])
+        entries = _wait(launch, check, poll_interval).entries
+        for (from_path, _), entry in zip(chunk, entries):
+            if entry.is_success():
+                results.append(BatchResult(from_path, metadata=entry.get_success()))
+            else:
+                results.append(BatchResult(from_path, error=entry.get_failure()))
+    return results
+
+
+def move_batch(client, pairs, poll_interval=0.5):
+    """
+    Move each (from_path, to_path) pair with files_move_batch_v2.
+    """
+    return _relocate_batch(client.files_move_batch_v2, client.files_move_batch_check_v2, pairs, poll_interval)
+
+
+def copy_batch(client, pairs, poll_interval=0.5):
+    """
+    Copy each (from_path, to_path) pair with files_copy_batch_v2.
+    """
+    return _relocate_batch(client.files_copy_batch_v2, client.files_copy_batch_check_v2, pairs, poll_interval)
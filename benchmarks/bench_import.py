@@ -0,0 +1,64 @@
+"""
+Time loading a generated account listing with `-f` in each listing format,
+parsed in one process and in a pool.
+
+    python -m benchmarks.bench_import [-n COUNT] [--shape SHAPE] [-j JOBS] [-f FORMAT ...]
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import SHAPES, generate
+from listing import FORMATS, load_listing
+
+MODIFIED = '2020-01-02T03:04:05Z'
+
+
+def write_listing(path, fmt, listing):
+    with open(path, 'w', newline='') as f:
+        if fmt == 'text':
+            for node_path, is_folder, _ in listing:
+                f.write(node_path + ('/\n' if is_folder else '\n'))
+        elif fmt == 'jsonl':
+            for idx, (node_path, is_folder, size) in enumerate(listing):
+                record = {'path': node_path, 'type': 'folder', 'id': 'id:{}'.format(idx)}
+                if not is_folder:
+                    record.update(type='file', size=size, modified=MODIFIED)
+                f.write(json.dumps(record) + '\n')
+        else:
+            writer = csv.writer(f)
+            writer.writerow(('path', 'type', 'size', 'modified', 'id'))
+            for idx, (node_path, is_folder, size) in enumerate(listing):
+                if is_folder:
+                    writer.writerow((node_path, 'folder', '', '', 'id:{}'.format(idx)))
+                else:
+                    writer.writerow((node_path, 'file', size, MODIFIED, 'id:{}'.format(idx)))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmarks.bench_import')
+    parser.add_argument('-n', '--count', type=int, default=1000000, help='Files in the generated account')
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='realistic', help='Account shape')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Processes for the parallel run')
+    parser.add_argument('-f', '--format', nargs='*', choices=FORMATS, default=FORMATS, help='Listing formats')
+    args = parser.parse_args()
+    listing = list(generate(args.shape, args.count))
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.format:
+            path = os.path.join(tmp, 'listing.' + fmt)
+            write_listing(path, fmt, listing)
+            mb = os.path.getsize(path) / (1 << 20)
+            for workers in sorted({1, args.jobs}):
+                start = time.perf_counter()
+                tree = load_listing(path, fmt=fmt, workers=workers)
+                seconds = time.perf_counter() - start
+                print('{:<6} {:>7.1f} MB  {} job(s)  {:>6.2f}s  {:>9.0f} rows/s  {} files'.format(
+                    fmt, mb, workers, seconds, len(listing) / seconds, tree.total_files))
+                del tree
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Time the initial account listing against a fake client that sleeps on every
+listing call, comparing one recursive cursor with per-folder shards.
+
+    python -m benchmarks.bench_listing [-n COUNT] [-f FOLDERS] [--latency SECONDS] [-j WORKERS]
+"""
+import argparse
+import time
+
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from utils import DropboxUtils
+
+
+def account(count, folders):
+    """
+    Entries of an account with `count` files spread over `folders` top-level
+    folders, in recursive listing order.
+    """
+    entries = []
+    per_folder = -(-count // folders)
+    for folder in range(folders):
+        entries.append(folder_entry('/top{}'.format(folder)))
+        for idx in range(min(per_folder, count - folder * per_folder)):
+            entries.append(file_entry('/top{}/file_{}.txt'.format(folder, idx), size=idx))
+    return entries
+
+
+def paged(entries, page_size):
+    return [entries[start:start + page_size] for start in range(0, len(entries), page_size)]
+
+
+def timed(dbutil):
+    start = time.perf_counter()
+    tree = dbutil.get_tree()
+    return time.perf_counter() - start, tree.total_files
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_listing')
+    parser.add_argument('-n', '--count', type=int, default=100000, help='Number of files')
+    parser.add_argument('-f', '--folders', type=int, default=16, help='Number of top-level folders')
+    parser.add_argument('-p', '--page-size', type=int, default=2000, help='Entries per listing page')
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds per listing call')
+    parser.add_argument('-j', '--workers', type=int, default=8, help='Concurrent shards')
+    args = parser.parse_args()
+    entries = account(args.count, args.folders)
+    runs = (('sequential', 1), ('sharded x{}'.format(args.workers), args.workers))
+    for name, workers in runs:
+        client = FakeDropboxClient(paged(entries, args.page_size), list_latency=args.latency, page_size=args.page_size)
+        elapsed, files = timed(DropboxUtils(client=client, list_workers=workers))
+        print('{:<16} {:>8.2f}s  {:>4} calls  {:>9,} files'.format(name, elapsed, len(client.calls), files))
+
+
+if __name__ == '__main__':
+    main()
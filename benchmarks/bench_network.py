@@ -0,0 +1,57 @@
+"""
+Time listing and downloading a synthetic account through the real SDK and
+HTTP stack, against the local fake Dropbox server.
+
+    python -m benchmarks.bench_network [-n COUNT] [--latency SECONDS] [--rate-limit-every N] [--fail-every N]
+
+Reports wall time, requests served and the 429/500 responses injected, which
+the SDK retries.
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.fake_server import FakeDropboxServer, synthetic_client
+from transfer import DownloadScheduler
+from transport import Transport
+from utils import DropboxUtils
+
+
+def run(name, server, func):
+    before = dict(server.stats)
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    delta = {key: server.stats.get(key, 0) - before.get(key, 0) for key in ('requests', 'rate_limited', 'failed')}
+    print('{:<20} {:>8.2f}s  {:>6} requests  {:>4} rate limited  {:>4} failed'.format(
+        name, elapsed, delta['requests'], delta['rate_limited'], delta['failed']))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_network')
+    parser.add_argument('-n', '--count', type=int, default=20000, help='Files in the account')
+    parser.add_argument('--shape', default='realistic', help='Account shape')
+    parser.add_argument('--page-size', type=int, default=2000, help='Entries per listing page')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every request')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='Answer every Nth request with a 429')
+    parser.add_argument('--fail-every', type=int, default=0, help='Answer every Nth request with a 500')
+    parser.add_argument('-j', '--workers', type=int, default=8, help='Concurrent shards and downloads')
+    parser.add_argument('--downloads', type=int, default=200, help='Files to download')
+    args = parser.parse_args()
+    client = synthetic_client(args.shape, args.count, page_size=args.page_size, with_contents=True)
+    with FakeDropboxServer(client, latency=args.latency, rate_limit_every=args.rate_limit_every,
+                           fail_every=args.fail_every) as server:
+        transport = Transport('token', base_url=server.url, pool_size=args.workers, max_concurrency=args.workers)
+        run('list sequential', server, lambda: DropboxUtils(transport=transport).get_tree())
+        run('list sharded x{}'.format(args.workers), server,
+            lambda: DropboxUtils(transport=transport, list_workers=args.workers).get_tree())
+        paths = sorted(client.contents)[:args.downloads]
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [(path, '{}/{}'.format(tmp, idx)) for idx, path in enumerate(paths)]
+            run('download x{}'.format(args.workers), server,
+                lambda: DownloadScheduler(transport.client, workers=args.workers).run(jobs))
+        transport.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure cold-start import cost of the offline (-f) and online modes with
+`python -X importtime`, and check that the offline mode loads nothing from
+the Dropbox SDK.
+
+    python -m benchmarks.bench_startup [-r RUNS] [--top N] [--max-offline-ms MS]
+
+Exits non-zero if the offline mode imports the SDK or, with --max-offline-ms,
+if its median import time is over the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'offline': 'import main',
+    'online': 'import main, authenticate, dropbox_cli, lazy_tree, transport, utils, watcher',
+}
+
+
+def importtime(statement, baseline=()):
+    """
+    Run `statement` in a fresh interpreter and return {module: cumulative µs}
+    together with the total for the top-level imports, leaving out those in
+    `baseline` (what the bare interpreter imports at startup).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that triggered them
+        nested = name.startswith('  ')
+        name = name.strip()
+        modules[name] = int(cumulative)
+        if not nested and name not in baseline:
+            total += int(cumulative)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_startup')
+    parser.add_argument('-r', '--runs', type=int, default=5, help='Fresh interpreters per mode')
+    parser.add_argument('--top', type=int, default=8, help='Heaviest imports to list per mode')
+    parser.add_argument('--max-offline-ms', type=float, default=None, help='Fail if offline imports take longer')
+    args = parser.parse_args()
+    failed = False
+    baseline = set(importtime('pass')[0])
+    for mode, statement in MODES.items():
+        runs = [importtime(statement, baseline) for _ in range(args.runs)]
+        median = statistics.median(total for _, total in runs) / 1000
+        modules = {name: us for name, us in runs[-1][0].items() if name not in baseline}
+        sdk = sorted(_ for _ in modules if _ == 'dropbox' or _.startswith('dropbox.'))
+        print('{:<8} {:>8.1f} ms median over {} runs, {} modules, {} from the SDK'.format(
+            mode, median, args.runs, len(modules), len(sdk)))
+        for name, us in sorted(modules.items(), key=lambda _: -_[1])[:args.top]:
+            print('    {:<32} {:>8.1f} ms'.format(name, us / 1000))
+        if mode == 'offline' and sdk:
+            print('offline mode imports the Dropbox SDK')
+            failed = True
+        if mode == 'offline' and args.max_offline_ms is not None and median > args.max_offline_ms:
+            print('offline imports over budget of {} ms'.format(args.max_offline_ms))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare the SQLite tree store with the in-memory PathTree on a generated
+account: time to load, memory held once loaded, and the shell's lookups.
+
+    python -m benchmarks.bench_store [-n COUNT] [--shape SHAPE] [--cache-size N]
+
+Memory is measured with tracemalloc, so it counts Python objects (the store's
+node cache, not SQLite's page cache).
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.suite import build, widest_folder
+from benchmarks.synthetic import SHAPES, generate
+from meta import FileMeta, FolderMeta
+from tree_fs import TreeFS
+from tree_store import CACHE_SIZE, TreeStore
+
+
+def lookups(root, paths, widest):
+    """
+    The shell's read paths: find_path, ls of the widest folder, search and du.
+    """
+    timings = {}
+    start = time.perf_counter()
+    for path in paths:
+        root.find_path(path)
+    timings['find_path'] = (time.perf_counter() - start) / len(paths)
+    folder = root.find_path(widest)
+    start = time.perf_counter()
+    list(TreeFS(root)._ls(folder))
+    timings['ls widest'] = time.perf_counter() - start
+    # The first substring search also builds the name index
+    for label in ('first search', 'search'):
+        start = time.perf_counter()
+        root.search('report')
+        timings[label] = time.perf_counter() - start
+    start = time.perf_counter()
+    list(TreeFS(root)._du(root, depth=1))
+    timings['du'] = time.perf_counter() - start
+    return timings
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    root = load()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return root, seconds, held
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmarks.bench_store')
+    parser.add_argument('-n', '--count', type=int, default=200000, help='Files in the generated account')
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='realistic', help='Account shape')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Nodes the store keeps in memory')
+    args = parser.parse_args()
+    listing = list(generate(args.shape, args.count))
+    paths = random.Random(0).sample([_[0] for _ in listing], min(2000, len(listing)))
+    tree = build(listing)
+    widest = widest_folder(tree).get_path()
+    del tree
+
+    def entries():
+        return ((path, FolderMeta() if is_folder else FileMeta(size=size)) for path, is_folder, size in listing)
+
+    def load_store():
+        store = TreeStore(db_path, cache_size=args.cache_size, reset=True)
+        store.bulk_insert(entries())
+        return store.root
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'tree.db')
+        results = [('PathTree', *measure(lambda: build(listing)))]
+        results.append(('TreeStore', *measure(load_store)))
+        size = sum(os.path.getsize(_) for _ in (db_path, db_path + '-wal') if os.path.exists(_))
+        print('{} entries ({} shape), store database {:.1f} MB'.format(len(listing), args.shape, size / (1 << 20)))
+        for name, root, seconds, held in results:
+            print('{:<10} load {:>7.2f}s  held {:>8.1f} MB'.format(name, seconds, held / (1 << 20)))
+            for op, op_seconds in lookups(root, paths, widest).items():
+                print('    {:<12} {:>10.3f} ms'.format(op, op_seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
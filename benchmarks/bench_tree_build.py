@@ -0,0 +1,65 @@
+"""
+Time building a PathTree from a listing.
+
+Compares the old insert_path + find_path pattern against bulk_insert.
+
+    python -m benchmarks.bench_tree_build [-n COUNT]
+"""
+import argparse
+import time
+
+from tree import PathTree
+
+
+def listing(count, fanout=100):
+    """
+    Yield `count` file paths ordered the way a recursive folder listing
+    returns them: each folder followed by a run of its files.
+    """
+    emitted = 0
+    folder = 0
+    while emitted < count:
+        base = '/f{}/g{}'.format(folder // fanout, folder % fanout)
+        for idx in range(min(fanout, count - emitted)):
+            yield '{}/file_{}.txt'.format(base, idx)
+            emitted += 1
+        folder += 1
+
+
+def meta():
+    return {'type': 'file', 'id': '', 'modified': '', 'size': 0}
+
+
+def build_insert_then_find(paths):
+    tree = PathTree(root=True)
+    for path in paths:
+        tree.insert_path(path)
+        node = tree.find_path(path)
+        node.meta = meta()
+    return tree
+
+
+def build_bulk(paths):
+    tree = PathTree(root=True)
+    tree.bulk_insert((path, meta()) for path in paths)
+    return tree
+
+
+def timed(func, paths):
+    start = time.perf_counter()
+    func(paths)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_tree_build')
+    parser.add_argument('-n', '--count', type=int, default=1000000, help='Number of paths')
+    args = parser.parse_args()
+    paths = list(listing(args.count))
+    for name, func in (('insert_path + find_path', build_insert_then_find), ('bulk_insert', build_bulk)):
+        elapsed = timed(func, paths)
+        print('{:<24} {:>8.2f}s  {:>12,.0f} paths/s'.format(name, elapsed, len(paths) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
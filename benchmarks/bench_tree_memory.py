@@ -0,0 +1,100 @@
+"""
+Report the memory cost per PathTree node.
+
+"before" rebuilds the tree with the previous node layout (instance __dict__,
+a children list and child index dict on every node, dict metadata); "after"
+uses PathTree with slots, interned names and FileMeta/FolderMeta records.
+
+    python -m benchmarks.bench_tree_memory [-n COUNT]
+"""
+import argparse
+from datetime import datetime
+import gc
+import tracemalloc
+
+from benchmarks.bench_tree_build import listing
+from meta import FileMeta, FolderMeta
+from tree import PathTree
+
+
+class DictNode:
+    """The node layout PathTree used before it was slotted."""
+
+    def __init__(self, val):
+        self.value = val
+        self.children = []
+        self.child_index = dict()
+        self.parent = None
+        self.meta = dict()
+
+    def add(self, name):
+        node = self.child_index.get(name)
+        if node is None:
+            node = DictNode(name)
+            node.parent = self
+            self.children.append(node)
+            self.child_index[name] = node
+        return node
+
+
+MODIFIED = datetime(2017, 1, 1)
+
+
+def build_before(paths):
+    root = DictNode('/')
+    for idx, path in enumerate(paths):
+        node = root
+        parts = path.split('/')[1:]
+        for part in parts[:-1]:
+            node = node.add(part)
+            if not node.meta:
+                node.meta = {'type': 'folder', 'id': 'id:{}'.format(part)}
+        node = node.add(parts[-1])
+        node.meta = {'type': 'file', 'id': 'id:{}'.format(idx), 'modified': MODIFIED, 'size': idx}
+    return root
+
+
+def build_after(paths):
+    root = PathTree(root=True)
+    for idx, path in enumerate(paths):
+        head, _, name = path.rpartition('/')
+        parent = root.insert_path(head)
+        if not parent.meta:
+            parent.meta = FolderMeta(id='id:{}'.format(parent.value))
+        node = parent.insert_path(name)
+        node.meta = FileMeta(id='id:{}'.format(idx), modified=MODIFIED, size=idx)
+    return root
+
+
+def count_nodes(root):
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def measure(func, paths):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    root = func(paths)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, count_nodes(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_tree_memory')
+    parser.add_argument('-n', '--count', type=int, default=200000, help='Number of file paths')
+    args = parser.parse_args()
+    # Fresh strings per path, as a listing would deliver them
+    paths = [''.join(_) for _ in listing(args.count)]
+    for name, func in (('before', build_before), ('after', build_after)):
+        used, nodes = measure(func, paths)
+        print('{:<8} {:>10,} nodes  {:>14,} bytes  {:>8.1f} bytes/node'.format(name, nodes, used, used / nodes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+A local HTTP stand-in for the Dropbox API, for exercising the network path
+offline.
+
+The account lives in a fakes.FakeDropboxClient; the server decodes each
+request with the SDK's own route definitions, calls the client method of the
+same name and encodes the result (or route error) the way Dropbox does, so a
+real dropbox.Dropbox pointed at it through transport.Transport(base_url=...)
+runs unchanged.  Every route the fake client implements is served: listing
+with paging and cursors, longpoll, downloads with Range, upload sessions and
+the batch endpoints.
+
+Every request waits `latency` seconds.  Every `rate_limit_every`-th request is
+answered with a 429 asking to retry after `retry_after` seconds, and every
+`fail_every`-th with a 500, so retry behaviour can be measured.
+
+    python -m benchmarks.fake_server [-n COUNT] [--shape SHAPE] [--latency SECONDS] [--page-size N]
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import inspect
+import json
+import socket
+import threading
+import time
+
+from dropbox import files, stone_serializers
+from dropbox.exceptions import ApiError, HttpError
+
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from benchmarks.synthetic import SHAPES, generate
+
+
+def _routes(client):
+    """
+    Map URL paths to (route, client method) for every files route the client
+    implements.
+    """
+    routes = {}
+    for route in files.ROUTES.values():
+        name = route.name + ('_v{}'.format(route.version) if route.version > 1 else '')
+        method = getattr(client, 'files_' + name.replace('/', '_'), None)
+        if method is not None:
+            routes['/2/files/' + name] = (route, method)
+    return routes
+
+
+class FakeDropboxHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        count = server.count_request(self.path)
+        entry = server.routes.get(self.path)
+        if entry is None:
+            return self._send(400, b'Unknown route: ' + self.path.encode(), 'text/plain')
+        time.sleep(server.latency)
+        if server.rate_limit_every and count % server.rate_limit_every == 0:
+            server.count('rate_limited')
+            error = {'reason': {'.tag': 'too_many_requests'}, 'retry_after': server.retry_after}
+            return self._send_json(429, {'error_summary': 'too_many_requests/', 'error': error})
+        if server.fail_every and count % server.fail_every == 0:
+            server.count('failed')
+            return self._send(500, b'Injected failure', 'text/plain')
+        route, method = entry
+        style = route.attrs['style'] or 'rpc'
+        raw_arg = body.decode() if style == 'rpc' else self.headers['Dropbox-API-Arg']
+        kwargs = self._arguments(route, method, raw_arg)
+        if style == 'upload':
+            kwargs['f'] = body
+        if style == 'download' and self.headers.get('Range'):
+            kwargs['extra_headers'] = {'Range': self.headers['Range']}
+        try:
+            result = method(**kwargs)
+        except ApiError as e:
+            error = stone_serializers.json_compat_obj_encode(route.error_type, e.error)
+            return self._send_json(409, {'error_summary': str(e.error), 'error': error})
+        except HttpError as e:
+            return self._send(e.status_code, str(e.body).encode(), 'text/plain')
+        if style == 'download':
+            return self._send_download(route, *result)
+        self._send(200, stone_serializers.json_encode(route.result_type, result).encode(), 'application/json')
+
+    @staticmethod
+    def _arguments(route, method, raw_arg):
+        arg = stone_serializers.json_decode(route.arg_type, raw_arg)
+        accepted = inspect.signature(method).parameters
+        return {name: getattr(arg, name) for name in type(arg)._all_field_names_ if name in accepted}
+
+    def _send_download(self, route, metadata, response):
+        content = response.content
+        self.send_response(response.status_code)
+        self.send_header('Dropbox-API-Result', stone_serializers.json_encode(route.result_type, metadata))
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if response.drop_after is None:
+            self.wfile.write(content)
+            return
+        # Lose the connection part way through the body
+        self.wfile.write(content[:response.drop_after])
+        self.wfile.flush()
+        self.close_connection = True
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, payload, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeDropboxServer(ThreadingHTTPServer):
+    """
+    Serve `client` (a FakeDropboxClient) over HTTP on `address`.  Use as a
+    context manager, or call start() and stop(); `url` is the base_url to give
+    transport.Transport.
+    """
+    daemon_threads = True
+
+    def __init__(self, client=None, address=('127.0.0.1', 0), latency=0, rate_limit_every=0, fail_every=0,
+                 retry_after=0):
+        super().__init__(address, FakeDropboxHandler)
+        self.client = client if client is not None else FakeDropboxClient()
+        self.routes = _routes(self.client)
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+            return self.stats[key]
+
+    def process_request(self, request, client_address):
+        self.count('connections')
+        super().process_request(request, client_address)
+
+    def count_request(self, path):
+        self.count(path)
+        return self.count('requests')
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.01,), name='fake-dropbox', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_client(shape, count, page_size=2000, seed=0, with_contents=False):
+    """
+    A FakeDropboxClient holding a generated account, paged `page_size` entries
+    at a time.  With `with_contents`, every file can also be downloaded.
+    """
+    entries, contents = [], {}
+    for path, is_folder, size in generate(shape, count, seed=seed):
+        if is_folder:
+            entries.append(folder_entry(path))
+            continue
+        entries.append(file_entry(path, size=size))
+        if with_contents:
+            contents[path] = bytes(min(size, 1 << 16))
+    pages = [entries[start:start + page_size] for start in range(0, len(entries), page_size)] or [[]]
+    return FakeDropboxClient(pages, contents=contents, page_size=page_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmarks.fake_server')
+    parser.add_argument('-n', '--count', type=int, default=10000, help='Files in the generated account')
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='realistic', help='Account shape')
+    parser.add_argument('--page-size', type=int, default=2000, help='Entries per listing page')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to every request')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='Answer every Nth request with a 429')
+    parser.add_argument('--fail-every', type=int, default=0, help='Answer every Nth request with a 500')
+    parser.add_argument('--retry-after', type=int, default=1, help='Seconds the 429 responses ask clients to wait')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='Port to listen on')
+    args = parser.parse_args()
+    client = synthetic_client(args.shape, args.count, page_size=args.page_size, with_contents=True)
+    server = FakeDropboxServer(
+        client, address=('127.0.0.1', args.port), latency=args.latency,
+        rate_limit_every=args.rate_limit_every, fail_every=args.fail_every, retry_after=args.retry_after,
+    )
+    print('Serving a fake Dropbox account at {}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+from datetime import datetime
+import hashlib
+import io
+import threading
+import time
+import zipfile
+
+from dropbox import files
+from dropbox.exceptions import ApiError, HttpError
+import requests
+
+
+def content_rev(content):
+    """
+    The revision the fake reports for a file holding `content`.
+    """
+    return hashlib.sha1(content).hexdigest()[:16]
+
+
+def file_entry(path, size=0, file_id=None, content_hash=None, rev=None):
+    return files.FileMetadata(
+        name=path.rsplit('/', 1)[-1],
+        id=file_id or 'id:{}'.format(path),
+        client_modified=datetime(2017, 1, 1),
+        server_modified=datetime(2017, 1, 1),
+        rev=rev or '0123456789abc',
+        size=size,
+        path_lower=path.lower(),
+        path_display=path,
+        content_hash=content_hash,
+    )
+
+
+def folder_entry(path, folder_id=None):
+    return files.FolderMetadata(
+        name=path.rsplit('/', 1)[-1],
+        id=folder_id or 'id:{}'.format(path),
+        path_lower=path.lower(),
+        path_display=path,
+    )
+
+
+def deleted_entry(path):
+    return files.DeletedMetadata(
+        name=path.rsplit('/', 1)[-1],
+        path_lower=path.lower(),
+        path_display=path,
+    )
+
+
+class FakeResponse:
+    """
+    The parts of requests.Response that downloads read.
+    """
+
+    def __init__(self, content, status_code=200, drop_after=None):
+        self.content = content
+        self.status_code = status_code
+        self.drop_after = drop_after
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for idx in range(0, len(self.content), chunk_size):
+            if self.drop_after is not None and idx >= self.drop_after:
+                raise requests.exceptions.ConnectionError('connection dropped')
+            yield self.content[idx:idx + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDropboxClient:
+    """
+    Stand-in for dropbox.Dropbox that serves scripted listing pages.
+
+    `pages` is a list of entry lists; the recursive listing of the root returns
+    them in order with cursors of the form 'cursor-<n>', while listings of other
+    paths, or non-recursive ones, return the matching entries `page_size` at a
+    time (all at once by default).  Every listing call takes `list_latency`
+    seconds.  Appending to `pages` after a listing
+    scripts the changes seen by continuing from its final cursor, and cursors
+    in `expired` fail the way Dropbox reports a reset cursor.  Each longpoll
+    call releases the next batch from `longpoll_batches` as a new page.
+
+    `contents` maps paths to the bytes served by downloads, each of which
+    takes `latency` seconds; paths in `failing` raise instead.  Downloads
+    report content_rev of the bytes as the revision and honour Range headers;
+    asking for any other `rev` fails as if it were gone.  Paths in `drops` map
+    to the byte count after which the next download of that path loses its
+    connection.  Committed
+    uploads are added to `contents`, and the delete, move and copy batch
+    endpoints act on it too.  With `async_batches` set, batches launch as
+    async jobs that report in progress once before completing.
+    """
+
+    def __init__(self, pages=None, longpoll_batches=None, contents=None, latency=0, list_latency=0, page_size=None):
+        self.pages = pages or [[]]
+        self.longpoll_batches = list(longpoll_batches or [])
+        self.contents = contents or {}
+        self.latency = latency
+        self.list_latency = list_latency
+        self.page_size = page_size
+        self._listings = {}
+        self.expired = set()
+        self.failing = set()
+        self.drops = {}
+        self.sessions = {}
+        self.async_batches = False
+        self.jobs = {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _page(self, idx):
+        return files.ListFolderResult(
+            entries=self.pages[idx],
+            cursor='cursor-{}'.format(idx + 1),
+            has_more=idx + 1 < len(self.pages),
+        )
+
+    def files_list_folder(self, path, recursive=False):
+        self.calls.append(('files_list_folder', path, recursive))
+        time.sleep(self.list_latency)
+        if path or not recursive:
+            return self._list_path(path.lower(), recursive, 0)
+        return self._page(0)
+
+    def _list_path(self, path, recursive, offset):
+        # The entries of every scripted page below `path`, `page_size` at a time
+        key = (path, recursive, len(self.pages))
+        entries = self._listings.get(key)
+        if entries is None:
+            prefix = path + '/'
+            entries = self._listings[key] = [
+                entry for page in self.pages for entry in page
+                if entry.path_lower.startswith(prefix)
+                and (recursive or '/' not in entry.path_lower[len(prefix):])
+            ]
+        end = len(entries) if self.page_size is None else offset + self.page_size
+        return files.ListFolderResult(
+            entries=entries[offset:end],
+            cursor='list:{}:{}:{}'.format(int(recursive), end, path),
+            has_more=end < len(entries),
+        )
+
+    def files_list_folder_get_latest_cursor(self, path, recursive=False):
+        self.calls.append(('files_list_folder_get_latest_cursor', path, recursive))
+        time.sleep(self.list_latency)
+        return files.ListFolderGetLatestCursorResult(cursor='cursor-{}'.format(len(self.pages)))
+
+    def files_list_folder_continue(self, cursor):
+        self.calls.append(('files_list_folder_continue', cursor))
+        time.sleep(self.list_latency)
+        if cursor.startswith('list:'):
+            _, recursive, offset, path = cursor.split(':', 3)
+            return self._list_path(path, recursive == '1', int(offset))
+        if cursor in self.expired:
+            raise ApiError('request-id', files.ListFolderContinueError.reset, None, None)
+        return self._page(int(cursor.split('-')[1]))
+
+    def files_list_folder_longpoll(self, cursor, timeout=30):
+        self.calls.append(('files_list_folder_longpoll', cursor))
+        if cursor in self.expired:
+            raise ApiError('request-id', files.ListFolderLongpollError.reset, None, None)
+        if not self.longpoll_batches:
+            time.sleep(0.01)
+            return files.ListFolderLongpollResult(changes=False)
+        self.pages.append(self.longpoll_batches.pop(0))
+        return files.ListFolderLongpollResult(changes=True)
+
+    def files_download(self, path, rev=None, extra_headers=None):
+        self.calls.append(('files_download', path, extra_headers, rev))
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            if path in self.failing or path not in self.contents:
+                raise ApiError('request-id', files.DownloadError.path(files.LookupError.not_found), None, None)
+            content = self.contents[path]
+            if rev is not None and rev != content_rev(content):
+                raise ApiError('request-id', files.DownloadError.path(files.LookupError.not_found), None, None)
+            entry = file_entry(path, size=len(content), rev=content_rev(content))
+            range_header = (extra_headers or {}).get('Range')
+            if range_header is None:
+                return entry, FakeResponse(content, drop_after=self.drops.pop(path, None))
+            offset = int(range_header[len('bytes='):-1])
+            if offset >= len(content):
+                raise HttpError('request-id', 416, 'range not satisfiable')
+            return entry, FakeResponse(content[offset:], status_code=206, drop_after=self.drops.pop(path, None))
+        finally:
+            self._exit()
+
+    def files_upload_session_start(self, f, close=False, session_type=None, content_hash=None):
+        self.calls.append(('files_upload_session_start', len(f), close))
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            with self._lock:
+                session_id = 'session-{}'.format(len(self.sessions))
+                self.sessions[session_id] = bytearray(f)
+            return files.UploadSessionStartResult(session_id=session_id)
+        finally:
+            self._exit()
+
+    def files_upload_session_append_v2(self, f, cursor, close=False, content_hash=None):
+        self.calls.append(('files_upload_session_append_v2', len(f), close))
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            data = self.sessions[cursor.session_id]
+            assert cursor.offset == len(data), 'bad offset'
+            data.extend(f)
+        finally:
+            self._exit()
+
+    def files_upload_session_finish_batch_v2(self, entries):
+        self.calls.append(('files_upload_session_finish_batch_v2', len(entries)))
+        results = []
+        for arg in entries:
+            path = arg.commit.path
+            data = bytes(self.sessions.pop(arg.cursor.session_id))
+            if path in self.contents and not arg.commit.mode.is_overwrite():
+                conflict = files.WriteError.conflict(files.WriteConflictError.file)
+                results.append(files.UploadSessionFinishBatchResultEntry.failure(
+                    files.UploadSessionFinishError.path(conflict)))
+                continue
+            self.contents[path] = data
+            results.append(files.UploadSessionFinishBatchResultEntry.success(file_entry(path, size=len(data))))
+        return files.UploadSessionFinishBatchResult(entries=results)
+
+    def files_download_zip(self, path):
+        self.calls.append(('files_download_zip', path))
+        prefix = path.rstrip('/') + '/'
+        name = path.rstrip('/').rsplit('/', 1)[-1]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr(name + '/', b'')
+            for file_path, content in sorted(self.contents.items()):
+                if file_path.startswith(prefix):
+                    archive.writestr(name + '/' + file_path[len(prefix):], content)
+        return files.DownloadZipResult(metadata=folder_entry(path)), FakeResponse(buffer.getvalue())
+
+    def _entry_for(self, path):
+        if path in self.contents:
+            return file_entry(path, size=len(self.contents[path]))
+        return folder_entry(path)
+
+    def _exists(self, path):
+        prefix = path.rstrip('/') + '/'
+        return path in self.contents or any(_.startswith(prefix) for _ in self.contents)
+
+    def _subtree(self, path):
+        prefix = path.rstrip('/') + '/'
+        return [_ for _ in self.contents if _ == path or _.startswith(prefix)]
+
+    def _launch(self, launch_type, result):
+        if not self.async_batches:
+            return launch_type.complete(result)
+        job_id = 'job-{}'.format(len(self.jobs))
+        self.jobs[job_id] = [None, result]
+        return launch_type.async_job_id(job_id)
+
+    def _check(self, status_type, job_id):
+        self.calls.append(('check', job_id))
+        pending = self.jobs[job_id]
+        result = pending.pop(0)
+        if result is None:
+            return status_type('in_progress')
+        return status_type.complete(result)
+
+    def files_delete_batch(self, entries):
+        self.calls.append(('files_delete_batch', [_.path for _ in entries]))
+        results = []
+        for arg in entries:
+            if not self._exists(arg.path):
+                lookup = files.DeleteError.path_lookup(files.LookupError.not_found)
+                results.append(files.DeleteBatchResultEntry.failure(lookup))
+                continue
+            metadata = self._entry_for(arg.path)
+            for path in self._subtree(arg.path):
+                del self.contents[path]
+            results.append(files.DeleteBatchResultEntry.success(files.DeleteBatchResultData(metadata)))
+        return self._launch(files.DeleteBatchLaunch, files.DeleteBatchResult(entries=results))
+
+    def files_delete_batch_check(self, async_job_id):
+        return self._check(files.DeleteBatchJobStatus, async_job_id)
+
+    def _relocate(self, entries, keep_source):
+        results = []
+        for arg in entries:
+            if not self._exists(arg.from_path) or self._exists(arg.to_path):
+                error = files.RelocationError.to(files.WriteError.conflict(files.WriteConflictError.file))
+                results.append(files.RelocationBatchResultEntry.failure(
+                    files.RelocationBatchErrorEntry.relocation_error(error)))
+                continue
+            for path in self._subtree(arg.from_path):
+                content = self.contents[path] if keep_source else self.contents.pop(path)
+                self.contents[arg.to_path + path[len(arg.from_path):]] = content
+            results.append(files.RelocationBatchResultEntry.success(self._entry_for(arg.to_path)))
+        return files.RelocationBatchV2Result(entries=results)
+
+    def files_move_batch_v2(self, entries, autorename=False, allow_ownership_transfer=False):
+        self.calls.append(('files_move_batch_v2', [(_.from_path, _.to_path) for _ in entries]))
+        return self._launch(files.RelocationBatchV2Launch, self._relocate(entries, keep_source=False))
+
+    def files_move_batch_check_v2(self, async_job_id):
+        return self._check(files.RelocationBatchV2JobStatus, async_job_id)
+
+    def files_copy_batch_v2(self, entries, autorename=False):
+        self.calls.append(('files_copy_batch_v2', [(_.from_path, _.to_path) for _ in entries]))
+        return self._launch(files.RelocationBatchV2Launch, self._relocate(entries, keep_source=True))
+
+    def files_copy_batch_check_v2(self, async_job_id):
+        return self._check(files.RelocationBatchV2JobStatus, async_job_id)
@@ -0,0 +1,158 @@
+"""
+Benchmark the tree and listing hot paths on synthetic accounts and report
+throughput and peak memory as JSON, for tracking regressions between runs.
+
+    python -m benchmarks.suite [-s SHAPE ...] [-n COUNT] [-o FILE] [--no-memory]
+
+Each case is timed once without tracing; unless --no-memory is given it is
+then run again under tracemalloc for its peak allocation.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from benchmarks.synthetic import SHAPES, generate
+from meta import FileMeta, FolderMeta
+from tree import PathTree
+from tree_fs import TreeFS
+from utils import DropboxUtils
+
+
+SEARCH_TERMS = ('photos', 'report', 'mod_1', 'file_00042', 'zz', '.pdf')
+PAGE_SIZE = 2000
+
+
+def build(listing):
+    tree = PathTree(root=True)
+    tree.bulk_insert((path, FolderMeta() if is_folder else FileMeta(size=size)) for path, is_folder, size in listing)
+    return tree
+
+
+def widest_folder(tree):
+    return max((_ for _ in tree.walk() if _.children), key=lambda _: len(_.children))
+
+
+def case_insert_path(listing):
+    tree = PathTree(root=True)
+    for path, _, _ in listing:
+        tree.insert_path(path)
+    return len(listing)
+
+
+def case_bulk_insert(listing):
+    build(listing)
+    return len(listing)
+
+
+def case_find_path(listing, tree):
+    for path, _, _ in listing:
+        tree.find_path(path)
+    return len(listing)
+
+
+def case_search(listing, tree):
+    for term in SEARCH_TERMS:
+        tree.search(term)
+    return len(SEARCH_TERMS)
+
+
+def case_get_path(listing, tree):
+    count = 0
+    for node in tree.walk():
+        node.get_path()
+        count += 1
+    return count
+
+
+def case_formated_print(listing, tree):
+    lines = []
+    tree.formated_print(func=lines.append)
+    return len(lines)
+
+
+def case_ls(listing, node):
+    # _ls sorts the names and lays them out with _column_format
+    list(TreeFS(node.get_root())._ls(node))
+    return len(node.children)
+
+
+def case_get_tree(listing, pages):
+    DropboxUtils(client=FakeDropboxClient(pages)).get_tree()
+    return sum(len(_) for _ in pages)
+
+
+def listing_pages(listing):
+    entries = [folder_entry(path) if is_folder else file_entry(path, size=size) for path, is_folder, size in listing]
+    return [entries[start:start + PAGE_SIZE] for start in range(0, len(entries), PAGE_SIZE)] or [[]]
+
+
+def measure(func, args, memory):
+    gc.collect()
+    start = time.perf_counter()
+    ops = func(*args)
+    seconds = time.perf_counter() - start
+    result = {
+        'ops': ops,
+        'seconds': round(seconds, 6),
+        'ops_per_sec': round(ops / seconds, 1) if seconds else None,
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func(*args)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def run_shape(shape, count, memory=True, seed=0):
+    listing = list(generate(shape, count, seed=seed))
+    tree = build(listing)
+    pages = listing_pages(listing)
+    cases = (
+        ('insert_path', case_insert_path, (listing,)),
+        ('bulk_insert', case_bulk_insert, (listing,)),
+        ('find_path', case_find_path, (listing, tree)),
+        ('search', case_search, (listing, tree)),
+        ('get_path', case_get_path, (listing, tree)),
+        ('formated_print', case_formated_print, (listing, tree)),
+        ('ls', case_ls, (listing, widest_folder(tree))),
+        ('get_tree', case_get_tree, (listing, pages)),
+    )
+    results = {}
+    for name, func, args in cases:
+        results[name] = measure(func, args, memory)
+    return {'shape': shape, 'entries': len(listing), 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmarks.suite')
+    parser.add_argument('-s', '--shape', nargs='*', choices=sorted(SHAPES), default=sorted(SHAPES),
+                        help='Account shapes to run')
+    parser.add_argument('-n', '--count', type=int, default=100000, help='Files per account')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the generated accounts')
+    parser.add_argument('-o', '--output', default=None, help='Write the JSON report here instead of stdout')
+    parser.add_argument('--no-memory', action='store_false', dest='memory', help='Skip the tracemalloc runs')
+    args = parser.parse_args()
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'count': args.count,
+        'seed': args.seed,
+        'shapes': [run_shape(shape, args.count, memory=args.memory, seed=args.seed) for shape in args.shape],
+    }
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(out + '\n')
+    else:
+        sys.stdout.write(out + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Synthetic account listings for the benchmarks.
+
+Each shape yields (path, is_folder, size) in recursive listing order, every
+folder before its contents, and is deterministic for a given count and seed.
+"""
+import random
+
+
+def wide(count, folders=10, seed=0):
+    """A handful of folders holding huge runs of files."""
+    rng = random.Random(seed)
+    per_folder = -(-count // folders)
+    emitted = 0
+    for folder in range(folders):
+        base = '/wide_{}'.format(folder)
+        yield base, True, 0
+        for idx in range(min(per_folder, count - emitted)):
+            yield '{}/file_{:07d}.dat'.format(base, idx), False, rng.randint(1, 1 << 20)
+            emitted += 1
+
+
+def deep(count, depth=40, seed=0):
+    """Long chains of nested folders with a few files at every level."""
+    rng = random.Random(seed)
+    emitted = 0
+    chain = 0
+    while emitted < count:
+        path = '/chain_{}'.format(chain)
+        for level in range(depth):
+            if emitted >= count:
+                return
+            path = '{}/level_{}'.format(path, level)
+            yield path, True, 0
+            for idx in range(min(3, count - emitted)):
+                yield '{}/f{}.txt'.format(path, idx), False, rng.randint(1, 1 << 14)
+                emitted += 1
+        chain += 1
+
+
+def small_files(count, per_folder=8, fanout=50, seed=0):
+    """Many folders, each holding a few small files."""
+    rng = random.Random(seed)
+    emitted = 0
+    folder = 0
+    while emitted < count:
+        top = '/proj_{}'.format(folder // fanout)
+        if folder % fanout == 0:
+            yield top, True, 0
+        base = '{}/pkg_{}'.format(top, folder % fanout)
+        yield base, True, 0
+        for idx in range(min(per_folder, count - emitted)):
+            yield '{}/mod_{}.py'.format(base, idx), False, rng.randint(100, 4096)
+            emitted += 1
+        folder += 1
+
+
+WORDS = (
+    'photos', 'Documents', 'archive', 'Projects', 'invoices', 'backup', 'Camera Uploads', 'music',
+    'reports', 'shared', 'drafts', 'Screenshots', 'receipts', 'notes', 'old', 'Clients', 'video',
+)
+EXTENSIONS = ('.jpg', '.pdf', '.docx', '.txt', '.png', '.xlsx', '.mp3', '.mov', '.zip', '.md')
+
+
+def _name(rng):
+    # Word plus a suffix of skewed length, so most names are short and a few are long
+    length = min(int(rng.expovariate(1 / 8)), 60)
+    suffix = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789 _-') for _ in range(length))
+    return '{} {}'.format(rng.choice(WORDS), suffix).strip()
+
+
+def realistic(count, seed=0):
+    """
+    A random tree whose depth, fanout, name lengths and file sizes are skewed
+    like a real account: mostly shallow and short, with a long tail.
+    """
+    rng = random.Random(seed)
+    emitted = 0
+    stack = [('', 0)]
+    while emitted < count:
+        if not stack:
+            stack.append(('', 0))
+        parent, level = stack.pop()
+        files = min(int(rng.expovariate(1 / 12)), count - emitted)
+        for _ in range(files):
+            name = _name(rng) + rng.choice(EXTENSIONS)
+            yield '{}/{}'.format(parent, name), False, int(rng.lognormvariate(11, 2.5))
+            emitted += 1
+        if level < 12:
+            for _ in range(min(int(rng.expovariate(1 / 2.5)) + (level == 0) * 6, 30)):
+                path = '{}/{}'.format(parent, _name(rng))
+                yield path, True, 0
+                stack.append((path, level + 1))
+
+
+SHAPES = {
+    'wide': wide,
+    'deep': deep,
+    'small-files': small_files,
+    'realistic': realistic,
+}
+
+
+def generate(shape, count, seed=0):
+    """
+    The listing for `shape` with `count` files, without repeated paths.
+    """
+    seen = set()
+    for path, is_folder, size in SHAPES[shape](count, seed=seed):
+        key = path.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        yield path, is_folder, size
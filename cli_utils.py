@@ -0,0 +1,56 @@
+import argparse
+from contextlib import redirect_stdout
+from io import StringIO
+import itertools
+import threading
+import time
+import sys
+
+from exceptions import ParserError
+
+
+def wait_animation(func):
+    def wrapper(*args, **kwargs):
+        done = False
+        pulse = (
+            '[-------]', '[⌃------]', '[⌄^-----]', '[-⌄^----]',
+            '[--⌄^---]', '[---⌄^--]', '[----⌄^-]', '[-----⌄^]',
+            '[------⌄]'
+        )
+
+        def animate():
+            for c in itertools.cycle(pulse):
+                if done:
+                    break
+                sys.stdout.write('\rloading ' + c)
+                sys.stdout.flush()
+                time.sleep(0.1)
+
+        t = threading.Thread(target=animate)
+        t.start()
+        result = func(*args, **kwargs)
+        done = True
+        sys.stdout.write('\n')
+        return result
+    return wrapper
+
+
+class Parser(argparse.ArgumentParser):
+
+    def error(self, message):
+        print(message, '\n')
+        self.print_help()
+        raise ParserError(message)
+
+    def exit(self, *args, **kwargs):
+        pass
+
+
+def set_docstring_from_parser(parser):
+    def wrapper(func):
+        out = StringIO()
+        with redirect_stdout(out):
+            parser().print_help()
+        func.__doc__ = out.getvalue()
+        return func
+    return wrapper
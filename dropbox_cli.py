@@ -1,11 +1,19 @@
-from contextlib import closing
+import glob
+import os
 from pathlib import Path
 import shlex
+import sys
 
 import dropbox
+import requests
 
-from exceptions import InvalidPath
-from utils import Parser, set_docstring_from_parser, ParserError
+from batch import copy_batch, delete_batch, move_batch
+from cli_utils import Parser, set_docstring_from_parser
+from exceptions import InvalidPath, ParserError
+from sync import plan_sync
+from transfer import DownloadScheduler, UploadScheduler, download_zip, prefer_zip
+from transport import Transport
+from utils import DropboxUtils
 from tree_fs import TreeFS
 
 
@@ -23,25 +31,136 @@ class DropboxCLIParsers:
         parser.add_argument(
             '-t', '--target',
             nargs='*',
-            help='File to download'
+            help='Files to download; wildcards (*, ?, [seq]) are expanded'
         )
         parser.add_argument(
             '-d', '--destination',
             nargs='*',
             help='Directory to download file to'
         )
+        parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            default=4,
+            help='Number of files to download at the same time'
+        )
+        parser.add_argument(
+            '-r', '--recursive',
+            action='store_true',
+            default=False,
+            help='Download folders and everything in them'
+        )
+        return parser
+
+    @classmethod
+    def _put_parser(cls):
+        parser = Parser(prog='put')
+        parser.add_argument(
+            'sources',
+            nargs='+',
+            help='Local files to upload; wildcards (*, ?, [seq]) are expanded'
+        )
+        parser.add_argument(
+            '-d', '--destination',
+            default=None,
+            help='Dropbox folder to upload to (defaults to the current folder)'
+        )
+        parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            default=4,
+            help='Number of files to upload at the same time'
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            default=False,
+            help='Replace files that already exist in Dropbox'
+        )
         return parser
 
+    @classmethod
+    def _sync_parser(cls):
+        parser = Parser(prog='sync')
+        parser.add_argument(
+            'remote',
+            help='Dropbox folder to mirror'
+        )
+        parser.add_argument(
+            'local',
+            help='Local directory to mirror into'
+        )
+        parser.add_argument(
+            '-n', '--dry-run',
+            action='store_true',
+            default=False,
+            help='Only show what would be transferred'
+        )
+        parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            default=4,
+            help='Number of files to hash or download at the same time'
+        )
+        return parser
+
+    @classmethod
+    def _rm_parser(cls):
+        parser = Parser(prog='rm')
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Files or folders to delete; wildcards (*, ?, [seq]) are expanded'
+        )
+        parser.add_argument(
+            '-f', '--found',
+            action='store_true',
+            default=False,
+            help='Also delete everything returned by the last find'
+        )
+        return parser
+
+    @classmethod
+    def _relocate_parser(cls, prog, verb):
+        parser = Parser(prog=prog)
+        parser.add_argument(
+            'sources',
+            nargs='*',
+            help='Files or folders to {}; wildcards (*, ?, [seq]) are expanded'.format(verb)
+        )
+        parser.add_argument(
+            'destination',
+            help='Folder to {0} into, or the new path when {0}ing a single item'.format(verb)
+        )
+        parser.add_argument(
+            '-f', '--found',
+            action='store_true',
+            default=False,
+            help='Also {} everything returned by the last find'.format(verb)
+        )
+        return parser
+
+    @classmethod
+    def _mv_parser(cls):
+        return cls._relocate_parser('mv', 'move')
+
+    @classmethod
+    def _cp_parser(cls):
+        return cls._relocate_parser('cp', 'copy')
+
 
 class DropboxCLI(TreeFS):
     welcome = 'Dropbox-CLI'
     doc_header = 'Commands'
     undoc_header = 'No help available'
     ruler = '-'
+    batch_poll_interval = 0.5
 
-    def __init__(self, tree, *args, token=None, **kwargs):  # flake8: noqa
-        assert token is not None, 'Dropbox oauth token required to use Dropbox'
-        self.client = dropbox.Dropbox(token)
+    def __init__(self, tree, *args, token=None, client=None, transport=None, **kwargs):  # flake8: noqa
+        assert token is not None or client is not None or transport is not None, \
+            'Dropbox oauth token required to use Dropbox'
+        self.transport = transport or Transport(token=token, client=client)
+        self.client = self.transport.client
         super().__init__(tree, *args, **kwargs)
 
     def preloop(self):
@@ -54,28 +173,297 @@ class DropboxCLI(TreeFS):
             args = parser.parse_args(shlex.split(args, posix=True))
         except ParserError:
             return
+        destination = ' '.join(args.destination or ['.'])
         try:
-            self._get(' '.join(args.target), ' '.join(args.destination))
+            nodes = self._expand_targets(args.target or [])
+            folders = [_ for _ in nodes if _.is_folder]
+            if folders and not args.recursive:
+                raise InvalidPath('{} is a folder, use get -r to download it'.format(folders[0].get_path()))
+            results = self._get_many([_ for _ in nodes if not _.is_folder], destination, jobs=args.jobs)
+            for folder in folders:
+                results.extend(self._get_folder(folder, destination, jobs=args.jobs))
         except InvalidPath as e:
             self.fprint(str(e))
+            return
+        for result in results:
+            if not result.ok:
+                self.fprint('Failed {}: {}'.format(result.remote_path, result.error))
+        self.fprint('Downloaded {} of {} files'.format(sum(_.ok for _ in results), len(results)))
 
-    def _get(self, file_path, download_location):
-        target_node = self.tree.find_path(file_path)
-        if target_node is None:
-            raise InvalidPath(file_path)
+    def _expand_targets(self, targets):
+        """
+        Resolve target arguments to nodes.  Unquoted names containing spaces
+        arrive split, so the joined arguments are tried as a single path first.
+        """
+        joined = self._find_path(' '.join(targets)) if targets else None
+        if joined is not None:
+            return [joined]
+        nodes = []
+        for target in targets:
+            found = self._glob(target)
+            if not found:
+                raise InvalidPath(target)
+            nodes.extend(found)
+        return nodes
+
+    def _check_destination(self, download_location):
         if not Path(download_location).exists():
             raise InvalidPath('Destination path {} does not exist.  Perhaps you need to create directories first?'.format(download_location))
         if not Path(download_location).is_dir():
             raise InvalidPath('Destination path {} is not a directory.'.format(download_location))
-        meta_data, dropbox_file = self.client.files_download(target_node.get_path())
-        with closing(dropbox_file) as db_file:
-            content = db_file.content
-        target = Path(download_location).joinpath(meta_data.name)
+
+    def _get(self, file_path, download_location):
+        target_node = self.tree.find_path(file_path)
+        if target_node is None:
+            raise InvalidPath(file_path)
+        result, = self._get_many([target_node], download_location, jobs=1)
+        if not result.ok:
+            raise result.error
+
+    def _get_folder(self, node, download_location, jobs=4):
+        """
+        Mirror the subtree under `node` into `download_location`.  Folders of
+        many small files come down as a single zip stream, anything else file
+        by file on the download pool.
+        """
+        self._check_destination(download_location)
+        self._expand(node, recursive=True)
+        local_root = Path(download_location).joinpath('' if node.is_root else node.value)
+        base = len(node.get_path().rstrip('/'))
+        folders, files, total_size = [], [], 0
+        for child in node.walk():
+            relative = child.get_path()[base:].lstrip('/')
+            if child.is_folder:
+                folders.append(relative)
+                continue
+            size = child.meta.get('size')
+            total_size += size if isinstance(size, int) else 0
+            files.append((child, relative))
+        if not node.is_root and prefer_zip(len(files), total_size):
+            try:
+                return download_zip(self.client, node.get_path(), download_location)
+            except (dropbox.exceptions.DropboxException, requests.exceptions.RequestException):
+                pass  # Refused or dropped; fall back to fetching the files one by one
+        for relative in folders:
+            local_root.joinpath(relative).mkdir(parents=True, exist_ok=True)
+        jobs_list = [(child.get_path(), local_root.joinpath(relative)) for child, relative in files]
+        scheduler = DownloadScheduler(
+            self.client, workers=jobs, progress=self._show_progress, executor=self.transport.executor)
+        results = scheduler.run(jobs_list)
+        sys.stdout.write('\n')
+        return results
+
+    def _get_many(self, nodes, download_location, jobs=4):
+        self._check_destination(download_location)
+        if not nodes:
+            return []
+        by_name = {}
+        for node in nodes:
+            by_name.setdefault(node.value.lower(), []).append(node)
+        clashes = [_ for _ in by_name.values() if len(_) > 1]
+        if clashes:
+            raise InvalidPath('{} would all be saved as {}'.format(
+                ', '.join(_.get_path() for _ in clashes[0]), clashes[0][0].value))
+        jobs_list = [(node.get_path(), Path(download_location).joinpath(node.value)) for node in nodes]
+        scheduler = DownloadScheduler(
+            self.client, workers=jobs, progress=self._show_progress, executor=self.transport.executor)
+        results = scheduler.run(jobs_list)
+        sys.stdout.write('\n')
+        return results
+
+    @set_docstring_from_parser(DropboxCLIParsers._put_parser)
+    def do_put(self, args):
+        parser = DropboxCLIParsers._put_parser()
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
+        try:
+            results = self._put(args.sources, args.destination, jobs=args.jobs, overwrite=args.overwrite)
+        except InvalidPath as e:
+            self.fprint(str(e))
+            return
+        for result in results:
+            if not result.ok:
+                self.fprint('Failed {}: {}'.format(result.local_path, result.error))
+        self.fprint('Uploaded {} of {} files'.format(sum(_.ok for _ in results), len(results)))
+
+    def _expand_sources(self, sources):
+        paths = []
+        for source in sources:
+            source = os.path.expanduser(source)
+            matches = sorted(glob.glob(source)) or [source]
+            for match in matches:
+                if not Path(match).is_file():
+                    raise InvalidPath('Local file {} does not exist or is not a file.'.format(match))
+                paths.append(Path(match))
+        return paths
+
+    def _put(self, sources, destination=None, jobs=4, overwrite=False):
+        folder = self.current_node if destination is None else self._find_path(destination)
+        if folder is None or folder.meta.get('type') == 'file':
+            raise InvalidPath(destination)
+        self._expand(folder)
+        remote_dir = folder.get_path().rstrip('/')
+        uploads = [(path, '{}/{}'.format(remote_dir, path.name)) for path in self._expand_sources(sources)]
+        scheduler = UploadScheduler(
+            self.client, workers=jobs, progress=self._show_progress, overwrite=overwrite,
+            executor=self.transport.executor)
+        results = scheduler.run(uploads)
+        sys.stdout.write('\n')
+        with self.lock:
+            for result in results:
+                if result.ok:
+                    node = self.tree.insert_path(result.metadata.path_display)
+                    node.meta = DropboxUtils.get_meta(result.metadata)
+        return results
+
+    @set_docstring_from_parser(DropboxCLIParsers._sync_parser)
+    def do_sync(self, args):
+        parser = DropboxCLIParsers._sync_parser()
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
+        try:
+            plan, results = self._sync(args.remote, args.local, jobs=args.jobs, dry_run=args.dry_run)
+        except InvalidPath as e:
+            self.fprint(str(e))
+            return
+        if args.dry_run:
+            for node, local_path in plan.downloads:
+                self.fprint('would download {} -> {}'.format(node.get_path(), local_path))
+        for result in results:
+            if not result.ok:
+                self.fprint('Failed {}: {}'.format(result.remote_path, result.error))
+        self.fprint('{} files to transfer ({:,} bytes), {} unchanged ({:,} bytes avoided)'.format(
+            len(plan.downloads), plan.bytes_to_transfer, len(plan.unchanged), plan.bytes_avoided))
+
+    def _sync(self, remote, local, jobs=4, dry_run=False):
+        node = self._find_path(remote)
+        if node is None or not node.is_folder:
+            raise InvalidPath(remote)
+        self._check_destination(local)
+        self._expand(node, recursive=True)
+        plan = plan_sync(node, local, workers=jobs)
+        if dry_run:
+            return plan, []
+        for folder in plan.folders:
+            folder.mkdir(parents=True, exist_ok=True)
+        scheduler = DownloadScheduler(
+            self.client, workers=jobs, progress=self._show_progress, executor=self.transport.executor)
+        results = scheduler.run((child.get_path(), local_path) for child, local_path in plan.downloads)
+        sys.stdout.write('\n')
+        return plan, results
+
+    def _mutation_targets(self, paths, found):
+        targets = self._expand_targets(paths) if paths else []
+        if found:
+            # Skip results removed since the find ran
+            targets.extend(_ for _ in self.last_found if _.get_root() is self.tree)
+        # A node named twice, by a path and by a find result say, goes in the batch once
+        nodes, seen = [], set()
+        for node in targets:
+            if id(node) not in seen:
+                seen.add(id(node))
+                nodes.append(node)
+        if not nodes:
+            raise InvalidPath(' '.join(paths))
+        if any(_.is_root for _ in nodes):
+            raise InvalidPath('Refusing to modify the root folder')
+        return nodes
+
+    def _report_batch(self, verb, results):
+        for result in results:
+            if not result.ok:
+                self.fprint('Failed {}: {}'.format(result.path, result.error))
+        self.fprint('{} {} of {} items'.format(verb, sum(_.ok for _ in results), len(results)))
+
+    @set_docstring_from_parser(DropboxCLIParsers._rm_parser)
+    def do_rm(self, args):
+        parser = DropboxCLIParsers._rm_parser()
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
         try:
-            with open(str(target), 'wb') as dl:
-                dl.write(content)
-        except FileNotFoundError as e:
-            raise InvalidPath(download_location)
+            results = self._rm(self._mutation_targets(args.paths, args.found))
+        except InvalidPath as e:
+            self.fprint(str(e))
+            return
+        except (dropbox.exceptions.DropboxException, requests.exceptions.RequestException) as e:
+            self.fprint('Delete failed: {}'.format(e))
+            return
+        self._report_batch('Deleted', results)
+
+    def _rm(self, nodes):
+        results = delete_batch(self.client, [_.get_path() for _ in nodes], self.batch_poll_interval)
+        with self.lock:
+            for node, result in zip(nodes, results):
+                if result.ok and node.parent is not None:
+                    node.remove()
+        return results
+
+    @set_docstring_from_parser(DropboxCLIParsers._mv_parser)
+    def do_mv(self, args):
+        self._relocate_command(DropboxCLIParsers._mv_parser(), args, copy=False)
+
+    @set_docstring_from_parser(DropboxCLIParsers._cp_parser)
+    def do_cp(self, args):
+        self._relocate_command(DropboxCLIParsers._cp_parser(), args, copy=True)
+
+    def _relocate_command(self, parser, args, copy):
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
+        try:
+            nodes = self._mutation_targets(args.sources, args.found)
+            results = self._relocate(nodes, args.destination, copy=copy)
+        except InvalidPath as e:
+            self.fprint(str(e))
+            return
+        except (dropbox.exceptions.DropboxException, requests.exceptions.RequestException) as e:
+            self.fprint('{} failed: {}'.format('Copy' if copy else 'Move', e))
+            return
+        self._report_batch('Copied' if copy else 'Moved', results)
+
+    def _relocate(self, nodes, destination, copy=False):
+        """
+        Move or copy `nodes` into the folder `destination`, or to the new path
+        `destination` when there is a single node, then apply the results to
+        the tree: moves re-parent the existing subtree, copies attach a clone.
+        """
+        target = self._find_path(destination)
+        if target is not None and target.is_folder:
+            moves = [(node, target, node.value) for node in nodes]
+        else:
+            if len(nodes) != 1:
+                raise InvalidPath('{} is not a folder'.format(destination))
+            head, sep, name = destination.rstrip('/').rpartition('/')
+            parent = self._find_path(head or sep) if sep else self.current_node
+            if parent is None or not name:
+                raise InvalidPath(destination)
+            moves = [(nodes[0], parent, name)]
+        for node, parent, _ in moves:
+            self._expand(parent)
+            if copy:
+                # A clone of a folder that was never listed would stay empty
+                self._expand(node, recursive=True)
+        pairs = [(node.get_path(), '{}/{}'.format(parent.get_path().rstrip('/'), name)) for node, parent, name in moves]
+        results = (copy_batch if copy else move_batch)(self.client, pairs, self.batch_poll_interval)
+        with self.lock:
+            for (node, parent, _), result in zip(moves, results):
+                if not result.ok:
+                    continue
+                moved = node.copy() if copy else node
+                moved.move_to(parent, result.metadata.name)
+                moved.meta = DropboxUtils.get_meta(result.metadata)
+        return results
+
+    def _show_progress(self, done, total, transferred):
+        sys.stdout.write('\r    {}/{} files, {:,} bytes'.format(done, total, transferred))
+        sys.stdout.flush()
 
     @property
     def prompt(self):
@@ -7,3 +7,7 @@ class InvalidPath(Exception):
 
 class ParserError(Exception):
     pass
+
+
+class ListingError(Exception):
+    pass
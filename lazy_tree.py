@@ -0,0 +1,117 @@
+from fnmatch import fnmatchcase
+
+import dropbox
+
+from tree import PathTree
+
+
+class LazyLoader:
+    """
+    Fill in a PathTree one folder at a time as it is browsed, instead of
+    listing the whole account up front.
+
+    Folders whose children have not been listed yet are kept in `unexpanded`
+    (keyed by id, as nodes are unhashable).  Expanding a folder lists it with
+    files_list_folder and inserts the entries, which then stay in the tree.
+    """
+
+    def __init__(self, dbutil, tree=None):
+        self.dbutil = dbutil
+        self.tree = tree if tree is not None else PathTree(root=True)
+        self.unexpanded = {id(self.tree): self.tree}
+
+    def load(self):
+        self.expand(self.tree)
+        return self.tree
+
+    def is_expanded(self, node):
+        return id(node) not in self.unexpanded
+
+    def _remote_path(self, node):
+        if node.is_root:
+            return self.dbutil.root or ''
+        return node.get_path()
+
+    def expand(self, node, recursive=False):
+        """
+        List `node` if it has not been listed yet.  With `recursive`, make sure
+        nothing below it is left unexpanded, using one recursive listing.
+        """
+        if recursive:
+            pending = [_ for _ in self.unexpanded.values() if _.is_within(node)]
+            if not pending:
+                return
+        elif self.is_expanded(node):
+            return
+        base = self._remote_path(node)
+        # The tree holds full Dropbox paths, as the eager listing does, even
+        # when a root folder was given.  Below the root, only the last
+        # component of path_display is reliably cased, so entries are placed
+        # by their position relative to the listed folder.
+        offset = 0 if node.is_root else len(base)
+        entries = []
+        for entry in self.dbutil.list_folder(base, recursive=recursive):
+            relative = entry.path_display[offset:].strip('/')
+            if relative:
+                entries.append((relative, entry))
+        node.bulk_insert((relative, self.dbutil.get_meta(entry)) for relative, entry in entries)
+        if recursive:
+            for _ in pending:
+                del self.unexpanded[id(_)]
+            return
+        del self.unexpanded[id(node)]
+        for relative, entry in entries:
+            if isinstance(entry, dropbox.files.FolderMetadata):
+                child = node.find_path(relative)
+                if child is not None and not child.children:
+                    self.unexpanded[id(child)] = child
+
+    def expand_to_depth(self, node, depth):
+        """
+        Expand `node` and the folders below it down to `depth` levels.
+        """
+        level = [node]
+        for _ in range(depth):
+            next_level = []
+            for folder in level:
+                self.expand(folder)
+                next_level.extend(child for child in folder.children if child.is_folder)
+            level = next_level
+
+    def find_path(self, origin, node_path):
+        """
+        Resolve `node_path` from `origin` like PathTree.find_path, listing the
+        folders along the way.
+        """
+        if node_path == '/':
+            return origin.get_root()
+        node, parts = origin._origin_from_path(node_path)
+        for part in parts:
+            if not part:
+                continue
+            self.expand(node)
+            node = node.get_child(part)
+            if node is None:
+                return None
+        return node
+
+    def glob(self, origin, pattern):
+        """
+        Match `pattern` from `origin` like PathTree.glob, listing the folders
+        whose children the wildcards are matched against.
+        """
+        if not any(_ in pattern for _ in '*?['):
+            node = self.find_path(origin, pattern)
+            return [node] if node is not None else []
+        origin, parts = origin._origin_from_path(pattern)
+        nodes = [origin]
+        for part in parts:
+            if not part:
+                continue
+            for node in nodes:
+                self.expand(node)
+            if any(_ in part for _ in '*?['):
+                nodes = [c for n in nodes for c in n.children if fnmatchcase(c.value, part)]
+            else:
+                nodes = [c for c in (n.get_child(part) for n in nodes) if c is not None]
+        return nodes
@@ -0,0 +1,195 @@
+from collections import deque
+import csv
+import functools
+import gc
+import json
+
+from exceptions import ListingError
+from meta import FileMeta, FolderMeta
+from stats import STATS
+from tree import PathTree
+
+
+FORMATS = ('text', 'jsonl', 'csv')
+CHUNK_SIZE = 1 << 22
+SUFFIXES = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl', '.csv': 'csv'}
+BOM = b'\xef\xbb\xbf'
+
+
+def detect_format(input_file):
+    suffix = input_file[input_file.rfind('.'):].lower() if '.' in input_file else ''
+    return SUFFIXES.get(suffix, 'text')
+
+
+def read_chunks(f, chunk_size=CHUNK_SIZE):
+    """
+    Read a binary file in blocks of about `chunk_size` bytes, each ending on a
+    line boundary, so they can be parsed independently.
+    """
+    tail = b''
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            break
+        if tail:
+            data = tail + data
+        end = data.rfind(b'\n') + 1
+        if not end:
+            tail = data  # one line longer than the chunk, keep reading
+            continue
+        tail = data[end:]
+        yield data[:end]
+    if tail:
+        yield tail
+
+
+def _row(record, line):
+    """
+    (path, is_folder, size, modified, id, content_hash) for one listing record,
+    or None for records to skip.  Accepts the field names used by the Dropbox
+    API (path_display, .tag, server_modified) as well as the short ones.
+    """
+    path = record.get('path') or record.get('path_display') or ''
+    kind = record.get('type') or record.get('.tag') or ('folder' if path.endswith('/') else 'file')
+    path = path.rstrip('/')
+    if not path or kind == 'deleted':
+        return None
+    if kind == 'folder':
+        return path, True, '', '', record.get('id') or '', None
+    if kind != 'file':
+        raise ListingError('Unknown entry type {!r}: {}'.format(kind, line[:200]))
+    size = record.get('size')
+    if isinstance(size, str):
+        try:
+            size = int(size) if size.strip() else ''
+        except ValueError:
+            raise ListingError('Invalid size {!r}: {}'.format(size, line[:200]))
+    modified = record.get('modified') or record.get('server_modified') or record.get('client_modified') or ''
+    return path, False, '' if size is None else size, modified, record.get('id') or '', record.get('content_hash')
+
+
+def parse_text(text, columns=None):
+    rows = []
+    for line in text.splitlines():
+        path = line.strip()
+        if not path or path == '/':
+            continue
+        if path.endswith('/'):
+            rows.append((path.rstrip('/'), True, '', '', '', None))
+        else:
+            rows.append((path, False, '', '', '', None))
+    return rows
+
+
+def parse_jsonl(text, columns=None):
+    loads = json.loads
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError:
+            raise ListingError('Invalid JSON: {}'.format(line[:200]))
+        if not isinstance(record, dict):
+            raise ListingError('Expected an object per line: {}'.format(line[:200]))
+        row = _row(record, line)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def parse_csv(text, columns):
+    rows = []
+    for values in csv.reader(text.splitlines()):
+        if not values:
+            continue
+        row = _row(dict(zip(columns, values)), ','.join(values))
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+PARSERS = {'text': parse_text, 'jsonl': parse_jsonl, 'csv': parse_csv}
+
+
+def parse_chunk(fmt, columns, data):
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise ListingError('Listing is not UTF-8: {}'.format(e))
+    return PARSERS[fmt](text, columns)
+
+
+def _csv_columns(f):
+    header = f.readline().decode('utf-8')
+    columns = [_.strip().lower() for _ in next(csv.reader([header]), [])]
+    if 'path' not in columns and 'path_display' not in columns:
+        raise ListingError('CSV listings need a header row with a path column, got: {}'.format(header.strip()))
+    return columns
+
+
+def _parse_chunks(chunks, parse, workers):
+    """
+    Yield parse(chunk) for each chunk in order.  With more than one worker the
+    chunks are parsed in a process pool, with only a few in flight at a time so
+    the file isn't read into memory ahead of the tree.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse(chunk)
+        return
+    import multiprocessing
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse, (chunk,)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def load_listing(input_file, fmt='auto', workers=1, chunk_size=CHUNK_SIZE, tree=None):
+    """
+    Build a PathTree from a listing file: plain text with one path per line (a
+    trailing / marks a folder), JSON lines, or CSV with a header row.  The
+    structured formats carry path, type, size, modified, id and content_hash
+    per entry; `fmt` 'auto' picks the format from the file extension.
+
+    The file is read in `chunk_size` blocks that `workers` processes parse in
+    parallel, and the entries are bulk inserted in listing order.
+    """
+    if fmt == 'auto':
+        fmt = detect_format(input_file)
+    if fmt not in PARSERS:
+        raise ListingError('Unknown listing format: {}'.format(fmt))
+    tree = tree if tree is not None else PathTree(root=True)
+    folders = [0]
+
+    def entries(chunks):
+        for rows in chunks:
+            for path, is_folder, size, modified, id, content_hash in rows:
+                if is_folder:
+                    folders[0] += 1
+                    yield path, FolderMeta(id=id)
+                else:
+                    yield path, FileMeta(id=id, modified=modified, size=size, content_hash=content_hash)
+
+    # Millions of new nodes would set off the cyclic collector over and over
+    # while none of them can be garbage yet
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with STATS.timer('listing import'), open(input_file, 'rb') as f:
+            if f.read(len(BOM)) != BOM:
+                f.seek(0)
+            columns = _csv_columns(f) if fmt == 'csv' else None
+            parse = functools.partial(parse_chunk, fmt, columns)
+            tree.bulk_insert(entries(_parse_chunks(read_chunks(f, chunk_size), parse, workers)))
+            if fmt == 'text' or not folders[0]:
+                tree.mark_folders()
+    finally:
+        if collecting:
+            gc.enable()
+    return tree
@@ -1,18 +1,41 @@
 import argparse
+import os
+import threading
 
-import authenticate
-from dropbox_cli import DropboxCLI
-from utils import DropboxUtils
-from tree import PathTree
+from exceptions import ListingError
+from listing import FORMATS, load_listing
+from stats import STATS
 from tree_fs import TreeFS
 
+# Modules that need the Dropbox SDK are imported where the online modes use
+# them, so `-f` starts without loading it.
+
 
 def cmd_line_options():
     parser = argparse.ArgumentParser(prog='Dropbox-CLI')
     parser.add_argument(
         '-f', '--file',
         dest='input_file',
-        help='File containing file paths to initialize tree with'
+        help='Listing to initialize the tree with: one path per line, JSON lines or CSV'
+    )
+    parser.add_argument(
+        '--format',
+        choices=('auto',) + FORMATS,
+        default='auto',
+        dest='listing_format',
+        help='Format of the -f listing (default: from the file extension)'
+    )
+    parser.add_argument(
+        '--import-jobs',
+        type=int,
+        default=1,
+        help='Processes parsing the -f listing'
+    )
+    parser.add_argument(
+        '--store',
+        default=None,
+        help='Keep the tree in this SQLite database instead of in memory: with -f the listing replaces its '
+             'contents, on its own the tree from an earlier import is browsed'
     )
     parser.add_argument(
         '-t', '--token',
@@ -20,6 +43,50 @@ def cmd_line_options():
         dest='dropbox_token',
         help='Dropbox oauth token'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_false',
+        dest='use_cache',
+        help='Do not use or save the local tree snapshot'
+    )
+    parser.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        default=False,
+        help='Keep the tree up to date with changes made while the CLI is running'
+    )
+    parser.add_argument(
+        '-j', '--list-jobs',
+        type=int,
+        default=1,
+        dest='list_workers',
+        help='List this many top-level folders at the same time when building the tree'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=16,
+        help='Connections kept open to Dropbox'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=8,
+        help='Dropbox requests run at the same time by listing and transfers; get, put and sync -j stay within it'
+    )
+    parser.add_argument(
+        '-l', '--lazy',
+        action='store_true',
+        default=False,
+        help='List folders when they are first visited instead of listing the whole account at startup'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='dropbox-cli.prof',
+        default=None,
+        help='Profile the session and write the cProfile data to this file (default: dropbox-cli.prof) on exit'
+    )
     parser.add_argument(
         '-r', '--root',
         default=None,
@@ -27,38 +94,126 @@ def cmd_line_options():
         help='Path to use as root for dropbox'
     )
     args = parser.parse_args()
+    if args.lazy and args.watch:
+        parser.error('--watch needs the full listing and cannot be combined with --lazy')
+    if args.store and (args.lazy or args.watch):
+        parser.error('--store is for browsing listings offline and cannot be combined with --lazy or --watch')
+    if args.store and not args.input_file and not os.path.exists(args.store):
+        parser.error('{} does not exist; import a listing into it with -f first'.format(args.store))
     return args
 
 
-def init_tree_from_dropbox_account(token=None, root_path=None):
+def init_tree_from_dropbox_account(token=None, root_path=None, use_cache=True, watch_lock=None, list_workers=1,
+                                   transport=None):
+    from utils import DropboxUtils
+    from watcher import TreeWatcher
     if token is None:
+        import authenticate
         token = authenticate.get_user_creds()
-    dbutil = DropboxUtils(token=token, root=root_path)
-    tree = dbutil.get_tree()
+    dbutil = DropboxUtils(token=token, root=root_path, list_workers=list_workers, transport=transport)
+    tree = dbutil.load_tree(use_cache=use_cache)
+    if watch_lock is not None:
+        TreeWatcher(dbutil, tree, watch_lock).start()
     return tree, token
 
 
-def init_tree_from_file(input_file):
-    with open(input_file, 'r') as f:
-        tree = PathTree(root=True)
-        for line in f:
-            tree.insert_path(line.strip())
-            node = tree.find_path(line.strip())
-            node.meta = {
-                'type': 'file',
-                'id': '',
-                'modified': '',
-                'size': '',
-                'details': 'added from file'
-            }
-    return tree
+def init_lazy_tree_from_dropbox_account(token=None, root_path=None, transport=None):
+    """
+    List only the root folder; the returned LazyLoader lists the rest on demand.
+    The partial tree is not saved to the snapshot cache.
+    """
+    from lazy_tree import LazyLoader
+    from utils import DropboxUtils
+    if token is None:
+        import authenticate
+        token = authenticate.get_user_creds()
+    loader = LazyLoader(DropboxUtils(token=token, root=root_path, transport=transport))
+    loader.load()
+    return loader, token
+
+
+def init_tree_from_file(input_file, listing_format='auto', workers=1):
+    return load_listing(input_file, fmt=listing_format, workers=workers)
+
+
+def init_tree_from_store(store_path, input_file=None, listing_format='auto', workers=1):
+    """
+    Open the TreeStore at `store_path`.  With `input_file`, the listing is
+    imported into a new database first, which replaces the store only once
+    the whole listing has loaded, so a bad listing leaves the store as it was.
+    """
+    from tree_store import TreeStore, remove_database
+    if input_file:
+        staging = store_path + '.import'
+        store = TreeStore(staging, reset=True)
+        try:
+            load_listing(input_file, fmt=listing_format, workers=workers, tree=store.root)
+        except BaseException:
+            store.close()
+            remove_database(staging)
+            raise
+        store.close()
+        # A journal left by the old database must not be applied to the new one
+        remove_database(store_path, journal_only=True)
+        os.replace(staging, store_path)
+    return TreeStore(store_path)
+
+
+def write_profile(profiler, profile_path):
+    import pstats
+    profiler.disable()
+    profiler.dump_stats(profile_path)
+    print('Profile written to {}'.format(profile_path))
+    for line in TreeFS.stats_report(STATS.snapshot()):
+        print(line)
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+
+def run(args):
+    if args.input_file or args.store:
+        store = None
+        try:
+            if args.store:
+                store = init_tree_from_store(args.store, args.input_file, args.listing_format, args.import_jobs)
+                tree = store.root
+            else:
+                tree = init_tree_from_file(args.input_file, args.listing_format, args.import_jobs)
+        except (OSError, ListingError) as e:
+            raise SystemExit('Could not load {}: {}'.format(args.input_file or args.store, e))
+        try:
+            TreeFS(tree).cmdloop()
+        finally:
+            if store is not None:
+                store.close()
+    else:
+        import authenticate
+        from dropbox_cli import DropboxCLI
+        from transport import Transport
+        # One connection pool for the listing, the watcher and the shell
+        token = args.dropbox_token or authenticate.get_user_creds()
+        transport = Transport(token, pool_size=args.pool_size, max_concurrency=args.concurrency)
+        try:
+            if args.lazy:
+                loader, token = init_lazy_tree_from_dropbox_account(token, args.root_path, transport)
+                DropboxCLI(loader.tree, transport=transport, loader=loader).cmdloop()
+            else:
+                lock = threading.RLock() if args.watch else None
+                tree, token = init_tree_from_dropbox_account(
+                    token, args.root_path, args.use_cache, lock, args.list_workers, transport)
+                DropboxCLI(tree, transport=transport, lock=lock).cmdloop()
+        finally:
+            transport.close()
 
 
 if __name__ == "__main__":
     args = cmd_line_options()
-    if args.input_file:
-        tree = init_tree_from_file(args.input_file)
-        TreeFS(tree).cmdloop()
-    else:
-        tree, token = init_tree_from_dropbox_account(args.dropbox_token, args.root_path)
-        DropboxCLI(tree, token=token).cmdloop()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run(args)
+    finally:
+        if profiler is not None:
+            write_profile(profiler, args.profile)
@@ -0,0 +1,82 @@
+from collections.abc import Mapping
+
+
+class Meta(Mapping):
+    """
+    Slotted metadata record exposing the read side of the dict it replaces, so
+    node.meta.get('size'), node.meta['type'] and node.meta.items() keep working.
+    """
+    __slots__ = ()
+    type = None
+    fields = ()
+
+    def __getitem__(self, key):
+        if key == 'type' and self.type is not None:
+            return self.type
+        if key in self.fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        # Same result as Mapping.get, without the exception round trip on the hot path
+        if key == 'type' and self.type is not None:
+            return self.type
+        if key in self.fields:
+            return getattr(self, key)
+        return default
+
+    def __iter__(self):
+        if self.type is not None:
+            yield 'type'
+        yield from self.fields
+
+    def __len__(self):
+        return len(self.fields) + (self.type is not None)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self.items()))
+
+
+class _EmptyMeta(Meta):
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'EMPTY_META'
+
+
+EMPTY_META = _EmptyMeta()
+
+
+class FileMeta(Meta):
+    __slots__ = ('id', 'modified', 'size', 'content_hash')
+    type = 'file'
+    fields = __slots__
+
+    def __init__(self, id='', modified='', size='', content_hash=None):
+        self.id = id
+        self.modified = modified
+        self.size = size
+        self.content_hash = content_hash
+
+
+class FolderMeta(Meta):
+    __slots__ = ('id',)
+    type = 'folder'
+    fields = __slots__
+
+    def __init__(self, id=''):
+        self.id = id
+
+
+def without_id(meta):
+    """
+    `meta` with its Dropbox id cleared, for entries that are not the item the
+    id belongs to, such as the descendants of a copied folder.
+    """
+    if not meta.get('id'):
+        return meta
+    if isinstance(meta, Meta):
+        values = {field: getattr(meta, field) for field in meta.fields}
+        values['id'] = ''
+        return type(meta)(**values)
+    return {key: value for key, value in meta.items() if key != 'id'}
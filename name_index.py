@@ -0,0 +1,126 @@
+class NameIndex:
+    """
+    Tree-wide index of node names for PathTree.search, and of lower-cased
+    absolute paths for PathTree.find_path.
+
+    Exact lookups go through a name -> nodes map.  Substring lookups intersect
+    the trigram postings of the query to find candidate names, then confirm
+    each candidate with a plain `in` check.  Postings hold distinct names, not
+    nodes, so a name shared by many files is only indexed once.  New names wait
+    in `pending` until the next substring search indexes their trigrams, so
+    loading a large tree doesn't pay for postings nobody may query.
+
+    `paths` maps path_lower to a node.  Paths differing only in case keep the
+    first node; lookups that miss fall back to walking the tree.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.trigrams = {}
+        self.pending = {}
+        self.paths = {}
+
+    def __len__(self):
+        return sum(len(_) for _ in self.names.values())
+
+    @staticmethod
+    def _trigrams(name):
+        return {name[i:i + 3] for i in range(len(name) - 2)}
+
+    @staticmethod
+    def _path_key(node):
+        path = node._path or node._build_path()
+        key = path.lower()
+        # Most paths are already lower case; share the string rather than keep two copies
+        return path if key == path else key
+
+    def add(self, node):
+        self.add_name(node)
+        self.paths.setdefault(self._path_key(node), node)
+
+    def discard(self, node):
+        self._discard_path(node)
+        self.discard_name(node)
+
+    def _discard_path(self, node):
+        key = self._path_key(node)
+        if self.paths.get(key) is node:
+            del self.paths[key]
+
+    def add_name(self, node):
+        name = node.value
+        if not isinstance(name, str):
+            return
+        nodes = self.names.get(name)
+        if nodes is None:
+            nodes = self.names[name] = {}
+            self.pending[name] = None
+        nodes[id(node)] = node
+
+    def discard_name(self, node):
+        name = node.value
+        nodes = self.names.get(name)
+        if nodes is None or nodes.pop(id(node), None) is None or nodes:
+            return
+        del self.names[name]
+        if self.pending.pop(name, 0) is None:
+            return
+        for gram in self._trigrams(name):
+            posting = self.trigrams[gram]
+            del posting[name]
+            if not posting:
+                del self.trigrams[gram]
+
+    def add_subtree(self, node):
+        for _ in node.walk():
+            self.add(_)
+
+    def discard_subtree(self, node):
+        for _ in node.walk():
+            self.discard(_)
+
+    def add_paths(self, node):
+        for _ in node.walk():
+            self.paths.setdefault(self._path_key(_), _)
+
+    def discard_paths(self, node):
+        for _ in node.walk():
+            self._discard_path(_)
+
+    def find_path(self, path_lower):
+        return self.paths.get(path_lower)
+
+    def _index_pending(self):
+        trigrams = self.trigrams
+        for name in self.pending:
+            for gram in self._trigrams(name):
+                posting = trigrams.get(gram)
+                if posting is None:
+                    posting = trigrams[gram] = {}
+                posting[name] = None
+        self.pending = {}
+
+    def _candidate_names(self, target):
+        if self.pending:
+            self._index_pending()
+        if len(target) < 3:
+            return (name for name in self.names if target in name)
+        postings = []
+        for gram in self._trigrams(target):
+            posting = self.trigrams.get(gram)
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        smallest, rest = postings[0], postings[1:]
+        return (
+            name for name in smallest
+            if all(name in posting for posting in rest) and target in name
+        )
+
+    def search(self, target, exact=False):
+        if exact:
+            names = (target,) if target in self.names else ()
+        else:
+            names = self._candidate_names(target)
+        return [node for name in names for node in self.names[name].values()]
@@ -0,0 +1,100 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import functools
+import threading
+import time
+
+
+# Upper bounds, in seconds, of the API latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class Stats:
+    """
+    Process-wide counters for the `stats` command and --profile report.
+
+    `counters` are plain totals (pages, entries, bytes), `timings` map a name
+    to [count, total seconds, max seconds], and `api` maps an endpoint to its
+    timing plus a latency histogram over LATENCY_BUCKETS.  Everything is cheap
+    enough to leave on; per-node tree operations are deliberately not timed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.timings = {}
+            self.api = {}
+
+    def add(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record(self, name, seconds):
+        with self._lock:
+            timing = self.timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def record_call(self, endpoint, seconds):
+        with self._lock:
+            call = self.api.get(endpoint)
+            if call is None:
+                call = self.api[endpoint] = {'timing': [0, 0.0, 0.0], 'histogram': [0] * (len(LATENCY_BUCKETS) + 1)}
+            timing = call['timing']
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            call['histogram'][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """
+        Decorator recording every call of the function under `name`.
+        """
+        def wrapper(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return inner
+        return wrapper
+
+    def response_hook(self, response, *args, **kwargs):
+        """
+        requests response hook recording each Dropbox API call on a session.
+        The latency is the time to the response headers, so streamed download
+        bodies don't count towards it.
+        """
+        self.record_call(response.request.path_url.split('?')[0], response.elapsed.total_seconds())
+        body = response.request.body
+        if body and response.request.headers.get('Content-Type') == 'application/octet-stream':
+            self.add('bytes sent', len(body))
+        if 'Dropbox-API-Result' in response.headers:
+            self.add('bytes received', int(response.headers.get('Content-Length') or 0))
+        return response
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'timings': {name: list(timing) for name, timing in self.timings.items()},
+                'api': {
+                    endpoint: {'timing': list(call['timing']), 'histogram': list(call['histogram'])}
+                    for endpoint, call in self.api.items()
+                },
+            }
+
+
+STATS = Stats()
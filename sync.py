@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from content_hash import content_hashes
+
+
+class SyncPlan:
+    """
+    What a sync of a PathTree subtree into a local directory has to transfer.
+
+    `downloads` and `unchanged` hold (node, local_path) pairs; `folders` the
+    local directories to create.
+    """
+
+    def __init__(self):
+        self.downloads = []
+        self.unchanged = []
+        self.folders = []
+
+    @property
+    def bytes_to_transfer(self):
+        return sum(_size(node) for node, _ in self.downloads)
+
+    @property
+    def bytes_avoided(self):
+        return sum(_size(node) for node, _ in self.unchanged)
+
+
+def _size(node):
+    size = node.meta.get('size')
+    return size if isinstance(size, int) else 0
+
+
+def plan_sync(node, local_dir, workers=4):
+    """
+    Compare the subtree under `node` with `local_dir`.
+
+    Files missing locally or whose size differs are downloaded without hashing.
+    The rest are hashed in parallel and compared with the content_hash Dropbox
+    reported; files without a remote hash are always transferred.
+    """
+    plan = SyncPlan()
+    local_dir = Path(local_dir)
+    base = len(node.get_path().rstrip('/'))
+    to_hash = []
+    for child in node.walk():
+        local_path = local_dir.joinpath(child.get_path()[base:].lstrip('/'))
+        if child.is_folder:
+            plan.folders.append(local_path)
+        elif not local_path.is_file() or local_path.stat().st_size != _size(child):
+            plan.downloads.append((child, local_path))
+        elif not child.meta.get('content_hash'):
+            plan.downloads.append((child, local_path))
+        else:
+            to_hash.append((child, local_path))
+    hashes = content_hashes([local_path for _, local_path in to_hash], workers=workers)
+    for child, local_path in to_hash:
+        if hashes[local_path] == child.meta.get('content_hash'):
+            plan.unchanged.append((child, local_path))
+        else:
+            plan.downloads.append((child, local_path))
+    return plan
@@ -0,0 +1,106 @@
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+import requests
+
+from benchmarks.fakes import FakeDropboxClient, content_rev
+from transfer import download_file
+
+
+class StreamingDownloadTests(TestCase):
+
+    def setUp(self):
+        self.content = b'0123456789abcdef'
+        self.client = FakeDropboxClient(contents={'/big.bin': self.content})
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.target = Path(tmp.name).joinpath('big.bin')
+        self.partial = Path(tmp.name).joinpath('big.bin.part')
+        self.pin = Path(tmp.name).joinpath('big.bin.part.rev')
+
+    def write_partial(self, data, content=None):
+        content = self.content if content is None else content
+        self.partial.write_bytes(data)
+        self.pin.write_text('{} {}'.format(content_rev(content), len(content)))
+
+    def revs(self):
+        return [_[3] for _ in self.client.calls if _[0] == 'files_download']
+
+    def range_headers(self):
+        return [_[2] for _ in self.client.calls if _[0] == 'files_download']
+
+    def test_download_writes_whole_file_and_removes_partial(self):
+        size = download_file(self.client, '/big.bin', self.target, chunk_size=3)
+        self.assertEqual(size, len(self.content))
+        self.assertEqual(self.target.read_bytes(), self.content)
+        self.assertFalse(self.partial.exists())
+
+    def test_dropped_connection_resumes_from_partial_offset(self):
+        self.client.drops['/big.bin'] = 6
+        download_file(self.client, '/big.bin', self.target, chunk_size=2)
+        self.assertEqual(self.target.read_bytes(), self.content)
+        self.assertEqual(self.range_headers(), [None, {'Range': 'bytes=6-'}])
+        self.assertEqual(self.revs(), [None, content_rev(self.content)])
+        self.assertFalse(self.pin.exists())
+
+    def test_existing_partial_file_is_resumed(self):
+        self.write_partial(self.content[:10])
+        download_file(self.client, '/big.bin', self.target)
+        self.assertEqual(self.target.read_bytes(), self.content)
+        self.assertEqual(self.range_headers(), [{'Range': 'bytes=10-'}])
+
+    def test_complete_partial_file_is_moved_into_place(self):
+        self.write_partial(self.content)
+        download_file(self.client, '/big.bin', self.target)
+        self.assertEqual(self.target.read_bytes(), self.content)
+        self.assertEqual(self.range_headers(), [{'Range': 'bytes=16-'}])
+
+    def test_partial_file_without_revision_is_downloaded_again(self):
+        self.partial.write_bytes(b'XXXXXX')
+        download_file(self.client, '/big.bin', self.target)
+        self.assertEqual(self.target.read_bytes(), self.content)
+        self.assertEqual(self.range_headers(), [None])
+
+    def test_remote_change_between_drop_and_resume_starts_over(self):
+        changed = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        original = self.client.files_download
+
+        def change_after_drop(path, rev=None, extra_headers=None):
+            if extra_headers:
+                self.client.contents[path] = changed
+            return original(path, rev, extra_headers)
+
+        self.client.drops['/big.bin'] = 6
+        self.client.files_download = change_after_drop
+        download_file(self.client, '/big.bin', self.target, chunk_size=2)
+        self.assertEqual(self.target.read_bytes(), changed)
+        self.assertEqual(self.range_headers(), [None, {'Range': 'bytes=6-'}, None])
+
+    def test_stale_partial_of_the_remote_size_is_downloaded_again(self):
+        self.write_partial(b'X' * 16, content=b'Y' * 16)
+        download_file(self.client, '/big.bin', self.target)
+        self.assertEqual(self.target.read_bytes(), self.content)
+
+    def test_partial_longer_than_the_remote_file_is_downloaded_again(self):
+        self.write_partial(self.content + b'extra')
+        download_file(self.client, '/big.bin', self.target)
+        self.assertEqual(self.target.read_bytes(), self.content)
+        self.assertEqual(self.range_headers(), [{'Range': 'bytes=21-'}, None])
+
+    def test_gives_up_after_retries_and_keeps_partial(self):
+        calls = {'count': 0}
+        original = self.client.files_download
+
+        def always_drop(path, rev=None, extra_headers=None):
+            calls['count'] += 1
+            self.client.drops[path] = 2
+            return original(path, rev, extra_headers)
+
+        self.client.files_download = always_drop
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            download_file(self.client, '/big.bin', self.target, chunk_size=1, retries=2)
+        self.assertEqual(calls['count'], 3)
+        self.assertFalse(self.target.exists())
+        self.assertTrue(self.partial.exists())
+        self.assertTrue(self.pin.exists())
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from benchmarks.fakes import FakeDropboxClient
+from dropbox_cli import DropboxCLI
+from exceptions import InvalidPath
+from tree import PathTree
+from transfer import DownloadScheduler
+
+
+class GetCommandTests(TestCase):
+
+    def setUp(self):
+        self.contents = {'/docs/a.txt': b'aaa', '/docs/b.txt': b'bb', '/docs/c.md': b'c', '/docs/my file.txt': b'x'}
+        self.client = FakeDropboxClient(contents=self.contents)
+        tree = PathTree(root=True)
+        tree.bulk_insert((path, {'type': 'file'}) for path in self.contents)
+        self.cli = DropboxCLI(tree, client=self.client)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dest = Path(tmp.name)
+
+    def downloaded(self):
+        return sorted(_.name for _ in self.dest.iterdir())
+
+    def test_get_single_file(self):
+        self.cli._get('/docs/a.txt', str(self.dest))
+        self.assertEqual(self.dest.joinpath('a.txt').read_bytes(), b'aaa')
+
+    def test_get_many_files_with_a_glob(self):
+        self.cli.do_get('-t /docs/*.txt -d {}'.format(self.dest))
+        self.assertEqual(self.downloaded(), ['a.txt', 'b.txt', 'my file.txt'])
+
+    def test_get_unquoted_name_with_spaces(self):
+        self.cli.do_get('-t /docs/my file.txt -d {}'.format(self.dest))
+        self.assertEqual(self.downloaded(), ['my file.txt'])
+
+    def test_get_relative_targets(self):
+        self.cli.current_node = self.cli.tree.find_path('/docs')
+        self.cli.do_get('-t a.txt c.md -d {}'.format(self.dest))
+        self.assertEqual(self.downloaded(), ['a.txt', 'c.md'])
+
+    def test_unknown_target_raises_invalid_path(self):
+        with self.assertRaises(InvalidPath):
+            self.cli._expand_targets(['/docs/nope.txt'])
+
+    def test_targets_with_the_same_name_are_refused(self):
+        self.cli.tree.insert_path('/other/a.txt').meta = {'type': 'file'}
+        with self.assertRaises(InvalidPath):
+            self.cli._get_many(self.cli._expand_targets(['/*/a.txt']), str(self.dest))
+        self.assertEqual(self.downloaded(), [])
+        self.assertEqual(self.client.calls, [])
+
+    def test_failed_file_does_not_abort_batch(self):
+        self.client.failing.add('/docs/b.txt')
+        nodes = self.cli._expand_targets(['/docs/*.txt'])
+        results = self.cli._get_many(nodes, str(self.dest))
+        self.assertEqual([_.ok for _ in results], [True, False, True])
+        self.assertEqual(self.downloaded(), ['a.txt', 'my file.txt'])
+
+
+class DownloadSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.contents = {'/f{}'.format(idx): b'x' * idx for idx in range(12)}
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dest = Path(tmp.name)
+        self.jobs = [(path, self.dest.joinpath(path[1:])) for path in sorted(self.contents)]
+
+    def test_downloads_run_concurrently_up_to_worker_limit(self):
+        client = FakeDropboxClient(contents=self.contents, latency=0.02)
+        results = DownloadScheduler(client, workers=4).run(self.jobs)
+        self.assertTrue(all(_.ok for _ in results))
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLessEqual(client.max_in_flight, 4)
+
+    def test_results_keep_job_order(self):
+        client = FakeDropboxClient(contents=self.contents)
+        results = DownloadScheduler(client, workers=3).run(self.jobs)
+        self.assertEqual([_.remote_path for _ in results], [_[0] for _ in self.jobs])
+
+    def test_progress_reports_aggregate_counts(self):
+        client = FakeDropboxClient(contents=self.contents)
+        calls = []
+        DownloadScheduler(client, workers=2, progress=lambda *args: calls.append(args)).run(self.jobs)
+        self.assertEqual([_[0] for _ in calls], list(range(1, 13)))
+        self.assertEqual(calls[-1], (12, 12, sum(range(12))))
+
+    def test_shared_executor_is_bounded_by_workers_and_left_running(self):
+        client = FakeDropboxClient(contents=self.contents, latency=0.02)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = DownloadScheduler(client, workers=2, executor=executor).run(self.jobs)
+            self.assertTrue(all(_.ok for _ in results))
+            self.assertEqual(executor.submit(len, 'abc').result(), 3)
+        self.assertLessEqual(client.max_in_flight, 2)
@@ -0,0 +1,95 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from dropbox import files
+from dropbox.exceptions import ApiError
+import requests
+
+from benchmarks.fakes import FakeDropboxClient
+from dropbox_cli import DropboxCLI
+from meta import FileMeta, FolderMeta
+from tree import PathTree
+import transfer
+
+
+class RecursiveGetTests(TestCase):
+
+    def setUp(self):
+        self.contents = {
+            '/photos/a.jpg': b'a' * 10,
+            '/photos/2017/b.jpg': b'b' * 20,
+            '/photos/2017/c.jpg': b'c' * 30,
+        }
+        self.client = FakeDropboxClient(contents=self.contents)
+        tree = PathTree(root=True)
+        tree.insert_path('/photos').meta = FolderMeta()
+        tree.insert_path('/photos/2017').meta = FolderMeta()
+        tree.insert_path('/photos/empty').meta = FolderMeta()
+        for path, content in self.contents.items():
+            tree.insert_path(path).meta = FileMeta(size=len(content))
+        self.cli = DropboxCLI(tree, client=self.client)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dest = Path(tmp.name)
+
+    def local_files(self):
+        return sorted(str(_.relative_to(self.dest)) for _ in self.dest.rglob('*') if _.is_file())
+
+    def api_calls(self):
+        return sorted(set(_[0] for _ in self.client.calls))
+
+    def test_folder_of_small_files_uses_zip_stream(self):
+        results = self.cli._get_folder(self.cli.tree.find_path('/photos'), str(self.dest))
+        self.assertEqual(self.api_calls(), ['files_download_zip'])
+        self.assertEqual(self.local_files(), ['photos/2017/b.jpg', 'photos/2017/c.jpg', 'photos/a.jpg'])
+        self.assertEqual(sorted(_.remote_path for _ in results), sorted(self.contents))
+
+    def test_refused_zip_falls_back_to_per_file(self):
+        def refuse(path):
+            self.client.calls.append(('files_download_zip', path))
+            raise ApiError('request-id', files.DownloadZipError.too_many_files, None, None)
+
+        self.client.files_download_zip = refuse
+        results = self.cli._get_folder(self.cli.tree.find_path('/photos'), str(self.dest))
+        self.assertEqual(self.api_calls(), ['files_download', 'files_download_zip'])
+        self.assertTrue(all(_.ok for _ in results))
+        self.assertEqual(self.local_files(), ['photos/2017/b.jpg', 'photos/2017/c.jpg', 'photos/a.jpg'])
+
+    def test_dropped_zip_stream_falls_back_to_per_file(self):
+        def drop(path):
+            raise requests.exceptions.ConnectionError('connection dropped')
+
+        self.client.files_download_zip = drop
+        out = StringIO()
+        with redirect_stdout(out):
+            self.cli.onecmd('get -r -t /photos -d {}'.format(self.dest))
+        self.assertIn('Downloaded 3 of 3 files', out.getvalue())
+
+    def test_folder_of_large_files_downloads_per_file(self):
+        for node in self.cli.tree.find_path('/photos').walk():
+            if node.meta.get('type') == 'file':
+                node.meta = FileMeta(size=transfer.ZIP_MAX_AVERAGE_SIZE * 2)
+        self.cli._get_folder(self.cli.tree.find_path('/photos'), str(self.dest))
+        self.assertEqual(self.api_calls(), ['files_download'])
+        self.assertEqual(self.local_files(), ['photos/2017/b.jpg', 'photos/2017/c.jpg', 'photos/a.jpg'])
+        self.assertTrue(self.dest.joinpath('photos', 'empty').is_dir())
+
+    def test_get_folder_without_recursive_flag_is_refused(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            self.cli.do_get('-t /photos -d {}'.format(self.dest))
+        self.assertIn('/photos is a folder', out.getvalue())
+        self.assertEqual(self.client.calls, [])
+
+    def test_get_recursive_command(self):
+        self.cli.do_get('-r -t /photos/2017 -d {}'.format(self.dest))
+        self.assertEqual(self.local_files(), ['2017/b.jpg', '2017/c.jpg'])
+
+    def test_prefer_zip(self):
+        self.assertFalse(transfer.prefer_zip(1, 10))
+        self.assertTrue(transfer.prefer_zip(100, 100 * 1024))
+        self.assertFalse(transfer.prefer_zip(100, 100 * transfer.ZIP_MAX_AVERAGE_SIZE * 2))
+        self.assertFalse(transfer.prefer_zip(transfer.ZIP_MAX_FILES + 1, 10))
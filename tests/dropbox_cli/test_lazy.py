@@ -0,0 +1,76 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from dropbox_cli import DropboxCLI
+from lazy_tree import LazyLoader
+from utils import DropboxUtils
+
+
+class LazyDropboxCommandTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([[
+            folder_entry('/docs'),
+            folder_entry('/docs/old'),
+            file_entry('/docs/old/report.txt', size=6),
+            folder_entry('/archive'),
+        ]], contents={'/docs/old/report.txt': b'report'})
+        self.loader = LazyLoader(DropboxUtils(client=self.client))
+        self.tree = self.loader.load()
+        self.cli = DropboxCLI(self.tree, client=self.client, loader=self.loader)
+        self.cli.batch_poll_interval = 0
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.local = Path(tmp.name)
+
+    def run_cmd(self, line):
+        out = StringIO()
+        with redirect_stdout(out):
+            self.cli.onecmd(line)
+        return out.getvalue()
+
+    def test_get_file_in_unlisted_folder(self):
+        self.run_cmd('get -t docs/old/report.txt -d {}'.format(self.local))
+        self.assertEqual(self.local.joinpath('report.txt').read_bytes(), b'report')
+
+    def test_get_glob_lists_the_folders_it_matches_in(self):
+        self.run_cmd('get -t docs/*/*.txt -d {}'.format(self.local))
+        self.assertEqual(self.local.joinpath('report.txt').read_bytes(), b'report')
+
+    def test_get_recursive_lists_the_subtree(self):
+        self.run_cmd('get -r -t docs -d {}'.format(self.local))
+        self.assertEqual(self.local.joinpath('docs', 'old', 'report.txt').read_bytes(), b'report')
+
+    def test_sync_lists_the_subtree(self):
+        self.run_cmd('sync docs {}'.format(self.local))
+        self.assertEqual(self.local.joinpath('old', 'report.txt').read_bytes(), b'report')
+
+    def test_put_into_unlisted_folder_keeps_its_listing(self):
+        source = self.local.joinpath('new.txt')
+        source.write_bytes(b'new')
+        self.run_cmd('put {} -d docs/old'.format(source))
+        self.assertEqual(self.client.contents['/docs/old/new.txt'], b'new')
+        self.assertEqual(sorted(_.value for _ in self.tree.find_path('/docs/old').children), ['new.txt', 'report.txt'])
+
+    def test_rm_in_unlisted_folder(self):
+        self.run_cmd('rm docs/old/report.txt')
+        self.assertEqual(self.client.contents, {})
+        self.assertEqual(self.tree.find_path('/docs/old').children, [])
+
+    def test_mv_into_unlisted_folder(self):
+        self.run_cmd('mv docs/old/report.txt archive')
+        self.assertEqual(list(self.client.contents), ['/archive/report.txt'])
+        self.assertIsNotNone(self.tree.find_path('/archive/report.txt'))
+        self.assertIsNone(self.tree.find_path('/docs/old/report.txt'))
+
+    def test_cp_of_unlisted_folder_copies_its_contents(self):
+        self.run_cmd('cp docs /backup')
+        self.assertIn('/backup/old/report.txt', self.client.contents)
+        self.assertIsNotNone(self.tree.find_path('/backup/old/report.txt'))
+
+    def test_du_lists_the_subtree(self):
+        self.assertIn('6 B         1 files  /docs', self.run_cmd('du'))
@@ -0,0 +1,152 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+
+import dropbox
+from dropbox import files
+import requests
+
+from benchmarks.fakes import FakeDropboxClient
+from dropbox_cli import DropboxCLI
+from exceptions import InvalidPath
+from meta import FileMeta, FolderMeta
+from tree import PathTree
+import batch
+
+
+class MutationCommandTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient(contents={
+            '/docs/a.txt': b'a',
+            '/docs/b.txt': b'b',
+            '/docs/sub/c.txt': b'c',
+            '/archive/old.txt': b'o',
+        })
+        tree = PathTree(root=True)
+        for folder in ('/docs', '/docs/sub', '/archive'):
+            tree.insert_path(folder).meta = FolderMeta()
+        for path, content in self.client.contents.items():
+            tree.insert_path(path).meta = FileMeta(size=len(content))
+        self.cli = DropboxCLI(tree, client=self.client)
+        self.cli.batch_poll_interval = 0
+        self.tree = tree
+
+    def names(self, path):
+        return sorted(_.value for _ in self.tree.find_path(path).children)
+
+    def test_rm_many_paths_in_one_batch(self):
+        self.cli.do_rm('/docs/*.txt /archive')
+        self.assertEqual(self.client.calls, [('files_delete_batch', ['/docs/a.txt', '/docs/b.txt', '/archive'])])
+        self.assertEqual(self.names('/docs'), ['sub'])
+        self.assertIsNone(self.tree.find_path('/archive'))
+        self.assertEqual(sorted(self.client.contents), ['/docs/sub/c.txt'])
+
+    def test_rm_polls_async_job(self):
+        self.client.async_batches = True
+        results = self.cli._rm([self.tree.find_path('/docs/a.txt')])
+        self.assertTrue(results[0].ok)
+        self.assertEqual([_[0] for _ in self.client.calls], ['files_delete_batch', 'check', 'check'])
+        self.assertIsNone(self.tree.find_path('/docs/a.txt'))
+
+    def test_rm_failure_leaves_node_in_tree(self):
+        del self.client.contents['/docs/a.txt']
+        results = self.cli._rm([self.tree.find_path('/docs/a.txt'), self.tree.find_path('/docs/b.txt')])
+        self.assertEqual([_.ok for _ in results], [False, True])
+        self.assertEqual(self.names('/docs'), ['a.txt', 'sub'])
+
+    def test_rm_last_find_results(self):
+        self.cli.last_found = self.cli.tree.search('.txt')
+        self.cli.do_rm('--found')
+        self.assertEqual(self.client.contents, {})
+
+    def test_rm_path_also_in_last_find_is_deleted_once(self):
+        self.cli.last_found = self.cli.tree.search('a.txt')
+        self.cli.do_rm('/docs/a.txt /docs/?.txt --found')
+        self.assertEqual(self.client.calls, [('files_delete_batch', ['/docs/a.txt', '/docs/b.txt'])])
+
+    def test_rm_root_is_refused(self):
+        with self.assertRaises(InvalidPath):
+            self.cli._mutation_targets(['/'], False)
+
+    def test_mv_into_folder_moves_subtree(self):
+        self.cli.do_mv('/docs/sub /docs/a.txt /archive')
+        self.assertEqual(self.names('/archive'), ['a.txt', 'old.txt', 'sub'])
+        self.assertEqual(self.names('/docs'), ['b.txt'])
+        self.assertEqual(self.tree.find_path('/archive/sub/c.txt').meta['size'], 1)
+        self.assertIn('/archive/sub/c.txt', self.client.contents)
+
+    def test_mv_single_item_renames(self):
+        self.cli.do_mv('/docs/a.txt /docs/renamed.txt')
+        self.assertEqual(self.names('/docs'), ['b.txt', 'renamed.txt', 'sub'])
+        self.assertEqual(self.tree.search('renamed', exact=False)[0].get_path(), '/docs/renamed.txt')
+
+    def test_mv_many_items_to_non_folder_is_refused(self):
+        with self.assertRaises(InvalidPath):
+            self.cli._relocate([self.tree.find_path('/docs/a.txt'), self.tree.find_path('/docs/b.txt')], '/nope')
+
+    def test_cp_into_folder_clones_subtree(self):
+        self.client.async_batches = True
+        self.cli.do_cp('/docs/sub /archive')
+        self.assertEqual(self.names('/archive'), ['old.txt', 'sub'])
+        self.assertEqual(self.names('/docs/sub'), ['c.txt'])
+        self.assertIsNot(self.tree.find_path('/archive/sub'), self.tree.find_path('/docs/sub'))
+        self.assertIsNotNone(self.tree.find_path('/archive/sub/c.txt'))
+
+    def test_cp_clears_ids_below_the_copy(self):
+        original = self.tree.find_path('/docs/sub/c.txt')
+        original.meta = FileMeta(id='id:c', size=1)
+        self.cli.do_cp('/docs/sub /archive')
+        copied = self.tree.find_path('/archive/sub/c.txt').meta
+        self.assertEqual(copied['id'], '')
+        self.assertEqual(copied['size'], 1)
+        self.assertEqual(original.meta['id'], 'id:c')
+
+    def test_cp_conflict_is_reported_and_tree_unchanged(self):
+        results = self.cli._relocate([self.tree.find_path('/docs/a.txt')], '/archive/old.txt', copy=True)
+        self.assertFalse(results[0].ok)
+        self.assertEqual(self.names('/archive'), ['old.txt'])
+
+
+    def run_cmd(self, line):
+        out = StringIO()
+        with redirect_stdout(out):
+            self.cli.onecmd(line)
+        return out.getvalue()
+
+    def test_rm_failed_job_is_reported_and_tree_unchanged(self):
+        self.client.async_batches = True
+        self.client.files_delete_batch_check = lambda job_id: files.DeleteBatchJobStatus.failed(
+            files.DeleteBatchError.other)
+        self.assertIn('Delete failed', self.run_cmd('rm /docs/a.txt'))
+        self.assertEqual(self.names('/docs'), ['a.txt', 'b.txt', 'sub'])
+
+    def test_mv_network_error_is_reported_and_tree_unchanged(self):
+        def drop(entries, **kwargs):
+            raise requests.exceptions.ConnectionError('connection dropped')
+
+        self.client.files_move_batch_v2 = drop
+        self.assertIn('Move failed', self.run_cmd('mv /docs/a.txt /archive'))
+        self.assertEqual(self.names('/docs'), ['a.txt', 'b.txt', 'sub'])
+        self.assertEqual(self.names('/archive'), ['old.txt'])
+
+
+class BatchWaitTests(TestCase):
+
+    def test_unknown_job_status_stops_polling(self):
+        launch = files.DeleteBatchLaunch.async_job_id('job-0')
+        with self.assertRaises(dropbox.exceptions.DropboxException):
+            batch._wait(launch, lambda job_id: files.DeleteBatchJobStatus.other, 0)
+
+    def test_unknown_launch_result_is_an_error(self):
+        with self.assertRaises(dropbox.exceptions.DropboxException):
+            batch._wait(files.DeleteBatchLaunch.other, None, 0)
+
+
+class BatchChunkingTests(TestCase):
+
+    def test_large_requests_are_split_into_batches(self):
+        client = FakeDropboxClient(contents={'/f{}'.format(idx): b'' for idx in range(batch.MAX_BATCH_SIZE + 5)})
+        results = batch.delete_batch(client, sorted(client.contents))
+        self.assertEqual(len(results), batch.MAX_BATCH_SIZE + 5)
+        self.assertEqual([len(_[1]) for _ in client.calls], [batch.MAX_BATCH_SIZE, 5])
@@ -0,0 +1,117 @@
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from benchmarks.fakes import FakeDropboxClient
+from dropbox_cli import DropboxCLI
+from exceptions import InvalidPath
+from transfer import UploadScheduler
+from tree import PathTree
+
+
+class PutCommandTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient(contents={'/docs/existing.txt': b'old'})
+        tree = PathTree(root=True)
+        tree.insert_path('/docs').meta = {'type': 'folder'}
+        tree.insert_path('/docs/existing.txt').meta = {'type': 'file'}
+        self.cli = DropboxCLI(tree, client=self.client)
+        self.cli.current_node = tree.find_path('/docs')
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.local = Path(tmp.name)
+
+    def make_file(self, name, content):
+        path = self.local.joinpath(name)
+        path.write_bytes(content)
+        return path
+
+    def test_put_uploads_into_current_folder_and_updates_tree(self):
+        self.make_file('a.txt', b'hello')
+        self.cli.do_put(str(self.local.joinpath('a.txt')))
+        self.assertEqual(self.client.contents['/docs/a.txt'], b'hello')
+        node = self.cli.tree.find_path('/docs/a.txt')
+        self.assertEqual(node.meta['type'], 'file')
+        self.assertEqual(node.meta['size'], 5)
+
+    def test_put_expands_local_wildcards(self):
+        self.make_file('a.txt', b'a')
+        self.make_file('b.txt', b'b')
+        self.make_file('c.md', b'c')
+        self.cli.do_put(str(self.local.joinpath('*.txt')))
+        self.assertEqual(sorted(self.client.contents), ['/docs/a.txt', '/docs/b.txt', '/docs/existing.txt'])
+
+    def test_put_to_another_folder(self):
+        self.cli.tree.insert_path('/other').meta = {'type': 'folder'}
+        self.make_file('a.txt', b'a')
+        self.cli._put([str(self.local.joinpath('a.txt'))], '/other')
+        self.assertIsNotNone(self.cli.tree.find_path('/other/a.txt'))
+
+    def test_put_commits_all_files_in_one_batch(self):
+        for idx in range(5):
+            self.make_file('f{}.txt'.format(idx), b'x')
+        self.cli._put([str(self.local.joinpath('*.txt'))])
+        finishes = [_ for _ in self.client.calls if _[0] == 'files_upload_session_finish_batch_v2']
+        self.assertEqual(finishes, [('files_upload_session_finish_batch_v2', 5)])
+
+    def test_conflict_is_reported_without_aborting_batch(self):
+        self.make_file('existing.txt', b'new')
+        self.make_file('fresh.txt', b'new')
+        results = self.cli._put([str(self.local.joinpath('*.txt'))])
+        self.assertEqual([_.ok for _ in results], [False, True])
+        self.assertEqual(self.client.contents['/docs/existing.txt'], b'old')
+
+    def test_overwrite_replaces_existing_file(self):
+        self.make_file('existing.txt', b'new')
+        self.cli._put([str(self.local.joinpath('existing.txt'))], overwrite=True)
+        self.assertEqual(self.client.contents['/docs/existing.txt'], b'new')
+
+    def test_missing_local_file_raises_invalid_path(self):
+        with self.assertRaises(InvalidPath):
+            self.cli._put([str(self.local.joinpath('nope.txt'))])
+
+    def test_destination_must_be_a_folder(self):
+        self.make_file('a.txt', b'a')
+        with self.assertRaises(InvalidPath):
+            self.cli._put([str(self.local.joinpath('a.txt'))], 'existing.txt')
+
+
+class UploadSchedulerTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.local = Path(tmp.name)
+
+    def test_large_file_is_uploaded_in_chunks(self):
+        path = self.local.joinpath('big.bin')
+        path.write_bytes(bytes(range(10)))
+        client = FakeDropboxClient()
+        results = UploadScheduler(client, chunk_size=4).run([(path, '/big.bin')])
+        self.assertTrue(results[0].ok)
+        self.assertEqual(client.contents['/big.bin'], bytes(range(10)))
+        self.assertEqual(client.calls[:3], [
+            ('files_upload_session_start', 4, False),
+            ('files_upload_session_append_v2', 4, False),
+            ('files_upload_session_append_v2', 2, True),
+        ])
+
+    def test_empty_file(self):
+        path = self.local.joinpath('empty')
+        path.write_bytes(b'')
+        client = FakeDropboxClient()
+        results = UploadScheduler(client).run([(path, '/empty')])
+        self.assertEqual(results[0].metadata.size, 0)
+        self.assertEqual(client.contents['/empty'], b'')
+
+    def test_uploads_run_concurrently(self):
+        jobs = []
+        for idx in range(8):
+            path = self.local.joinpath(str(idx))
+            path.write_bytes(b'x')
+            jobs.append((path, '/{}'.format(idx)))
+        client = FakeDropboxClient(latency=0.02)
+        UploadScheduler(client, workers=4).run(jobs)
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLessEqual(client.max_in_flight, 4)
@@ -0,0 +1,92 @@
+import hashlib
+from pathlib import Path
+import tempfile
+from unittest import TestCase, mock
+
+from benchmarks.fakes import FakeDropboxClient
+from content_hash import BLOCK_SIZE, content_hash, content_hashes
+from dropbox_cli import DropboxCLI
+from exceptions import InvalidPath
+from meta import FileMeta, FolderMeta
+from tree import PathTree
+
+
+def dropbox_hash(content):
+    blocks = [content[idx:idx + BLOCK_SIZE] for idx in range(0, len(content), BLOCK_SIZE)]
+    return hashlib.sha256(b''.join(hashlib.sha256(_).digest() for _ in blocks)).hexdigest()
+
+
+class ContentHashTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name).joinpath('file')
+
+    def test_hash_of_multi_block_file(self):
+        content = b'a' * BLOCK_SIZE + b'b' * 10
+        self.path.write_bytes(content)
+        self.assertEqual(content_hash(self.path), dropbox_hash(content))
+
+    def test_hash_of_empty_file(self):
+        self.path.write_bytes(b'')
+        self.assertEqual(content_hash(self.path), hashlib.sha256(b'').hexdigest())
+
+
+class SyncCommandTests(TestCase):
+
+    def setUp(self):
+        self.contents = {
+            '/music/same.mp3': b'same',
+            '/music/changed.mp3': b'new!',
+            '/music/missing.mp3': b'missing',
+            '/music/albums/track.mp3': b'track',
+        }
+        self.client = FakeDropboxClient(contents=self.contents)
+        tree = PathTree(root=True)
+        tree.insert_path('/music').meta = FolderMeta()
+        tree.insert_path('/music/albums').meta = FolderMeta()
+        for path, content in self.contents.items():
+            tree.insert_path(path).meta = FileMeta(size=len(content), content_hash=dropbox_hash(content))
+        self.cli = DropboxCLI(tree, client=self.client)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.local = Path(tmp.name)
+        self.local.joinpath('same.mp3').write_bytes(b'same')
+        self.local.joinpath('changed.mp3').write_bytes(b'old!')
+
+    def downloaded(self):
+        return sorted(_[1] for _ in self.client.calls if _[0] == 'files_download')
+
+    def test_only_missing_and_changed_files_are_transferred(self):
+        plan, results = self.cli._sync('/music', str(self.local))
+        self.assertEqual(self.downloaded(), ['/music/albums/track.mp3', '/music/changed.mp3', '/music/missing.mp3'])
+        self.assertTrue(all(_.ok for _ in results))
+        self.assertEqual(self.local.joinpath('changed.mp3').read_bytes(), b'new!')
+        self.assertEqual(self.local.joinpath('albums', 'track.mp3').read_bytes(), b'track')
+        self.assertEqual(plan.bytes_avoided, 4)
+        self.assertEqual(plan.bytes_to_transfer, 16)
+
+    def test_second_sync_transfers_nothing(self):
+        self.cli._sync('/music', str(self.local))
+        self.client.calls = []
+        plan, _ = self.cli._sync('/music', str(self.local))
+        self.assertEqual(self.downloaded(), [])
+        self.assertEqual(len(plan.unchanged), 4)
+
+    def test_dry_run_transfers_nothing(self):
+        plan, results = self.cli._sync('/music', str(self.local), dry_run=True)
+        self.assertEqual(self.client.calls, [])
+        self.assertEqual(results, [])
+        self.assertEqual(len(plan.downloads), 3)
+        self.assertFalse(self.local.joinpath('albums').exists())
+
+    def test_different_size_skips_hashing(self):
+        self.local.joinpath('changed.mp3').write_bytes(b'longer')
+        with mock.patch('sync.content_hashes', wraps=content_hashes) as hashes:
+            self.cli._sync('/music', str(self.local), dry_run=True)
+        self.assertEqual(hashes.call_args[0][0], [self.local.joinpath('same.mp3')])
+
+    def test_sync_of_a_file_is_refused(self):
+        with self.assertRaises(InvalidPath):
+            self.cli._sync('/music/same.mp3', str(self.local))
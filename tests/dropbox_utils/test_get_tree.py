@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from utils import DropboxUtils
+
+
+class GetTreeTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([
+            [folder_entry('/a'), file_entry('/a/one.txt', size=1)],
+            [folder_entry('/a/b'), file_entry('/a/b/two.txt', size=2)],
+        ])
+
+    def test_get_tree_builds_tree_from_every_page(self):
+        tree = DropboxUtils(client=self.client).get_tree()
+        self.assertEqual(tree.find_path('/a').meta['type'], 'folder')
+        self.assertEqual(tree.find_path('/a/one.txt').meta['size'], 1)
+        self.assertEqual(tree.find_path('/a/b/two.txt').meta['size'], 2)
+        self.assertEqual(self.client.calls, [
+            ('files_list_folder', '', True),
+            ('files_list_folder_continue', 'cursor-1'),
+        ])
+
+    def test_pages_are_not_kept_by_default(self):
+        dbutil = DropboxUtils(client=self.client)
+        dbutil.get_tree()
+        self.assertEqual(dbutil.pages, [])
+
+    def test_pages_are_kept_when_requested(self):
+        dbutil = DropboxUtils(client=self.client, keep_pages=True)
+        dbutil.get_tree()
+        self.assertEqual([_.cursor for _ in dbutil.pages], ['cursor-1', 'cursor-2'])
+
+    def test_listing_starts_at_configured_root(self):
+        DropboxUtils(client=self.client, root='/a').get_tree()
+        self.assertEqual(self.client.calls[0], ('files_list_folder', '/a', True))
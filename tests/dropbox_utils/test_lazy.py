@@ -0,0 +1,101 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from lazy_tree import LazyLoader
+from tree_fs import TreeFS
+from utils import DropboxUtils
+
+
+class LazyLoaderTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([[
+            folder_entry('/Docs'),
+            file_entry('/Docs/a.txt', size=1),
+            folder_entry('/Docs/Old'),
+            file_entry('/Docs/Old/b.txt', size=2),
+            file_entry('/top.txt', size=3),
+        ]])
+        self.loader = LazyLoader(DropboxUtils(client=self.client))
+        self.tree = self.loader.load()
+
+    def listings(self):
+        return [_[1:] for _ in self.client.calls if _[0] == 'files_list_folder']
+
+    def test_load_lists_only_the_root(self):
+        self.assertEqual(sorted(_.value for _ in self.tree.children), ['Docs', 'top.txt'])
+        self.assertEqual(self.tree.find_path('/Docs').children, [])
+        self.assertFalse(self.loader.is_expanded(self.tree.find_path('/Docs')))
+        self.assertEqual(self.listings(), [('', False)])
+
+    def test_expand_lists_a_folder_once(self):
+        docs = self.tree.find_path('/Docs')
+        self.loader.expand(docs)
+        self.loader.expand(docs)
+        self.assertEqual(sorted(_.value for _ in docs.children), ['Old', 'a.txt'])
+        self.assertEqual(docs.find_path('a.txt').meta['size'], 1)
+        self.assertEqual(self.listings(), [('', False), ('/Docs', False)])
+
+    def test_find_path_expands_folders_on_the_way(self):
+        node = self.loader.find_path(self.tree, '/Docs/Old/b.txt')
+        self.assertEqual(node.get_path(), '/Docs/Old/b.txt')
+        self.assertIsNone(self.loader.find_path(self.tree, '/Docs/missing'))
+
+    def test_recursive_expand_uses_one_listing(self):
+        self.loader.expand(self.tree, recursive=True)
+        self.assertIsNotNone(self.tree.find_path('/Docs/Old/b.txt'))
+        self.assertEqual(self.loader.unexpanded, {})
+        self.assertEqual(self.listings(), [('', False), ('', True)])
+        self.loader.expand(self.tree, recursive=True)
+        self.assertEqual(len(self.listings()), 2)
+
+    def test_expand_to_depth(self):
+        self.loader.expand_to_depth(self.tree, 2)
+        self.assertIsNotNone(self.tree.find_path('/Docs/Old'))
+        self.assertIsNone(self.tree.find_path('/Docs/Old/b.txt'))
+
+    def test_root_folder_keeps_full_paths(self):
+        loader = LazyLoader(DropboxUtils(client=self.client, root='/Docs'))
+        tree = loader.load()
+        self.assertIsNotNone(tree.find_path('/Docs/a.txt'))
+        self.assertIsNotNone(loader.find_path(tree, '/Docs/Old/b.txt'))
+
+
+class LazyCommandTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([[
+            folder_entry('/docs'),
+            folder_entry('/docs/old'),
+            file_entry('/docs/old/report.txt'),
+        ]])
+        self.loader = LazyLoader(DropboxUtils(client=self.client))
+        self.main = TreeFS(self.loader.load(), loader=self.loader)
+
+    def run_cmd(self, line):
+        out = StringIO()
+        with redirect_stdout(out):
+            self.main.onecmd(line)
+        return out.getvalue()
+
+    def test_cd_and_ls_list_folders_on_demand(self):
+        self.run_cmd('cd docs/old')
+        self.assertEqual(self.main.current_node.get_path(), '/docs/old')
+        self.assertIn('report.txt', self.run_cmd('ls'))
+
+    def test_relative_find_lists_the_subtree(self):
+        self.assertIn('No search results', self.run_cmd('find report'))
+        self.assertIn('/docs/old/report.txt', self.run_cmd('find -r report'))
+
+    def test_tree_lists_down_to_its_level(self):
+        self.assertEqual(self.run_cmd('tree -L 2 ascii').splitlines(), ['/', '.- docs', '   .- old'])
+        self.assertFalse(self.loader.is_expanded(self.main.tree.find_path('/docs/old')))
+        self.assertIn('report.txt', self.run_cmd('tree'))
+
+    def test_tree_with_limit_lists_only_what_it_draws(self):
+        self.assertEqual(self.run_cmd('tree -n 2 ascii').splitlines(), ['/', '.- docs', '... stopped after 2 lines'])
+        self.assertTrue(self.loader.is_expanded(self.main.tree.find_path('/docs')))
+        self.assertFalse(self.loader.is_expanded(self.main.tree.find_path('/docs/old')))
+        self.assertNotIn(('files_list_folder', '', True), self.client.calls)
@@ -0,0 +1,104 @@
+from pathlib import Path
+import tempfile
+from unittest import TestCase, mock
+
+from benchmarks.fakes import FakeDropboxClient, deleted_entry, file_entry, folder_entry
+import tree_cache
+from utils import DropboxUtils
+
+
+class RefreshTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([
+            [folder_entry('/a'), file_entry('/a/one.txt', size=1), file_entry('/a/two.txt', size=2)],
+        ])
+        self.dbutil = DropboxUtils(client=self.client)
+        self.tree = self.dbutil.get_tree()
+
+    def test_listing_records_final_cursor(self):
+        self.assertEqual(self.dbutil.cursor, 'cursor-1')
+
+    def test_refresh_applies_added_files(self):
+        self.client.pages.append([file_entry('/a/three.txt', size=3)])
+        self.dbutil.refresh(self.tree, self.dbutil.cursor)
+        self.assertEqual(self.tree.find_path('/a/three.txt').meta['size'], 3)
+        self.assertEqual(self.dbutil.cursor, 'cursor-2')
+
+    def test_refresh_applies_deletes(self):
+        self.client.pages.append([deleted_entry('/a/one.txt')])
+        self.dbutil.refresh(self.tree, self.dbutil.cursor)
+        self.assertIsNone(self.tree.find_path('/a/one.txt'))
+        self.assertEqual(['two.txt'], [_.value for _ in self.tree.find_path('/a').children])
+
+    def test_refresh_deletes_match_case_insensitively(self):
+        self.client.pages.append([deleted_entry('/A/ONE.txt')])
+        self.dbutil.refresh(self.tree, self.dbutil.cursor)
+        self.assertIsNone(self.tree.find_path('/a/one.txt'))
+
+    def test_refresh_places_entries_under_parent_of_any_case(self):
+        self.client.pages.append([file_entry('/A/three.txt', size=3)])
+        self.dbutil.refresh(self.tree, self.dbutil.cursor)
+        self.assertEqual(['a'], [_.value for _ in self.tree.children])
+        self.assertEqual(self.tree.find_path('/a/three.txt').meta['size'], 3)
+
+    def test_refresh_applies_case_only_renames(self):
+        self.client.pages.append([file_entry('/a/ONE.txt', size=1)])
+        self.dbutil.refresh(self.tree, self.dbutil.cursor)
+        self.assertEqual(['ONE.txt', 'two.txt'], sorted(_.value for _ in self.tree.find_path('/a').children))
+        self.assertEqual(self.tree.total_size, 3)
+
+    def test_refresh_applies_renames(self):
+        self.client.pages.append([deleted_entry('/a/two.txt'), file_entry('/a/renamed.txt', size=2)])
+        self.dbutil.refresh(self.tree, self.dbutil.cursor)
+        self.assertIsNone(self.tree.find_path('/a/two.txt'))
+        self.assertEqual(self.tree.find_path('/a/renamed.txt').meta['size'], 2)
+
+
+class LoadTreeTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('tree_cache.CACHE_PATH', Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = FakeDropboxClient([[folder_entry('/a'), file_entry('/a/one.txt', size=1)]])
+
+    def test_first_load_lists_account_and_saves_snapshot(self):
+        DropboxUtils(client=self.client).load_tree()
+        snapshot = tree_cache.load_snapshot(tree_cache.cache_file())
+        self.assertIsNotNone(snapshot)
+        tree, cursor = snapshot
+        self.assertEqual(cursor, 'cursor-1')
+        self.assertEqual(tree.find_path('/a/one.txt').meta['size'], 1)
+
+    def test_second_load_applies_only_changes_since_snapshot(self):
+        DropboxUtils(client=self.client).load_tree()
+        self.client.pages.append([file_entry('/a/two.txt', size=2)])
+        self.client.calls = []
+        tree = DropboxUtils(client=self.client).load_tree()
+        self.assertEqual(self.client.calls, [('files_list_folder_continue', 'cursor-1')])
+        self.assertEqual(tree.find_path('/a/two.txt').meta['size'], 2)
+        self.assertEqual(tree_cache.load_snapshot(tree_cache.cache_file())[1], 'cursor-2')
+
+    def test_expired_cursor_falls_back_to_full_listing(self):
+        DropboxUtils(client=self.client).load_tree()
+        self.client.expired.add('cursor-1')
+        self.client.calls = []
+        tree = DropboxUtils(client=self.client).load_tree()
+        self.assertEqual(self.client.calls[0], ('files_list_folder_continue', 'cursor-1'))
+        self.assertEqual(self.client.calls[1], ('files_list_folder', '', True))
+        self.assertIsNotNone(tree.find_path('/a/one.txt'))
+
+    def test_load_without_cache_does_not_write_snapshot(self):
+        DropboxUtils(client=self.client).load_tree(use_cache=False)
+        self.assertIsNone(tree_cache.load_snapshot(tree_cache.cache_file()))
+
+    def test_snapshot_round_trip_preserves_structure_and_meta(self):
+        tree = DropboxUtils(client=self.client).get_tree()
+        path = tree_cache.cache_file()
+        tree_cache.save_snapshot(path, tree, 'cursor')
+        loaded, cursor = tree_cache.load_snapshot(path)
+        self.assertEqual(list(tree_cache.iter_entries(loaded)), list(tree_cache.iter_entries(tree)))
+        self.assertEqual(cursor, 'cursor')
@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from benchmarks.fakes import FakeDropboxClient, deleted_entry, file_entry, folder_entry
+from utils import DropboxUtils
+
+
+class ShardedListingTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([[
+            folder_entry('/a'),
+            file_entry('/a/one.txt', size=1),
+            folder_entry('/a/b'),
+            file_entry('/a/b/two.txt', size=2),
+            folder_entry('/c'),
+            file_entry('/c/three.txt', size=3),
+            file_entry('/top.txt', size=4),
+        ]], page_size=1)
+        self.dbutil = DropboxUtils(client=self.client, list_workers=4)
+
+    def test_sharded_listing_builds_the_same_tree(self):
+        tree = self.dbutil.get_tree()
+        sequential = DropboxUtils(client=FakeDropboxClient(self.client.pages)).get_tree()
+        self.assertEqual(tree.display(), sequential.display())
+        self.assertEqual(tree.find_path('/a/b/two.txt').meta['size'], 2)
+        self.assertEqual(tree.total_size, 10)
+
+    def test_each_top_level_folder_is_its_own_recursive_listing(self):
+        self.dbutil.get_tree()
+        listings = sorted(_[1:] for _ in self.client.calls if _[0] == 'files_list_folder')
+        self.assertEqual(listings, [('', False), ('/a', True), ('/c', True)])
+
+    def test_refresh_continues_from_cursor_taken_before_the_shards(self):
+        tree = self.dbutil.get_tree()
+        self.assertEqual(self.client.calls[0], ('files_list_folder_get_latest_cursor', '', True))
+        self.assertEqual(self.dbutil.cursor, 'cursor-1')
+        self.client.pages.append([deleted_entry('/a/b/two.txt'), file_entry('/c/four.txt', size=4)])
+        self.dbutil.refresh(tree, self.dbutil.cursor)
+        self.assertIsNone(tree.find_path('/a/b/two.txt'))
+        self.assertEqual(tree.find_path('/c/four.txt').meta['size'], 4)
+
+    def test_shard_errors_are_raised(self):
+        def fail(path, recursive=False):
+            if recursive:
+                raise RuntimeError('listing failed')
+            return list_folder(path, recursive)
+        list_folder, self.client.files_list_folder = self.client.files_list_folder, fail
+        with self.assertRaises(RuntimeError):
+            self.dbutil.get_tree()
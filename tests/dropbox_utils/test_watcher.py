@@ -0,0 +1,102 @@
+from contextlib import redirect_stderr
+from io import StringIO
+import threading
+import time
+from unittest import TestCase
+
+from dropbox import files
+from dropbox.exceptions import ApiError
+
+from benchmarks.fakes import FakeDropboxClient, deleted_entry, file_entry, folder_entry
+from tree_fs import TreeFS
+from utils import DropboxUtils
+from watcher import TreeWatcher
+
+
+class TreeWatcherTests(TestCase):
+
+    def setUp(self):
+        self.client = FakeDropboxClient([[folder_entry('/a'), file_entry('/a/one.txt', size=1)]])
+        self.dbutil = DropboxUtils(client=self.client)
+        self.tree = self.dbutil.get_tree()
+        self.lock = threading.RLock()
+
+    def watcher(self, *batches):
+        self.client.longpoll_batches.extend(batches)
+        return TreeWatcher(self.dbutil, self.tree, self.lock, retry_delay=0)
+
+    def wait_for(self, condition, timeout=2):
+        deadline = time.time() + timeout
+        while not condition():
+            if time.time() > deadline:
+                self.fail('Timed out waiting for watcher')
+            time.sleep(0.01)
+
+    def test_poll_once_applies_adds_and_deletes(self):
+        watcher = self.watcher([file_entry('/a/two.txt', size=2), deleted_entry('/a/one.txt')])
+        self.assertTrue(watcher.poll_once())
+        self.assertIsNone(self.tree.find_path('/a/one.txt'))
+        self.assertEqual(self.tree.find_path('/a/two.txt').meta['size'], 2)
+        self.assertEqual(self.dbutil.cursor, 'cursor-2')
+
+    def test_poll_once_without_changes_leaves_tree_alone(self):
+        watcher = self.watcher()
+        self.assertFalse(watcher.poll_once())
+        self.assertEqual(['one.txt'], [_.value for _ in self.tree.find_path('/a').children])
+
+    def test_poll_once_applies_metadata_changes(self):
+        watcher = self.watcher([file_entry('/a/one.txt', size=100)])
+        watcher.poll_once()
+        self.assertEqual(self.tree.find_path('/a/one.txt').meta['size'], 100)
+
+    def test_background_thread_applies_batches_in_order(self):
+        watcher = self.watcher([file_entry('/a/two.txt')], [deleted_entry('/a/two.txt'), file_entry('/a/three.txt')])
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        self.wait_for(lambda: self.tree.find_path('/a/three.txt') is not None)
+        self.assertIsNone(self.tree.find_path('/a/two.txt'))
+
+    def test_changes_wait_for_the_lock(self):
+        watcher = self.watcher([file_entry('/a/two.txt')])
+        with self.lock:
+            watcher.start()
+            self.addCleanup(watcher.stop)
+            self.wait_for(lambda: not self.client.longpoll_batches)
+            time.sleep(0.05)
+            self.assertIsNone(self.tree.find_path('/a/two.txt'))
+        self.wait_for(lambda: self.tree.find_path('/a/two.txt') is not None)
+
+    def test_expired_cursor_stops_the_watcher(self):
+        self.client.expired.add(self.dbutil.cursor)
+        watcher = self.watcher()
+        err = StringIO()
+        with redirect_stderr(err):
+            watcher.start()
+            watcher.join(2)
+        self.assertFalse(watcher.is_alive())
+        self.assertIsNotNone(watcher.error)
+        self.assertIn('Stopped watching for changes', err.getvalue())
+
+    def test_other_api_errors_are_retried(self):
+        watcher = self.watcher([file_entry('/a/two.txt')])
+        longpoll = self.client.files_list_folder_longpoll
+        failures = [ApiError('request-id', files.ListFolderLongpollError.other, None, None)]
+
+        def flaky_longpoll(cursor, timeout=30):
+            if failures:
+                raise failures.pop()
+            return longpoll(cursor, timeout)
+
+        self.client.files_list_folder_longpoll = flaky_longpoll
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        self.wait_for(lambda: self.tree.find_path('/a/two.txt') is not None)
+        self.assertTrue(watcher.is_alive())
+        self.assertIsInstance(watcher.error, ApiError)
+
+    def test_shell_leaves_a_folder_removed_by_the_watcher(self):
+        shell = TreeFS(self.tree, lock=self.lock)
+        shell.current_node = self.tree.find_path('/a')
+        self.watcher([deleted_entry('/a')]).poll_once()
+        shell.onecmd('ls')
+        self.assertIs(shell.current_node, self.tree)
@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from exceptions import ListingError
+from listing import detect_format, load_listing, read_chunks
+from meta import FileMeta, FolderMeta
+
+
+class ListingTestCase(TestCase):
+
+    def write(self, content, suffix='.txt'):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content.encode('utf-8') if isinstance(content, str) else content)
+        self.addCleanup(os.remove, path)
+        return path
+
+
+class TextListingTests(ListingTestCase):
+
+    def test_paths_become_files_and_parents_folders(self):
+        tree = load_listing(self.write('/docs/a.txt\n/docs/old/b.txt\n\n/top.txt\n'))
+        self.assertEqual(tree.find_path('/docs/a.txt').meta, FileMeta())
+        self.assertEqual(tree.find_path('/docs').meta, FolderMeta())
+        self.assertEqual(tree.find_path('/docs/old').meta.get('type'), 'folder')
+        self.assertEqual(tree.total_files, 3)
+
+    def test_trailing_slash_marks_an_empty_folder(self):
+        tree = load_listing(self.write('/empty/\n/file\n'))
+        self.assertEqual(tree.find_path('/empty').meta.get('type'), 'folder')
+        self.assertEqual(tree.find_path('/file').meta.get('type'), 'file')
+
+    def test_listed_parent_is_turned_into_a_folder(self):
+        tree = load_listing(self.write('/docs\n/docs/a.txt\n'))
+        self.assertTrue(tree.find_path('/docs').is_folder)
+        self.assertEqual(tree.total_files, 1)
+
+
+class JsonListingTests(ListingTestCase):
+
+    def listing(self, *records):
+        return self.write(''.join(json.dumps(_) + '\n' for _ in records), suffix='.jsonl')
+
+    def test_metadata_columns_are_loaded(self):
+        tree = load_listing(self.listing(
+            {'path': '/docs', 'type': 'folder', 'id': 'id:1'},
+            {'path': '/docs/a.txt', 'type': 'file', 'size': 10, 'modified': '2020-01-02', 'id': 'id:2'},
+            {'path': '/docs/b.txt', 'size': 5},
+        ))
+        self.assertEqual(tree.find_path('/docs').meta, FolderMeta(id='id:1'))
+        self.assertEqual(tree.find_path('/docs/a.txt').meta, FileMeta(id='id:2', modified='2020-01-02', size=10))
+        self.assertEqual(tree.find_path('/docs/b.txt').meta.get('type'), 'file')
+        self.assertEqual(tree.total_size, 15)
+
+    def test_dropbox_api_fields_are_accepted(self):
+        tree = load_listing(self.listing(
+            {'.tag': 'folder', 'path_display': '/Photos', 'id': 'id:p'},
+            {'.tag': 'file', 'path_display': '/Photos/x.jpg', 'size': 3, 'server_modified': '2021-05-06T07:08:09Z',
+             'content_hash': 'abc'},
+            {'.tag': 'deleted', 'path_display': '/Photos/gone.jpg'},
+        ))
+        self.assertEqual(tree.find_path('/Photos/x.jpg').meta['modified'], '2021-05-06T07:08:09Z')
+        self.assertEqual(tree.find_path('/Photos/x.jpg').meta['content_hash'], 'abc')
+        self.assertIsNone(tree.find_path('/Photos/gone.jpg'))
+
+    def test_files_only_listing_gets_folders(self):
+        tree = load_listing(self.listing({'path': '/a/b/c.txt', 'size': 1}))
+        self.assertEqual(tree.find_path('/a/b').meta.get('type'), 'folder')
+
+    def test_invalid_line_is_reported(self):
+        with self.assertRaises(ListingError) as cm:
+            load_listing(self.write('{"path": "/a"}\nnot json\n', suffix='.jsonl'))
+        self.assertIn('not json', str(cm.exception))
+
+    def test_unknown_type_is_reported(self):
+        with self.assertRaises(ListingError):
+            load_listing(self.listing({'path': '/a', 'type': 'symlink'}))
+
+    def test_worker_processes_give_the_same_tree(self):
+        records = [{'path': '/d{}/f{}.txt'.format(i % 7, i), 'size': i} for i in range(500)]
+        path = self.listing(*records)
+        single = load_listing(path, chunk_size=256)
+        parallel = load_listing(path, workers=2, chunk_size=256)
+        self.assertEqual(
+            [(_.get_path(), _.meta) for _ in single.walk()],
+            [(_.get_path(), _.meta) for _ in parallel.walk()],
+        )
+        self.assertEqual(parallel.total_size, sum(range(500)))
+
+
+class CsvListingTests(ListingTestCase):
+
+    def test_header_names_the_columns(self):
+        path = self.write(
+            '\ufeffPath,Type,Size,Modified\n'
+            '/docs,folder,,\n'
+            '"/docs/a, b.txt",file,12,2020-01-02\n',
+            suffix='.csv',
+        )
+        tree = load_listing(path)
+        self.assertEqual(tree.find_path('/docs/a, b.txt').meta, FileMeta(modified='2020-01-02', size=12))
+        self.assertEqual(tree.find_path('/docs').meta.get('type'), 'folder')
+
+    def test_missing_path_column_is_reported(self):
+        with self.assertRaises(ListingError):
+            load_listing(self.write('name,size\na,1\n', suffix='.csv'))
+
+    def test_invalid_size_is_reported(self):
+        with self.assertRaises(ListingError):
+            load_listing(self.write('path,size\n/a,big\n', suffix='.csv'))
+
+
+class ChunkTests(ListingTestCase):
+
+    def chunks(self, data, size):
+        with open(self.write(data), 'rb') as f:
+            return list(read_chunks(f, size))
+
+    def test_chunks_end_on_line_boundaries(self):
+        chunks = self.chunks('aaa\nbb\ncccccc\nd', 5)
+        self.assertEqual(b''.join(chunks), b'aaa\nbb\ncccccc\nd')
+        self.assertTrue(all(_.endswith(b'\n') for _ in chunks[:-1]))
+        self.assertEqual(chunks[-1], b'd')
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format('export.JSONL'), 'jsonl')
+        self.assertEqual(detect_format('export.csv'), 'csv')
+        self.assertEqual(detect_format('paths'), 'text')
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def sdk_modules(statement):
+    """
+    The Dropbox SDK modules loaded after running `statement` in a fresh interpreter.
+    """
+    script = '{}\nimport sys\nprint(" ".join(sorted(_ for _ in sys.modules if _.split(".")[0] == "dropbox")))'
+    result = subprocess.run(
+        [sys.executable, '-c', script.format(statement)],
+        cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    return result.stdout.split()
+
+
+class StartupImportTests(TestCase):
+
+    def test_offline_modules_skip_sdk(self):
+        self.assertEqual(sdk_modules('import main, tree_fs, tree, cli_utils'), [])
+
+    def test_offline_file_mode_skips_sdk(self):
+        statement = (
+            'import main, tempfile\n'
+            'with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:\n'
+            '    f.write("/a/b.txt\\n"); f.flush()\n'
+            '    main.init_tree_from_file(f.name)'
+        )
+        self.assertEqual(sdk_modules(statement), [])
+
+    def test_online_modules_load_sdk(self):
+        self.assertIn('dropbox', sdk_modules('import dropbox_cli'))
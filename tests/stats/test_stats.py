@@ -0,0 +1,110 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from benchmarks.fake_server import FakeDropboxServer
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from stats import STATS, Stats
+from transfer import DownloadScheduler, download_file
+from transport import Transport
+from tree_fs import TreeFS
+from tree import PathTree
+from utils import DropboxUtils
+
+
+class StatsTests(TestCase):
+
+    def setUp(self):
+        self.stats = Stats()
+
+    def test_counters_and_timings(self):
+        self.stats.add('pages')
+        self.stats.add('entries', 10)
+        self.stats.record('build', 2.0)
+        self.stats.record('build', 1.0)
+        snapshot = self.stats.snapshot()
+        self.assertEqual(snapshot['counters'], {'pages': 1, 'entries': 10})
+        self.assertEqual(snapshot['timings']['build'], [2, 3.0, 2.0])
+
+    def test_latency_histogram(self):
+        for seconds in (0.005, 0.02, 0.02, 10):
+            self.stats.record_call('/2/files/list_folder', seconds)
+        histogram = self.stats.snapshot()['api']['/2/files/list_folder']['histogram']
+        self.assertEqual(histogram[:2], [1, 2])
+        self.assertEqual(histogram[-1], 1)
+        self.assertEqual(sum(histogram), 4)
+
+    def test_timed_decorator(self):
+        @self.stats.timed('work')
+        def work(value):
+            return value * 2
+
+        self.assertEqual(work(2), 4)
+        self.assertEqual(self.stats.snapshot()['timings']['work'][0], 1)
+
+    def test_reset(self):
+        self.stats.add('pages')
+        self.stats.reset()
+        self.assertEqual(self.stats.snapshot(), {'counters': {}, 'timings': {}, 'api': {}})
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        STATS.reset()
+        self.addCleanup(STATS.reset)
+
+    def test_listing_and_tree_build_are_recorded(self):
+        client = FakeDropboxClient([[folder_entry('/a'), file_entry('/a/one.txt')], [file_entry('/a/two.txt')]])
+        DropboxUtils(client=client).get_tree()
+        snapshot = STATS.snapshot()
+        self.assertEqual(snapshot['counters']['pages'], 2)
+        self.assertEqual(snapshot['counters']['entries'], 3)
+        self.assertEqual(snapshot['counters']['tree entries'], 3)
+        self.assertEqual(snapshot['timings']['tree build'][0], 1)
+        self.assertEqual(snapshot['timings']['listing'][0], 2)
+
+    def test_sharded_listing_times_each_page(self):
+        client = FakeDropboxClient([[
+            folder_entry('/a'), file_entry('/a/one.txt'), folder_entry('/b'), file_entry('/b/two.txt'),
+        ]], page_size=1)
+        DropboxUtils(client=client, list_workers=2).get_tree()
+        snapshot = STATS.snapshot()
+        self.assertEqual(snapshot['timings']['listing'][0], snapshot['counters']['pages'])
+
+    def test_scheduled_downloads_are_counted(self):
+        client = FakeDropboxClient(contents={'/x': b'1', '/y': b'2'})
+        with tempfile.TemporaryDirectory() as tmp:
+            DownloadScheduler(client).run([('/x', Path(tmp, 'x')), ('/y', Path(tmp, 'y')), ('/z', Path(tmp, 'z'))])
+        snapshot = STATS.snapshot()
+        self.assertEqual(snapshot['counters']['files downloaded'], 2)
+        self.assertEqual(snapshot['timings']['download'][0], 3)
+
+    def test_http_calls_and_bytes_are_recorded(self):
+        client = FakeDropboxClient([[file_entry('/x.bin')]], contents={'/x.bin': b'12345'})
+        with FakeDropboxServer(client) as server, tempfile.TemporaryDirectory() as tmp:
+            transport = Transport('token', base_url=server.url)
+            transport.client.files_list_folder('')
+            download_file(transport.client, '/x.bin', Path(tmp, 'x.bin'))
+            transport.close()
+        snapshot = STATS.snapshot()
+        self.assertEqual(snapshot['api']['/2/files/list_folder']['timing'][0], 1)
+        self.assertEqual(snapshot['api']['/2/files/download']['timing'][0], 1)
+        self.assertEqual(snapshot['counters']['bytes received'], 5)
+
+    def test_stats_command(self):
+        main = TreeFS(PathTree(root=True))
+        main.tree.bulk_insert([('/a', None)])
+        STATS.record_call('/2/files/list_folder', 0.02)
+        STATS.add('bytes received', 2048)
+        out = StringIO()
+        with redirect_stdout(out):
+            main.onecmd('stats --reset')
+        report = out.getvalue()
+        self.assertIn('tree.bulk_insert', report)
+        self.assertIn('/2/files/list_folder', report)
+        self.assertIn('<25ms 1', report)
+        self.assertIn('received 2.0 KB', report)
+        self.assertEqual(STATS.snapshot()['counters'], {})
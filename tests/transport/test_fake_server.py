@@ -0,0 +1,87 @@
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from dropbox.exceptions import ApiError, InternalServerError
+
+from batch import delete_batch
+from benchmarks.fake_server import FakeDropboxServer, synthetic_client
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from transfer import UploadScheduler, download_file
+from transport import Transport
+from utils import DropboxUtils
+
+
+class FakeServerTests(TestCase):
+
+    def setUp(self):
+        self.fake = FakeDropboxClient(
+            [[folder_entry('/a'), file_entry('/a/one.txt', size=3)], [file_entry('/a/two.txt', size=4)]],
+            contents={'/a/one.txt': b'one', '/a/two.txt': b'twoo'},
+        )
+        self.server = FakeDropboxServer(self.fake).start()
+        self.transport = Transport('token', base_url=self.server.url, max_retries=0)
+        self.client = self.transport.client
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_full_listing_follows_cursors(self):
+        tree = DropboxUtils(transport=self.transport).get_tree()
+        self.assertEqual(tree.find_path('/a/two.txt').meta['size'], 4)
+        self.assertEqual(self.server.stats['/2/files/list_folder/continue'], 1)
+
+    def test_path_listing_is_paged(self):
+        self.fake.page_size = 1
+        entries = list(DropboxUtils(transport=self.transport).list_folder('/a'))
+        self.assertEqual([_.name for _ in entries], ['one.txt', 'two.txt'])
+
+    def test_download_resumes_after_dropped_connection(self):
+        self.fake.drops['/a/two.txt'] = 2
+        local = Path(self.tmp.name, 'two.txt')
+        self.assertEqual(download_file(self.client, '/a/two.txt', local, chunk_size=1), 4)
+        self.assertEqual(local.read_bytes(), b'twoo')
+        self.assertEqual(self.server.stats['/2/files/download'], 2)
+
+    def test_route_errors_come_back_as_api_errors(self):
+        with self.assertRaises(ApiError) as ctx:
+            self.client.files_download('/missing')
+        self.assertTrue(ctx.exception.error.is_path())
+
+    def test_upload_sessions(self):
+        local = Path(self.tmp.name, 'up.bin')
+        local.write_bytes(b'x' * 10)
+        results = UploadScheduler(self.client, chunk_size=4).run([(local, '/a/up.bin')])
+        self.assertTrue(results[0].ok)
+        self.assertEqual(self.fake.contents['/a/up.bin'], b'x' * 10)
+
+    def test_batch_endpoints(self):
+        self.fake.async_batches = True
+        results = delete_batch(self.client, ['/a/one.txt'], poll_interval=0)
+        self.assertTrue(results[0].ok)
+        self.assertNotIn('/a/one.txt', self.fake.contents)
+
+    def test_rate_limited_requests_are_retried(self):
+        self.server.rate_limit_every = 2
+        for _ in range(3):
+            self.client.files_list_folder('/a')
+        self.assertEqual(self.server.stats['rate_limited'], 2)
+        self.assertEqual(self.server.stats['requests'], 5)
+
+    def test_injected_failures(self):
+        self.server.fail_every = 1
+        with self.assertRaises(InternalServerError):
+            self.client.files_list_folder('/a')
+        self.assertEqual(self.server.stats['failed'], 1)
+
+    def test_latency_and_synthetic_accounts(self):
+        client = synthetic_client('wide', 50, page_size=20)
+        with FakeDropboxServer(client, latency=0.01) as server:
+            transport = Transport('token', base_url=server.url)
+            tree = DropboxUtils(transport=transport).get_tree()
+            transport.close()
+        self.assertEqual(tree.total_files, 50)
+        self.assertEqual(server.stats['/2/files/list_folder/continue'], 2)
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from unittest import TestCase
+
+from benchmarks.fake_server import FakeDropboxServer
+from benchmarks.fakes import FakeDropboxClient, file_entry, folder_entry
+from transport import Transport
+from utils import DropboxUtils
+
+
+class TransportTests(TestCase):
+
+    def setUp(self):
+        client = FakeDropboxClient([[folder_entry('/a'), file_entry('/a/one.txt', size=1)]])
+        self.server = FakeDropboxServer(client).start()
+        self.transport = Transport('token', base_url=self.server.url, max_concurrency=4)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_requests_go_to_the_stand_in_server(self):
+        result = self.transport.client.files_list_folder('/a')
+        self.assertEqual([_.path_display for _ in result.entries], ['/a/one.txt'])
+        self.assertEqual(self.server.stats['/2/files/list_folder'], 1)
+
+    def test_connections_are_kept_alive(self):
+        self.transport.client.files_list_folder('/a')
+        self.transport.client.files_list_folder('/a')
+        self.assertEqual(self.server.stats['connections'], 1)
+
+    def test_awaited_calls_overlap(self):
+        self.server.latency = 0.2
+
+        async def list_all():
+            return await asyncio.gather(*(self.transport.call('files_list_folder', '/a') for _ in range(4)))
+
+        start = time.perf_counter()
+        results = self.transport.run(list_all())
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual([len(_.entries) for _ in results], [1, 1, 1, 1])
+
+    def test_dropbox_utils_shares_the_transport(self):
+        dbutil = DropboxUtils(transport=self.transport)
+        self.assertIs(dbutil.client, self.transport.client)
+        self.assertEqual([_.path_display for _ in dbutil.list_folder('/a')], ['/a/one.txt'])
+
+
+class WrappedClientTests(TestCase):
+
+    def test_existing_client_is_wrapped(self):
+        client = FakeDropboxClient([[file_entry('/x')]])
+        transport = Transport(client=client)
+        self.assertIs(transport.client, client)
+        self.assertIsNone(transport.session)
+        result = transport.run(transport.call('files_list_folder', '', recursive=True))
+        self.assertEqual(result.entries[0].path_display, '/x')
+        transport.close()
@@ -0,0 +1,54 @@
+import pickle
+from unittest import TestCase
+
+from meta import EMPTY_META, FileMeta, FolderMeta
+from tree import PathTree as Tree
+
+
+class MetaRecordTests(TestCase):
+
+    def test_file_meta_reads_like_a_dict(self):
+        meta = FileMeta(id='id:1', modified='2012-12-25', size=12345)
+        self.assertEqual(meta['type'], 'file')
+        self.assertEqual(meta.get('size'), 12345)
+        self.assertIsNone(meta.get('missing'))
+        self.assertIn('modified', meta)
+        self.assertEqual(sorted(meta.items(), key=lambda x: x[0]), [
+            ('content_hash', None), ('id', 'id:1'), ('modified', '2012-12-25'), ('size', 12345), ('type', 'file')
+        ])
+
+    def test_folder_meta_equals_equivalent_dict(self):
+        self.assertEqual(FolderMeta(id='id:2'), {'type': 'folder', 'id': 'id:2'})
+
+    def test_missing_key_raises_key_error(self):
+        with self.assertRaises(KeyError):
+            FolderMeta(id='id:2')['size']
+
+    def test_records_have_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            FileMeta().__dict__
+
+    def test_empty_meta_is_falsy_and_survives_pickling(self):
+        self.assertFalse(EMPTY_META)
+        self.assertEqual(EMPTY_META, {})
+        self.assertIs(pickle.loads(pickle.dumps(EMPTY_META)), EMPTY_META)
+
+    def test_records_survive_pickling(self):
+        meta = FileMeta(id='id:1', modified='2012-12-25', size=1)
+        self.assertEqual(pickle.loads(pickle.dumps(meta)), meta)
+
+
+class CompactNodeTests(TestCase):
+
+    def test_nodes_have_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Tree('a').__dict__
+
+    def test_new_nodes_share_empty_meta(self):
+        self.assertIs(Tree('a').meta, Tree('b').meta)
+
+    def test_path_components_are_interned(self):
+        root = Tree(root=True)
+        a = root.insert_path('/x/' + ''.join(['sha', 'red']))
+        b = root.insert_path('/y/' + ''.join(['shar', 'ed']))
+        self.assertIs(a.value, b.value)
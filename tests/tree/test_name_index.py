@@ -0,0 +1,112 @@
+from unittest import TestCase
+
+from tree import PathTree as Tree
+
+
+class NameIndexTests(TestCase):
+
+    def setUp(self):
+        self.root = Tree(root=True)
+        self.abc = self.root.insert_path('/docs/abc.txt')
+        self.xyzabc = self.root.insert_path('/docs/old/xyzabc.txt')
+        self.ab = self.root.insert_path('/ab')
+
+    def test_root_trees_are_indexed_by_default(self):
+        self.assertIsNotNone(self.root._names)
+        self.assertIsNone(Tree('a')._names)
+        self.assertIsNone(Tree(root=True, indexed=False)._names)
+
+    def test_substring_search_uses_trigrams(self):
+        self.assertCountEqual(self.root.search('abc'), [self.abc, self.xyzabc])
+        self.assertEqual(self.root.search('zab'), [self.xyzabc])
+        self.assertEqual(self.root.search('nothing'), [])
+
+    def test_trigrams_are_built_at_the_first_substring_search(self):
+        index = self.root._names
+        self.assertIn('abc.txt', index.pending)
+        self.assertEqual(index.trigrams, {})
+        self.root.search('abc')
+        self.assertEqual(index.pending, {})
+        self.assertIn('abc.txt', index.trigrams['abc'])
+
+    def test_short_substring_search(self):
+        self.assertCountEqual(self.root.search('ab'), [self.abc, self.xyzabc, self.ab])
+
+    def test_exact_search(self):
+        self.assertEqual(self.root.search('abc.txt', exact=True), [self.abc])
+        self.assertEqual(self.root.search('abc', exact=True), [])
+
+    def test_relative_search_only_returns_nodes_below_the_current_node(self):
+        old = self.root.find_path('/docs/old')
+        self.assertEqual(old.search('abc', relative=True), [self.xyzabc])
+
+    def test_nodes_added_later_are_found(self):
+        node = self.root.insert_path('/new/abcdef')
+        self.assertIn(node, self.root.search('bcd'))
+
+    def test_attached_subtree_is_indexed(self):
+        sub = Tree('sub')
+        child = Tree('abc-child')
+        sub.add_child(child)
+        self.root.add_child(sub)
+        self.assertEqual(self.root.search('c-ch'), [child])
+
+    def test_removed_subtree_is_no_longer_found(self):
+        self.root.find_path('/docs').remove()
+        self.assertEqual(self.root.search('abc'), [])
+        self.assertEqual(self.root._names.trigrams.get('abc'), None)
+
+    def test_renamed_node_is_found_by_new_name_only(self):
+        self.abc.value = 'renamed.txt'
+        self.assertEqual(self.root.search('abc'), [self.xyzabc])
+        self.assertEqual(self.root.search('named'), [self.abc])
+
+    def test_duplicate_names_are_all_returned(self):
+        other = self.root.insert_path('/other/abc.txt')
+        self.assertEqual(self.root.search('abc.txt', exact=True), [self.abc, other])
+        other.remove()
+        self.assertEqual(self.root.search('abc.txt', exact=True), [self.abc])
+
+
+class PathIndexTests(TestCase):
+
+    def setUp(self):
+        self.root = Tree(root=True)
+        self.file = self.root.insert_path('/Docs/Old/Report.TXT')
+
+    def test_absolute_lookups_use_the_path_index(self):
+        self.assertIs(self.root._names.paths['/docs/old/report.txt'], self.file)
+        self.assertIs(self.root.find_path('/Docs/Old/Report.TXT'), self.file)
+        self.assertIs(self.root.find_path_lower('/docs/old/report.txt'), self.file)
+
+    def test_find_path_stays_case_sensitive(self):
+        self.assertIsNone(self.root.find_path('/docs/old/report.txt'))
+
+    def test_case_insensitive_siblings_fall_back_to_walking(self):
+        other = self.root.insert_path('/docs/old/report.txt')
+        self.assertIs(self.root.find_path('/docs/old/report.txt'), other)
+        self.file.remove()
+        self.assertIs(self.root.find_path_lower('/docs/old/report.txt'), other)
+
+    def test_moved_subtree_is_reindexed(self):
+        old = self.root.find_path('/Docs/Old')
+        old.move_to(self.root, 'Archive')
+        self.assertEqual(self.file.get_path(), '/Archive/Report.TXT')
+        self.assertIs(self.root.find_path_lower('/archive/report.txt'), self.file)
+        self.assertNotIn('/docs/old/report.txt', self.root._names.paths)
+
+    def test_renamed_folder_is_reindexed(self):
+        self.root.find_path('/Docs').value = 'Papers'
+        self.assertIs(self.root.find_path('/Papers/Old/Report.TXT'), self.file)
+        self.assertIsNone(self.root.find_path('/Docs/Old/Report.TXT'))
+
+    def test_removed_subtree_is_unindexed(self):
+        self.root.find_path('/Docs').remove()
+        self.assertEqual(self.root._names.paths, {'/': self.root})
+
+    def test_named_root_is_optional_in_lookups(self):
+        root = Tree('x', root=True)
+        node = root.insert_path('/a/b')
+        self.assertIs(root.find_path('/a/b'), node)
+        self.assertIs(root.find_path('/x/a/b'), node)
+        self.assertIs(root.find_path('/x'), root)
@@ -1,5 +1,6 @@
 from unittest import TestCase
 
+from meta import FolderMeta
 from tree import PathTree as Tree
 
 
@@ -55,6 +56,42 @@ class TreeTests(TestCase):
         result = root.get_child('c1')
         self.assertIsNone(result)
 
+    def test_get_child_returns_first_child_when_names_are_duplicated(self):
+        root = Tree('root')
+        a1 = Tree('a')
+        a2 = Tree('a')
+        root.add_child(a1)
+        root.add_child(a2)
+        self.assertIs(root.get_child('a'), a1)
+
+    def test_remove_child(self):
+        root = Tree('root')
+        c1 = Tree('c1')
+        root.add_child(c1)
+        root.remove_child(c1)
+        self.assertEqual(root.children, [])
+        self.assertIsNone(root.get_child('c1'))
+        self.assertIsNone(c1.parent)
+
+    def test_remove_child_with_duplicate_name_falls_back_to_remaining_sibling(self):
+        root = Tree('root')
+        a1 = Tree('a')
+        a2 = Tree('a')
+        root.add_child(a1)
+        root.add_child(a2)
+        root.remove_child(a1)
+        self.assertEqual(len(root.children), 1)
+        self.assertIs(root.children[0], a2)
+        self.assertIs(root.get_child('a'), a2)
+
+    def test_renaming_a_child_updates_lookup(self):
+        root = Tree('root')
+        c1 = Tree('c1')
+        root.add_child(c1)
+        c1.value = 'renamed'
+        self.assertIsNone(root.get_child('c1'))
+        self.assertIs(root.get_child('renamed'), c1)
+
     def test_nodes_are_equal_if_they_have_the_same_value(self):
         a1 = Tree('a')
         a2 = Tree('a')
@@ -377,3 +414,119 @@ class TreeTests(TestCase):
         b.add_child(a2)
         results = b.search('abc', relative=True)
         self.assertEqual(results, [a2])
+
+    def test_insert_path_returns_the_leaf_node(self):
+        root = Tree('root')
+        node = root.insert_path('/root/a/b')
+        self.assertIs(node, root.find_path('/root/a/b'))
+
+    def test_bulk_insert_builds_tree_and_sets_meta(self):
+        root = Tree(root=True)
+        count = root.bulk_insert([
+            ('/a', {'type': 'folder'}),
+            ('/a/b', {'type': 'file'}),
+            ('/a/c', {'type': 'file'}),
+            ('/d/e', {'type': 'file'}),
+        ])
+        self.assertEqual(count, 4)
+        self.assertEqual(['a', 'd'], [_.value for _ in root.children])
+        self.assertEqual(['b', 'c'], [_.value for _ in root.get_child('a').children])
+        self.assertEqual(root.find_path('/a').meta, {'type': 'folder'})
+        self.assertEqual(root.find_path('/a/c').meta, {'type': 'file'})
+        self.assertEqual(root.find_path('/d').meta, {})
+
+    def test_bulk_insert_does_not_duplicate_existing_nodes(self):
+        root = Tree(root=True)
+        root.insert_path('/a/b')
+        root.bulk_insert([('/a/b', {'type': 'file'}), ('/a/b', None)])
+        self.assertEqual(1, len(root.get_child('a').children))
+        self.assertEqual(root.find_path('/a/b').meta, {'type': 'file'})
+
+    def test_bulk_insert_relative_paths_are_added_under_the_calling_node(self):
+        root = Tree('root')
+        a = Tree('a')
+        root.add_child(a)
+        a.bulk_insert([('/root/x', None), ('b', None), ('b/c', None)])
+        self.assertEqual(['a', 'x'], [_.value for _ in root.children])
+        self.assertEqual(a.find_path('b/c').get_path(), '/root/a/b/c')
+
+    def test_bulk_insert_absolute_path_of_root_name_refers_to_root(self):
+        root = Tree('root')
+        root.bulk_insert([('/root', {'type': 'folder'})])
+        self.assertEqual(root.children, [])
+        self.assertEqual(root.meta, {'type': 'folder'})
+
+    def test_find_path_lower_ignores_case(self):
+        root = Tree(root=True)
+        node = root.insert_path('/Photos/Trip/IMG.jpg')
+        self.assertIs(root.find_path_lower('/photos/trip/img.jpg'), node)
+        self.assertIsNone(root.find_path_lower('/photos/nope'))
+
+    def test_remove_detaches_node_from_parent(self):
+        root = Tree(root=True)
+        node = root.insert_path('/a/b')
+        node.remove()
+        self.assertIsNone(root.find_path('/a/b'))
+        self.assertIsNone(node.parent)
+
+    def test_glob_matches_wildcards_in_any_component(self):
+        root = Tree(root=True)
+        a = root.insert_path('/x/one/a.txt')
+        b = root.insert_path('/x/two/b.txt')
+        root.insert_path('/x/two/c.md')
+        self.assertEqual(root.glob('/x/*/*.txt'), [a, b])
+        self.assertEqual(root.find_path('/x').glob('t?o/[bc].*'), [b, root.find_path('/x/two/c.md')])
+        self.assertEqual(root.glob('/x/one/a.txt'), [a])
+        self.assertEqual(root.glob('/nope/*'), [])
+
+    def test_move_to_reparents_and_renames_subtree(self):
+        root = Tree(root=True)
+        b = root.insert_path('/a/b')
+        root.insert_path('/a/b/c')
+        x = root.insert_path('/x')
+        b.move_to(x, 'renamed')
+        self.assertEqual(root.find_path('/a').children, [])
+        self.assertIs(root.find_path('/x/renamed'), b)
+        self.assertEqual(root.find_path('/x/renamed/c').get_path(), '/x/renamed/c')
+
+    def test_copy_clones_subtree_with_meta(self):
+        root = Tree(root=True)
+        b = root.insert_path('/a/b')
+        c = root.insert_path('/a/b/c')
+        c.meta = {'type': 'file'}
+        clone = b.copy()
+        self.assertIsNone(clone.parent)
+        self.assertIsNot(clone.get_child('c'), c)
+        self.assertEqual(clone.get_child('c').meta, {'type': 'file'})
+
+    def test_copy_clears_ids_of_descendants(self):
+        root = Tree(root=True)
+        b = root.insert_path('/a/b')
+        b.meta = FolderMeta(id='id:b')
+        root.insert_path('/a/b/c').meta = {'type': 'file', 'id': 'id:c'}
+        clone = b.copy()
+        self.assertEqual(clone.meta['id'], 'id:b')
+        self.assertEqual(clone.get_child('c').meta, {'type': 'file'})
+        self.assertEqual(root.find_path('/a/b/c').meta['id'], 'id:c')
+
+    def test_get_path_is_cached_and_cleared_on_move(self):
+        root = Tree(root=True)
+        c = root.insert_path('/a/b/c')
+        self.assertEqual(c.get_path(), '/a/b/c')
+        self.assertEqual(c._path, '/a/b/c')
+        root.find_path('/a/b').move_to(root, 'z')
+        self.assertIsNone(c._path)
+        self.assertEqual(c.get_path(), '/z/c')
+
+    def test_get_path_is_cleared_on_rename_and_detach(self):
+        root = Tree(root=True)
+        c = root.insert_path('/a/b/c')
+        c.get_path()
+        root.find_path('/a').value = 'renamed'
+        self.assertEqual(c.get_path(), '/renamed/b/c')
+        b = root.find_path('/renamed/b')
+        b.remove()
+        self.assertEqual(c.get_path(), '/b/c')
+        root.add_child(b)
+        self.assertEqual(c.get_path(), '/b/c')
+        self.assertEqual(b.get_path(), '/b')
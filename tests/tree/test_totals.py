@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from meta import FileMeta, FolderMeta
+from tree import PathTree as Tree
+
+
+class SubtreeTotalsTests(TestCase):
+
+    def setUp(self):
+        self.root = Tree(root=True)
+        self.root.bulk_insert([
+            ('/a', FolderMeta()),
+            ('/a/one', FileMeta(size=10)),
+            ('/a/b', FolderMeta()),
+            ('/a/b/two', FileMeta(size=20)),
+            ('/c', FolderMeta()),
+            ('/c/three', FileMeta(size=5)),
+        ])
+
+    def totals(self, path):
+        node = self.root.find_path(path)
+        return node.total_size, node.total_files
+
+    def test_totals_are_aggregated_on_insert(self):
+        self.assertEqual(self.totals('/'), (35, 3))
+        self.assertEqual(self.totals('/a'), (30, 2))
+        self.assertEqual(self.totals('/a/b'), (20, 1))
+        self.assertEqual(self.totals('/a/one'), (10, 1))
+
+    def test_totals_follow_metadata_changes(self):
+        self.root.find_path('/a/b/two').meta = FileMeta(size=25)
+        self.assertEqual(self.totals('/a'), (35, 2))
+        self.assertEqual(self.totals('/'), (40, 3))
+
+    def test_totals_follow_removal(self):
+        self.root.find_path('/a/b').remove()
+        self.assertEqual(self.totals('/a'), (10, 1))
+        self.assertEqual(self.totals('/'), (15, 2))
+
+    def test_totals_follow_moves(self):
+        self.root.find_path('/a/b').move_to(self.root.find_path('/c'))
+        self.assertEqual(self.totals('/a'), (10, 1))
+        self.assertEqual(self.totals('/c'), (25, 2))
+        self.assertEqual(self.totals('/'), (35, 3))
+
+    def test_copied_subtree_adds_to_totals(self):
+        self.root.find_path('/c').add_child(self.root.find_path('/a/b').copy())
+        self.assertEqual(self.totals('/c'), (25, 2))
+        self.assertEqual(self.totals('/'), (55, 4))
+
+    def test_files_without_numeric_size_count_but_add_no_bytes(self):
+        self.root.insert_path('/c/unknown').meta = {'type': 'file', 'size': ''}
+        self.assertEqual(self.totals('/c'), (5, 2))
+
+    def test_bulk_insert_runs_of_siblings_with_repeated_paths(self):
+        self.root.bulk_insert([
+            ('/d/x', FileMeta(size=1)),
+            ('/d/y', FileMeta(size=2)),
+            ('/d/x', FileMeta(size=4)),
+            ('/a/one', FileMeta(size=3)),
+            ('/d/z', FileMeta(size=8)),
+        ])
+        self.assertEqual(self.totals('/d'), (14, 3))
+        self.assertEqual(self.totals('/a'), (23, 2))
+        self.assertEqual(self.totals('/'), (42, 6))
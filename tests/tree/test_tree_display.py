@@ -133,3 +133,31 @@ class TreeDisplayTests(TestCase):
         with redirect_stdout(out):
             self.tree.formated_print(line_type='ascii-emh')
         self.assertEqual(expected, out.getvalue())
+
+    def test_display_nested_tree(self):
+        expected = textwrap.dedent('''
+        /
+            a
+                b
+                    c
+                        d
+                    f
+                        g
+                        i
+                        j
+                h
+        ''').lstrip()
+        self.assertEqual(self.tree.display(), expected)
+
+    def test_draw_lines_max_depth(self):
+        expected = ['/', '.- a', '   |- b', '   .- h']
+        self.assertEqual(list(self.tree.draw_lines(line_type='ascii', max_depth=2)), expected)
+
+    def test_draw_lines_dirs_only(self):
+        expected = ['/', '.- a', '   .- b', '      |- c', '      .- f']
+        self.assertEqual(list(self.tree.draw_lines(line_type='ascii', dirs_only=True)), expected)
+
+    def test_draw_lines_is_lazy(self):
+        lines = self.tree.draw_lines(line_type='ascii')
+        self.assertEqual(next(lines), '/')
+        self.assertEqual(next(lines), '.- a')
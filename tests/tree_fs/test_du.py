@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from meta import FileMeta, FolderMeta
+from tree import PathTree
+from tree_fs import TreeFS, format_size
+
+
+class DUCommandTests(TestCase):
+
+    def setUp(self):
+        tree = PathTree(root=True)
+        tree.bulk_insert([
+            ('/small', FolderMeta()),
+            ('/small/f', FileMeta(size=100)),
+            ('/big', FolderMeta()),
+            ('/big/f', FileMeta(size=3 * 1024 * 1024)),
+            ('/big/inner', FolderMeta()),
+            ('/big/inner/g', FileMeta(size=2048)),
+            ('/loose', FileMeta(size=1)),
+        ])
+        self.main = TreeFS(tree)
+
+    def test_du_lists_folders_then_total(self):
+        lines = [_.split() for _ in self.main._du(self.main.tree)]
+        self.assertEqual([_[-1] for _ in lines], ['/small', '/big', '/'])
+        self.assertEqual(lines[-1][:4], ['3.0', 'MB', '4', 'files'])
+
+    def test_du_sorted_by_size(self):
+        lines = list(self.main._du(self.main.tree, sort=True))
+        self.assertEqual([_.split()[-1] for _ in lines], ['/big', '/small', '/'])
+
+    def test_du_depth(self):
+        lines = list(self.main._du(self.main.tree, depth=2, sort=True))
+        self.assertEqual([_.split()[-1] for _ in lines], ['/big', '/big/inner', '/small', '/'])
+        lines = list(self.main._du(self.main.tree, depth=0))
+        self.assertEqual([_.split()[-1] for _ in lines], ['/'])
+
+    def test_format_size(self):
+        self.assertEqual(format_size(100), '100 B')
+        self.assertEqual(format_size(2048), '2.0 KB')
+        self.assertEqual(format_size(5 * 1024 ** 5), '5120.0 TB')
@@ -1,5 +1,6 @@
 import argparse
 from .base import BaseCommandTest
+from tree import PathTree as Tree
 
 
 class FindCommandTests(BaseCommandTest):
@@ -51,3 +52,16 @@ class FindCommandTests(BaseCommandTest):
     def inp(self, t=None, r=False, e=False):
         target = t.split(' ')
         return argparse.Namespace(target=target, relative=r, exact=e)
+
+
+class IndexedFindCommandTests(FindCommandTests):
+    """
+    Same scenarios, answered from the root's name index instead of a tree walk.
+    """
+
+    def _create_node(self, val, parent, meta):
+        node = Tree(val, indexed=parent is None)
+        if parent:
+            parent.add_child(node)
+        node.meta = meta
+        return node
@@ -0,0 +1,46 @@
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+from unittest import mock
+
+from tests.tree_fs.base import BaseCommandTest
+
+
+class TreeCommandTests(BaseCommandTest):
+
+    def run_tree(self, args):
+        out = StringIO()
+        with redirect_stdout(out):
+            self.main.onecmd('tree ' + args)
+        return out.getvalue().splitlines()
+
+    def test_tree_draws_whole_subtree(self):
+        self.assertEqual(self.run_tree('ascii'), ['root', '.- n1', '   |- n2', '   |  |- n4', '   |  .- n5', '   .- n3'])
+
+    def test_tree_level(self):
+        self.assertEqual(self.run_tree('-L 2 ascii'), ['root', '.- n1', '   |- n2', '   .- n3'])
+
+    def test_tree_dirs_only(self):
+        self.assertEqual(self.run_tree('-d ascii'), ['root', '.- n1', '   |- n2', '   |  .- n5', '   .- n3'])
+
+    def test_tree_limit(self):
+        self.assertEqual(self.run_tree('-n 2 ascii'), ['root', '.- n1', '... stopped after 2 lines'])
+        self.assertEqual(len(self.run_tree('-n 6 ascii')), 6)
+
+    def test_tree_unknown_style_uses_default(self):
+        self.assertEqual(self.run_tree('nope')[1], '└─ n1')
+
+    def test_tree_pager(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, 'out')
+            with mock.patch.dict(os.environ, {'PAGER': 'cat > {}'.format(target)}):
+                self.main.onecmd('tree -p -L 1 ascii')
+            with open(target) as f:
+                self.assertEqual(f.read(), 'root\n.- n1\n')
+
+    def test_tree_stops_when_pager_quits(self):
+        with mock.patch.dict(os.environ, {'PAGER': 'true'}):
+            for i in range(5000):
+                self.main.tree.insert_path('/n1/n3/{}'.format(i))
+            self.main.onecmd('tree -p')
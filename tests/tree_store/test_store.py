@@ -0,0 +1,195 @@
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+from unittest import TestCase
+
+from exceptions import ListingError
+from listing import load_listing
+from main import init_tree_from_store
+from meta import EMPTY_META, FileMeta, FolderMeta
+from tree import PathTree
+from tree_fs import TreeFS
+from tree_store import TreeStore
+
+
+ENTRIES = [
+    ('/Docs', FolderMeta(id='id:docs')),
+    ('/Docs/a.txt', FileMeta(id='id:a', modified='2020-01-02', size=10)),
+    ('/Docs/Old', FolderMeta()),
+    ('/Docs/Old/b.txt', FileMeta(size=5)),
+    ('/docs', FolderMeta()),
+    ('/top.md', FileMeta(size=1)),
+]
+
+
+class StoreTestCase(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, 'tree.db')
+        self.store = self.open()
+        self.store.bulk_insert(ENTRIES)
+        self.root = self.store.root
+
+    def open(self, **kwargs):
+        store = TreeStore(self.db_path, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+
+class TreeStoreTests(StoreTestCase):
+
+    def test_nodes_have_the_path_tree_api(self):
+        docs = self.root.get_child('Docs')
+        self.assertEqual([_.value for _ in docs.children], ['a.txt', 'Old'])
+        self.assertEqual(docs.get_child('a.txt').meta, FileMeta(id='id:a', modified='2020-01-02', size=10))
+        self.assertEqual(docs.meta, FolderMeta(id='id:docs'))
+        self.assertIs(docs.get_child('Old').parent.parent, self.root)
+        self.assertIsNone(docs.get_child('missing'))
+        self.assertTrue(docs.is_folder)
+        self.assertEqual(self.root.get_path(), '/')
+        self.assertEqual(docs.get_child('Old').get_child('b.txt').get_path(), '/Docs/Old/b.txt')
+
+    def test_totals(self):
+        self.assertEqual((self.root.total_size, self.root.total_files), (16, 3))
+        docs = self.root.find_path('/Docs')
+        self.assertEqual((docs.total_size, docs.total_files), (15, 2))
+
+    def test_find_path_is_case_sensitive(self):
+        self.assertEqual(self.root.find_path('/Docs/Old/b.txt').value, 'b.txt')
+        self.assertEqual(self.root.find_path('/docs').get_path(), '/docs')
+        self.assertIsNone(self.root.find_path('/DOCS'))
+        self.assertEqual(self.root.find_path('/Docs').find_path('Old/b.txt').get_path(), '/Docs/Old/b.txt')
+        self.assertIs(self.root.find_path('/'), self.root)
+
+    def test_find_path_lower(self):
+        self.assertEqual(self.root.find_path_lower('/DOCS/OLD').get_path(), '/Docs/Old')
+        self.assertIsNone(self.root.find_path_lower('/nope'))
+
+    def test_paths_resolve_from_below_the_root(self):
+        old = self.root.find_path('/Docs/Old')
+        self.assertEqual(old.find_path('/Docs').get_path(), '/Docs')
+        self.assertEqual(old.find_path('/top.md').get_path(), '/top.md')
+        self.assertEqual(old.find_path('b.txt').get_path(), '/Docs/Old/b.txt')
+        self.assertIsNone(self.root.find_path('/docs').find_path('/Old'))
+        self.assertEqual(old.find_path_lower('B.TXT').get_path(), '/Docs/Old/b.txt')
+        self.assertEqual(old.find_path_lower('/TOP.MD').get_path(), '/top.md')
+
+    def test_search(self):
+        self.assertEqual(sorted(_.get_path() for _ in self.root.search('.txt')), ['/Docs/Old/b.txt', '/Docs/a.txt'])
+        self.assertEqual([_.get_path() for _ in self.root.search('top.md', exact=True)], ['/top.md'])
+        self.assertEqual(self.root.search('TXT'), [])
+        self.assertEqual(sorted(_.value for _ in self.root.search('ld')), ['Old'])
+        old = self.root.find_path('/Docs/Old')
+        self.assertEqual([_.value for _ in old.search('txt', relative=True)], ['b.txt'])
+
+    def test_names_inserted_after_a_search_are_found(self):
+        self.assertEqual(len(self.root.search('.txt')), 2)
+        self.store.bulk_insert([('/later.txt', FileMeta())])
+        self.assertEqual(len(self.root.search('.txt')), 3)
+        self.assertEqual(len(self.open().root.search('.txt')), 3)
+
+    def test_draw_lines(self):
+        lines = list(self.root.find_path('/Docs').draw_lines(line_type='ascii'))
+        self.assertEqual(lines, ['Docs', '|- a.txt', '.- Old', '   .- b.txt'])
+
+    def test_cache_is_bounded_and_nodes_compare_by_row(self):
+        store = self.open(cache_size=2)
+        node = store.root.find_path('/Docs/Old/b.txt')
+        for _ in store.root.walk():
+            pass
+        self.assertLessEqual(len(store.cache), 2)
+        self.assertEqual(store.root.find_path('/Docs/Old/b.txt'), node)
+        self.assertTrue(node.is_within(store.root.find_path('/Docs')))
+
+    def test_contents_persist(self):
+        store = self.open()
+        self.assertEqual(len(store), 7)
+        self.assertEqual(store.root.total_files, 3)
+        self.assertEqual(len(self.open(reset=True)), 1)
+
+
+class StoreInsertTests(StoreTestCase):
+
+    def test_repeated_path_replaces_metadata(self):
+        self.store.bulk_insert([('/Docs/a.txt', FileMeta(size=20))])
+        self.assertEqual(self.root.find_path('/Docs/a.txt').meta['size'], 20)
+        self.assertEqual(self.root.total_size, 26)
+
+    def test_missing_parents_are_created_as_folders(self):
+        self.store.bulk_insert([('/new/deep/c.txt', FileMeta(size=2)), ('loose', FileMeta())])
+        self.assertEqual(self.root.find_path('/new/deep').meta, FolderMeta())
+        self.assertEqual(self.root.find_path('/new').total_files, 1)
+        self.assertIsNotNone(self.root.find_path('/loose'))
+
+    def test_parent_listed_as_file_becomes_folder(self):
+        self.store.bulk_insert([('/top.md/inner', FileMeta(size=4))])
+        self.assertEqual(self.root.find_path('/top.md').meta.get('type'), 'folder')
+        self.assertEqual(self.root.total_files, 3)
+
+    def test_missing_meta_leaves_node_untouched(self):
+        self.store.bulk_insert([('/top.md', None), ('/bare', None)])
+        self.assertEqual(self.root.find_path('/top.md').meta['size'], 1)
+        self.assertIs(self.root.find_path('/bare').meta, EMPTY_META)
+
+    def test_listing_import(self):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write('/x\n/x/y.txt\n')
+        self.addCleanup(os.remove, path)
+        load_listing(path, tree=self.root)
+        self.assertEqual(self.root.find_path('/x').meta.get('type'), 'folder')
+        self.assertEqual(self.root.total_files, 4)
+
+
+class StoreImportTests(StoreTestCase):
+
+    def write_listing(self, text, suffix='.txt'):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_replaces_the_store(self):
+        self.store.close()
+        store = init_tree_from_store(self.db_path, self.write_listing('/x\n/x/y.txt\n'))
+        self.addCleanup(store.close)
+        self.assertIsNotNone(store.root.find_path('/x/y.txt'))
+        self.assertIsNone(store.root.find_path('/Docs'))
+        self.assertFalse(os.path.exists(self.db_path + '.import'))
+
+    def test_failed_import_leaves_the_store_alone(self):
+        self.store.close()
+        with self.assertRaises(ListingError):
+            init_tree_from_store(self.db_path, self.write_listing('{"path": "/x"}\nnot json\n', '.jsonl'))
+        self.assertFalse(os.path.exists(self.db_path + '.import'))
+        store = self.open()
+        self.assertIsNotNone(store.root.find_path('/Docs/Old/b.txt'))
+        self.assertIsNone(store.root.find_path('/x'))
+
+
+class StoreCommandTests(StoreTestCase):
+
+    def run_command(self, main, line):
+        out = StringIO()
+        with redirect_stdout(out):
+            main.onecmd(line)
+        return out.getvalue()
+
+    def test_absolute_cd_and_ls_below_the_root(self):
+        main = TreeFS(self.root)
+        self.run_command(main, 'cd Docs/Old')
+        self.assertIn('size', self.run_command(main, 'ls /top.md'))
+        self.run_command(main, 'cd /Docs')
+        self.assertEqual(main.current_node.get_path(), '/Docs')
+
+    def test_shell_matches_path_tree(self):
+        tree = PathTree(root=True)
+        tree.bulk_insert(ENTRIES)
+        commands = ('ls', 'cd Docs', 'ls', 'ls a.txt', 'tree ascii', 'du -d 2 /', 'find txt', 'cd ..', 'tree -d')
+        memory, store = TreeFS(tree), TreeFS(self.root)
+        for line in commands:
+            self.assertEqual(self.run_command(store, line), self.run_command(memory, line), line)
@@ -0,0 +1,319 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import closing
+import os
+from pathlib import Path
+import tempfile
+import zipfile
+
+import dropbox
+import requests
+
+from stats import STATS
+
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# files_download_zip refuses folders over these limits
+ZIP_MAX_BYTES = 20 * 1024 ** 3
+ZIP_MAX_FILES = 10000
+# Above this average file size per-file downloads parallelise better than one zip stream
+ZIP_MAX_AVERAGE_SIZE = 1024 * 1024
+
+
+class TransferResult:
+
+    def __init__(self, remote_path, local_path, size=0, error=None, metadata=None):
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.size = size
+        self.error = error
+        self.metadata = metadata
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def download_file(client, remote_path, local_path, chunk_size=CHUNK_SIZE, retries=3):
+    """
+    Stream `remote_path` to `local_path` and return the size of the file.
+
+    The body is written in `chunk_size` pieces to '<name>.part', fsynced and
+    renamed into place, so memory use doesn't depend on the file size and
+    `local_path` never holds a partial file.  A dropped connection resumes
+    from the end of the partial file with a Range request, as does a later
+    call that finds a partial file left behind.
+
+    The revision and size of the file are kept in '<name>.part.rev', and a
+    resumed download asks for that revision, so the bytes of two versions are
+    never joined: a partial file whose revision is gone, or that doesn't fit
+    the remote size, is dropped and the download starts over.
+    """
+    local_path = Path(local_path)
+    partial = local_path.with_name(local_path.name + '.part')
+    pin = local_path.with_name(local_path.name + '.part.rev')
+    attempt = 0
+    while True:
+        try:
+            if _stream_to_file(client, remote_path, partial, pin, chunk_size):
+                break
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            pass
+        attempt += 1
+        if attempt > retries:
+            raise requests.exceptions.ConnectionError('Download of {} did not complete'.format(remote_path))
+    os.replace(str(partial), str(local_path))
+    _remove(pin)
+    return local_path.stat().st_size
+
+
+def _remove(*paths):
+    for path in paths:
+        if path.exists():
+            path.unlink()
+
+
+def _read_pin(partial, pin):
+    """
+    (rev, size) the partial file was downloaded from, or (None, None) with
+    the partial removed when there is nothing it can safely be resumed from.
+    """
+    if partial.exists() and pin.exists():
+        rev, _, size = pin.read_text().partition(' ')
+        if rev and size.isdigit():
+            return rev, int(size)
+    _remove(partial, pin)
+    return None, None
+
+
+def _stream_to_file(client, remote_path, partial, pin, chunk_size):
+    """
+    Fetch the rest of the file into `partial` and return whether it now holds
+    the whole file.  False means the download should be tried again, from
+    what is left of the partial file.
+    """
+    rev, size = _read_pin(partial, pin)
+    offset = partial.stat().st_size if rev is not None else 0
+    if offset:
+        try:
+            meta_data, response = client.files_download(
+                remote_path, rev=rev, extra_headers={'Range': 'bytes={}-'.format(offset)})
+        except dropbox.exceptions.HttpError as e:
+            if e.status_code != 416:
+                raise
+            if offset == size:
+                return True  # The partial file already holds the whole body
+            _remove(partial, pin)
+            return False
+        except dropbox.exceptions.ApiError:
+            # The pinned revision is gone; start over from the current one
+            _remove(partial, pin)
+            return False
+        if meta_data.rev != rev or offset > meta_data.size:
+            response.close()
+            _remove(partial, pin)
+            return False
+    else:
+        meta_data, response = client.files_download(remote_path)
+        pin.write_text('{} {}'.format(meta_data.rev, meta_data.size))
+    with closing(response):
+        if offset and response.status_code != 206:
+            offset = 0  # Range not honoured, the body starts from the beginning
+        with open(str(partial), 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    written = partial.stat().st_size
+    if written > meta_data.size:
+        _remove(partial, pin)
+    return written == meta_data.size
+
+
+def prefer_zip(file_count, total_size):
+    """
+    Whether a folder is better fetched as one zip stream than file by file.
+    """
+    return (
+        1 < file_count <= ZIP_MAX_FILES and
+        total_size <= ZIP_MAX_BYTES and
+        total_size <= file_count * ZIP_MAX_AVERAGE_SIZE
+    )
+
+
+@STATS.timed('download zip')
+def download_zip(client, remote_path, local_dir, chunk_size=CHUNK_SIZE):
+    """
+    Fetch a folder with files_download_zip and extract it into `local_dir`,
+    returning a TransferResult per extracted file.
+
+    The stream is spooled to an anonymous temporary file in `chunk_size`
+    pieces because a zip's member list lives at the end of the archive.
+    """
+    parent = remote_path.rstrip('/').rpartition('/')[0]
+    meta_data, response = client.files_download_zip(remote_path)
+    with tempfile.TemporaryFile() as spool:
+        with closing(response):
+            for chunk in response.iter_content(chunk_size):
+                spool.write(chunk)
+        spool.seek(0)
+        with zipfile.ZipFile(spool) as archive:
+            members = [_ for _ in archive.infolist() if not _.is_dir()]
+            archive.extractall(str(local_dir))
+    STATS.add('files downloaded', len(members))
+    return [
+        TransferResult(
+            '{}/{}'.format(parent, member.filename),
+            Path(local_dir).joinpath(member.filename),
+            size=member.file_size,
+        )
+        for member in members
+    ]
+
+
+def _run_bounded(func, jobs, workers, executor=None):
+    """
+    Yield (index, future) for func(*job) over `jobs` as each finishes, with at
+    most `workers` submitted at a time.  The calls run on `executor`, shared
+    with other users, or on a pool of their own when it is None.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from _run_bounded(func, jobs, workers, pool)
+        return
+    pending = {}
+    for idx, job in enumerate(jobs):
+        pending[executor.submit(func, *job)] = idx
+        while len(pending) >= workers:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield pending.pop(future), future
+    for future in as_completed(list(pending)):
+        yield pending.pop(future), future
+
+
+class DownloadScheduler:
+    """
+    Download many files concurrently, up to `workers` at a time, on
+    `executor` or a thread pool of their own.
+
+    A failing file is recorded on its TransferResult and does not stop the rest
+    of the batch.  `progress` is called as progress(done, total, bytes) after
+    every file completes.
+    """
+
+    def __init__(self, client, workers=4, progress=None, download=download_file, executor=None):
+        self.client = client
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.download = download
+        self.executor = executor
+
+    def _run(self, remote_path, local_path):
+        try:
+            with STATS.timer('download'):
+                size = self.download(self.client, remote_path, Path(local_path))
+        except Exception as e:
+            return TransferResult(remote_path, local_path, error=e)
+        STATS.add('files downloaded')
+        return TransferResult(remote_path, local_path, size=size)
+
+    def run(self, jobs):
+        """
+        Download each (remote_path, local_path) pair in `jobs` and return the
+        results in the same order.
+        """
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+        done, transferred = 0, 0
+        for idx, future in _run_bounded(self._run, jobs, self.workers, self.executor):
+            result = results[idx] = future.result()
+            done += 1
+            transferred += result.size
+            if self.progress is not None:
+                self.progress(done, len(jobs), transferred)
+        return results
+
+
+def upload_session(client, local_path, chunk_size=CHUNK_SIZE):
+    """
+    Upload `local_path` into a new upload session, reading it `chunk_size`
+    bytes at a time, and return the closed session's cursor, ready to commit.
+    """
+    size = os.path.getsize(str(local_path))
+    with open(str(local_path), 'rb') as f:
+        chunk = f.read(chunk_size)
+        session = client.files_upload_session_start(chunk, close=len(chunk) >= size)
+        offset = len(chunk)
+        while offset < size:
+            chunk = f.read(chunk_size)
+            cursor = dropbox.files.UploadSessionCursor(session_id=session.session_id, offset=offset)
+            client.files_upload_session_append_v2(chunk, cursor, close=offset + len(chunk) >= size)
+            offset += len(chunk)
+    return dropbox.files.UploadSessionCursor(session_id=session.session_id, offset=offset)
+
+
+class UploadScheduler:
+    """
+    Upload many files concurrently.
+
+    Each file is streamed into its own upload session, up to `workers` at a
+    time on `executor` or a thread pool of their own, then the sessions are committed together with
+    files_upload_session_finish_batch_v2, which avoids the write contention of
+    committing files one by one.  Results carry the FileMetadata of each
+    committed file, or the error that stopped it.
+    """
+    FINISH_BATCH_SIZE = 1000
+
+    def __init__(self, client, workers=4, progress=None, chunk_size=CHUNK_SIZE, overwrite=False, executor=None):
+        self.client = client
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.executor = executor
+        self.mode = dropbox.files.WriteMode.overwrite if overwrite else dropbox.files.WriteMode.add
+
+    def run(self, jobs):
+        """
+        Upload each (local_path, remote_path) pair in `jobs` and return the
+        results in the same order.
+        """
+        results = [TransferResult(remote_path, local_path) for local_path, remote_path in jobs]
+        cursors = {}
+        done, transferred = 0, 0
+        sessions = ((self.client, result.local_path, self.chunk_size) for result in results)
+        for idx, future in _run_bounded(upload_session, sessions, self.workers, self.executor):
+            try:
+                cursors[idx] = future.result()
+            except Exception as e:
+                results[idx].error = e
+            else:
+                results[idx].size = cursors[idx].offset
+            done += 1
+            transferred += results[idx].size
+            if self.progress is not None:
+                self.progress(done, len(results), transferred)
+        self._finish(results, sorted(cursors.items()))
+        return results
+
+    def _finish(self, results, cursors):
+        for start in range(0, len(cursors), self.FINISH_BATCH_SIZE):
+            batch = cursors[start:start + self.FINISH_BATCH_SIZE]
+            entries = [
+                dropbox.files.UploadSessionFinishArg(
+                    cursor=cursor,
+                    commit=dropbox.files.CommitInfo(path=results[idx].remote_path, mode=self.mode),
+                )
+                for idx, cursor in batch
+            ]
+            try:
+                finished = self.client.files_upload_session_finish_batch_v2(entries).entries
+            except Exception as e:
+                for idx, _ in batch:
+                    results[idx].error = e
+                continue
+            for (idx, _), entry in zip(batch, finished):
+                if entry.is_success():
+                    results[idx].metadata = entry.get_success()
+                else:
+                    results[idx].error = entry.get_failure()
@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from urllib.parse import urlsplit, urlunsplit
+
+import dropbox
+from requests.adapters import HTTPAdapter
+
+from stats import STATS
+
+
+DROPBOX_HOSTS = ('api.dropboxapi.com', 'content.dropboxapi.com', 'notify.dropboxapi.com')
+
+
+class RewriteAdapter(HTTPAdapter):
+    """
+    Send requests for the Dropbox API hosts to `base_url` instead, keeping the
+    path, so the SDK can be pointed at a local stand-in server.
+    """
+
+    def __init__(self, base_url, **kwargs):
+        self.base = urlsplit(base_url)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        if url.hostname in DROPBOX_HOSTS:
+            request.url = urlunsplit((self.base.scheme, self.base.netloc, url.path, url.query, url.fragment))
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_size=16, keep_alive=True, base_url=None):
+    session = dropbox.create_session(max_connections=pool_size)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    if base_url is not None:
+        session.mount('https://', RewriteAdapter(base_url, pool_maxsize=pool_size))
+    session.hooks['response'].append(STATS.response_hook)
+    return session
+
+
+class Transport:
+    """
+    The HTTP session and dropbox.Dropbox client shared by everything that
+    talks to Dropbox, so listings, refreshes and transfers draw on one
+    connection pool.
+
+    `call` runs a client method on a pool of `max_concurrency` threads and can
+    be awaited, so independent requests overlap on one event loop; `run` drives
+    such a coroutine from synchronous code.  An existing `client` can be
+    wrapped instead of building one from `token`.
+    """
+
+    def __init__(self, token=None, client=None, pool_size=16, max_concurrency=8, keep_alive=True,
+                 timeout=100, base_url=None, max_retries=4):
+        self.session = None
+        if client is None:
+            self.session = create_session(pool_size=pool_size, keep_alive=keep_alive, base_url=base_url)
+            client = dropbox.Dropbox(token, session=self.session, timeout=timeout, max_retries_on_error=max_retries)
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='dropbox')
+        return self._executor
+
+    async def call(self, method, *args, **kwargs):
+        func = functools.partial(getattr(self.client, method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func)
+
+    def run(self, coro):
+        return asyncio.run(coro)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.session is not None:
+            self.session.close()
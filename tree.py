@@ -1,4 +1,17 @@
-class PathTree:
+from fnmatch import fnmatchcase
+import sys
+
+from meta import EMPTY_META, FolderMeta, without_id
+from name_index import NameIndex
+from stats import STATS
+
+
+class TreeNode:
+    """
+    Navigation and drawing shared by the tree implementations, written only in
+    terms of value, meta, children, parent and get_child.
+    """
+    __slots__ = ()
 
     DRAW_TYPE = {
         'ascii': ('|', '|- ', '.- '),
@@ -9,38 +22,21 @@ class PathTree:
         'ascii-emh': ('\u2502', '\u255e\u2550 ', '\u2558\u2550 '),
     }
 
-    def __init__(self, val=None, root=False):
-        self.value = val if not root else val or '/'
-        self.children = []
-        self.parent = None
-        self.meta = dict()
-
     def __str__(self):
         return self.value
 
-    def __repr__(self):
-        return "PathTree('{}')".format(self.value)
-
     def __iter__(self):
         if self.children is None:
             raise StopIteration
         yield from self.children  # flake8: noqa
 
-    def __eq__(self, comp):
-        return self.value == comp
-
     @property
     def is_root(self):
         return self.parent is None
 
-    def add_child(self, node):
-        node.parent = self
-        self.children.append(node)
-
-    def get_child(self, identifier):
-        if not self.children:
-            return None
-        return next((child for child in self.children if child.value == identifier), None)
+    @property
+    def is_folder(self):
+        return self.meta.get('type') == 'folder' or bool(self.children)
 
     def _origin_from_path(self, node_path):
         parts = self._get_path_parts(node_path)
@@ -55,88 +51,436 @@ class PathTree:
         parts = node_path.split('/')
         return parts[1:] if node_path.startswith('/') else parts
 
+    def _absolute_path(self, node_path):
+        """
+        Normalise an absolute path to the form get_path returns, so it can be
+        looked up in the path index.  As in _origin_from_path, a leading
+        component naming the root is optional.
+        """
+        path = node_path.rstrip('/') or '/'
+        if self.value == '/':
+            return path
+        first = path[1:].partition('/')[0]
+        if first.lower() == self.value.lower():
+            return path
+        return '/' + self.value + path
+
+    def _find_node(self, node, path):
+        val = path.pop(0)
+        contains = node.get_child(val)
+        if len(path) > 0 and contains:
+            return contains._find_node(contains, path)
+        return contains
+
+    @STATS.timed('tree.glob')
+    def glob(self, pattern):
+        """
+        Return the nodes matching a path whose components may contain shell
+        wildcards (*, ?, [seq]).
+        """
+        if not any(_ in pattern for _ in '*?['):
+            node = self.find_path(pattern)
+            return [node] if node is not None else []
+        origin, parts = self._origin_from_path(pattern)
+        nodes = [origin]
+        for part in parts:
+            if any(_ in part for _ in '*?['):
+                nodes = [c for n in nodes for c in n.children if fnmatchcase(c.value, part)]
+            else:
+                nodes = [c for c in (n.get_child(part) for n in nodes) if c is not None]
+        return nodes
+
+    def walk(self):
+        """
+        Yield this node and all of its descendants, parents before children.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def get_root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def get_ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def display(self, level=0):
+        stack = [(self, level)]
+        lines = []
+        while stack:
+            node, depth = stack.pop()
+            lines.append('    ' * depth + node.value + '\n')
+            stack.extend((_, depth + 1) for _ in reversed(node.children))
+        return ''.join(lines)
+
+    def is_within(self, node):
+        """
+        True if this node is `node` or one of its descendants.
+        """
+        return self is node or any(_ is node for _ in self.get_ancestors())
+
+# ====================================================================================================
+
+    def formated_print(self, node=None, line_type='ascii-ex', func=print, max_depth=None, dirs_only=False):
+        for line in self.draw_lines(node, line_type, max_depth=max_depth, dirs_only=dirs_only):
+            func(line)
+
+    def draw_lines(self, node=None, line_type='ascii-ex', max_depth=None, dirs_only=False, expand=None):
+        """
+        Lazily yield the lines of the drawn tree under `node`, so callers can
+        stop early.  Nothing deeper than `max_depth` levels is visited, and
+        with `dirs_only` files are left out.  `expand` is called with each
+        folder just before its children are drawn.
+        """
+        dt_vline, dt_line_box, dt_line_corner = self.DRAW_TYPE[line_type]
+        node = self if node is None else node
+        yield node.value
+        # (node, its marker, leading for its children, level)
+        stack = []
+        leading = ''
+        level = 0
+        while True:
+            if max_depth is None or level < max_depth:
+                if expand is not None:
+                    expand(node)
+                children = [_ for _ in node.children if _.is_folder] if dirs_only else node.children
+                last = len(children) - 1
+                for idx in range(last, -1, -1):
+                    is_last = idx == last
+                    stack.append((
+                        children[idx],
+                        leading + (dt_line_corner if is_last else dt_line_box),
+                        leading + (' ' * 3 if is_last else dt_vline + ' ' * 2),
+                        level + 1,
+                    ))
+            if not stack:
+                return
+            node, marker, leading, level = stack.pop()
+            yield marker + node.value
+
+
+class PathTree(TreeNode):
+    __slots__ = ('_value', 'children', '_child_index', 'parent', '_meta', '_names', '_path', 'total_size', 'total_files')
+
+    def __init__(self, val=None, root=False, indexed=None):
+        val = val if not root else val or '/'
+        self._value = sys.intern(val) if isinstance(val, str) else val
+        self.children = []
+        self._child_index = None
+        self.parent = None
+        self._meta = EMPTY_META
+        self._names = None
+        self._path = None
+        # Bytes and file count of this node and everything below it
+        self.total_size = 0
+        self.total_files = 0
+        if root if indexed is None else indexed:
+            self._set_name_index(NameIndex())
+
+    def __repr__(self):
+        return "PathTree('{}')".format(self.value)
+
+    def __eq__(self, comp):
+        return self.value == comp
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, val):
+        parent = self.parent
+        names = self._names
+        if parent is not None:
+            parent._unindex_child(self)
+        if names is not None:
+            names.discard_paths(self)
+            names.discard_name(self)
+        self._value = sys.intern(val) if isinstance(val, str) else val
+        self._invalidate_paths()
+        if names is not None:
+            names.add_name(self)
+            names.add_paths(self)
+        if parent is not None:
+            parent._index_child(self)
+
+    @property
+    def meta(self):
+        return self._meta
+
+    @meta.setter
+    def meta(self, meta):
+        old_size, old_files = self._own_totals(self._meta)
+        self._meta = meta
+        new_size, new_files = self._own_totals(meta)
+        self._propagate_totals(new_size - old_size, new_files - old_files)
+
+    @staticmethod
+    def _own_totals(meta):
+        if meta.get('type') != 'file':
+            return 0, 0
+        size = meta.get('size')
+        return (size if isinstance(size, int) else 0), 1
+
+    def _propagate_totals(self, size, files):
+        if not size and not files:
+            return
+        node = self
+        while node is not None:
+            node.total_size += size
+            node.total_files += files
+            node = node.parent
+
+    def add_child(self, node):
+        node.parent = self
+        if node._path is not None:
+            node._invalidate_paths()
+        self.children.append(node)
+        self._index_child(node)
+        self._propagate_totals(node.total_size, node.total_files)
+        names = self._names
+        if node._names is not names:
+            if node._names is None and not node.children:
+                node._names = names
+                names.add(node)
+            else:
+                node._set_name_index(names)
+
+    def remove_child(self, node):
+        # Nodes compare equal by value, so locate the exact instance rather than using list.remove
+        idx = next(i for i, child in enumerate(self.children) if child is node)
+        del self.children[idx]
+        self._unindex_child(node)
+        self._propagate_totals(-node.total_size, -node.total_files)
+        # Unindex while still attached, so the indexed paths are the ones being removed
+        if node._names is not None:
+            node._set_name_index(None)
+        node.parent = None
+        node._invalidate_paths()
+
+    def _set_name_index(self, index):
+        """
+        Move this subtree from its current name index (if any) to `index`.
+        """
+        if self._names is not None:
+            self._names.discard_subtree(self)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node._names = index
+            stack.extend(node.children)
+        if index is not None:
+            index.add_subtree(self)
+
+    def get_child(self, identifier):
+        if self._child_index is None:
+            return None
+        return self._child_index.get(identifier)
+
+    def _index_child(self, node):
+        # Created on first use so leaf nodes don't each carry an empty dict
+        if self._child_index is None:
+            self._child_index = {}
+        self._child_index.setdefault(node._value, node)
+
+    def _unindex_child(self, node):
+        if self.get_child(node.value) is not node:
+            return
+        del self._child_index[node.value]
+        # Siblings may share a name; the first remaining one takes over, as a linear scan would find it
+        for child in self.children:
+            if child is not node and child.value == node.value:
+                self._child_index[child.value] = child
+                break
+
     def insert_path(self, node_path):
         node, parts = self._origin_from_path(node_path)
-        self._insert_node(node, parts)
+        return self._insert_node(node, parts)
 
     def _insert_node(self, node, path):
-        val = path.pop(0)
-        n = node.get_child(val)
-        if not n:
-            n = PathTree(val)
-            node.add_child(n)
-        if len(path) > 0:
-            n._insert_node(n, path)
+        for val in path:
+            child = node.get_child(val)
+            if child is None:
+                child = PathTree(val)
+                node.add_child(child)
+            node = child
+        return node
+
+    @STATS.timed('tree.bulk_insert')
+    def bulk_insert(self, entries):
+        """
+        Insert an iterable of (path, meta) pairs in a single pass and return the
+        number of entries processed.
+
+        The parent of the previous entry is remembered, so runs of siblings (as
+        returned by a folder listing) attach without walking from the root again.
+        A meta of None leaves the node's metadata untouched.
+        """
+        parent_key, parent = None, None
+        # Totals of new nodes under `parent`, carried up in one walk when the parent changes
+        run_size = run_files = 0
+        count = 0
+        for node_path, meta in entries:
+            head, sep, name = node_path.rpartition('/')
+            if head + sep != parent_key:
+                if run_files or run_size:
+                    parent._propagate_totals(run_size, run_files)
+                    run_size = run_files = 0
+                if not sep:
+                    parent = self
+                elif not head:
+                    parent = self.get_root()
+                else:
+                    parent = self.insert_path(head)
+                parent_key = head + sep
+            if sep and not head and name == parent.value:
+                node = parent  # '/<root>' names the root itself, as in insert_path
+            else:
+                node = parent.get_child(name)
+                if node is None:
+                    node = PathTree(name)
+                    parent.add_child(node)
+                    if meta is not None:
+                        node._meta = meta
+                        size, files = self._own_totals(meta)
+                        node.total_size, node.total_files = size, files
+                        run_size += size
+                        run_files += files
+                    count += 1
+                    continue
+            if meta is not None:
+                node.meta = meta
+            count += 1
+        if run_files or run_size:
+            parent._propagate_totals(run_size, run_files)
+        STATS.add('tree entries', count)
+        return count
+
+    def mark_folders(self):
+        """
+        Give every node below this one that has children folder metadata, for
+        listings that don't say which entries are folders or leave parents out.
+        """
+        for node in self.walk():
+            if node.children and node.meta.get('type') != 'folder':
+                node.meta = FolderMeta(id=node.meta.get('id') or '')
 
     def find_path(self, node_path):
         if node_path == '/':
             return self.get_root()
+        if node_path.startswith('/'):
+            root = self.get_root()
+            if root._names is not None:
+                path = root._absolute_path(node_path)
+                node = root._names.find_path(path.lower())
+                if node is not None and node.get_path() == path:
+                    return node
         node, parts = self._origin_from_path(node_path)
         return self._find_node(node, parts)
 
-    def _find_node(self, node, path):
-        val = path.pop(0)
-        contains = node.get_child(val)
-        if len(path) > 0 and contains:
-            return contains._find_node(contains, path)
-        return contains
+    def find_path_lower(self, node_path):
+        """
+        Case-insensitive find_path, for paths such as Dropbox's path_lower.
+        """
+        if node_path == '/':
+            return self.get_root()
+        parts = self._get_path_parts(node_path)
+        node = self
+        if node_path.startswith('/'):
+            node = self.get_root()
+            if node._names is not None:
+                found = node._names.find_path(node._absolute_path(node_path).lower())
+                if found is not None:
+                    return found
+            if parts and parts[0].lower() == node.value.lower():
+                parts.pop(0)
+        for val in parts:
+            child = node.get_child(val)
+            if child is None:
+                child = next((_ for _ in node.children if _.value.lower() == val.lower()), None)
+            if child is None:
+                return None
+            node = child
+        return node
 
-    def get_root(self):
-        ancestors = list(self.get_ancestors())
-        return ancestors[-1] if ancestors else self
+    def remove(self):
+        if self.parent is not None:
+            self.parent.remove_child(self)
 
-    def get_ancestors(self):
-        if not self.is_root:
-            yield self.parent
-            yield from self.parent.get_ancestors()
+    def move_to(self, parent, name=None):
+        """
+        Detach this subtree and attach it under `parent`, renamed to `name` if given.
+        """
+        self.remove()
+        if name is not None:
+            self.value = name
+        parent.add_child(self)
+        return self
+
+    def copy(self):
+        """
+        Return a detached copy of this subtree.  Metadata records are shared,
+        not copied, as they are replaced rather than modified, except that the
+        descendants lose their Dropbox ids, which belong to the originals.
+        """
+        clone = PathTree(self.value)
+        clone.meta = self.meta
+        stack = [(self, clone)]
+        while stack:
+            source, target = stack.pop()
+            for child in source.children:
+                child_clone = PathTree(child.value)
+                child_clone.meta = without_id(child.meta)
+                target.add_child(child_clone)
+                stack.append((child, child_clone))
+        return clone
 
     def get_path(self):
-        path = '/'.join(reversed([self.value] + [_.value for _ in self.get_ancestors()]))
-        if path.startswith('//'):
-            return path[1:]
-        if not path.startswith('/'):
-            return '/' + path
+        """
+        Absolute path of this node.  Cached on the node, and cleared for the
+        whole subtree when it is moved, detached or renamed.
+        """
+        path = self._path
+        if path is None:
+            path = self._path = self._build_path()
         return path
 
-    def display(self, level=0):
-        out = '    ' * level + self.value + '\n'
-        for child in self.children:
-            out += child.display(level + 1)
-        return out
+    def _build_path(self):
+        # Uncached variant for the path index, so leaves indexed during a bulk load don't each keep a copy
+        if self.parent is None:
+            return self.value if self.value.startswith('/') else '/' + self.value
+        head = self.parent.get_path()
+        return head + self.value if head.endswith('/') else head + '/' + self.value
+
+    def _invalidate_paths(self):
+        # A node's path is only cached once its parent's is, so uncached nodes end the walk
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._path is not None:
+                node._path = None
+                stack.extend(node.children)
 
+    @STATS.timed('tree.search')
     def search(self, target, exact=False, relative=False):
         node = self if relative else self.get_root()
-        return list(self._search(node, target, exact))
+        if node._names is None:
+            return list(self._search(node, target, exact))
+        found = node._names.search(target, exact)
+        if relative and not node.is_root:
+            found = [_ for _ in found if _.is_within(node)]
+        return found
 
     def _search(self, node, target, exact):
         if (not exact and target in node.value) or (exact and node.value == target):
             yield node
         for child in node.children:
             yield from self._search(child, target, exact)
-
-# ====================================================================================================
-
-    def formated_print(self, node=None, line_type='ascii-ex', func=print):
-        dt = self.DRAW_TYPE[line_type]
-        node = self if node is None else node
-        for pre, node in self.__draw_tree(node, dt, []):
-            func('{0}{1}'.format(pre, node.value))
-
-    def __draw_tree(self, node, draw_type, is_last, level=0):
-        dt_vline, dt_line_box, dt_line_corner = draw_type
-
-        if node.parent is None or level == 0:
-            yield '', node
-        else:
-            leading = ''.join([dt_vline + ' ' * 2 if not x else ' ' * 3 for x in is_last[0:-1]])
-            node_marker = dt_line_corner if is_last[-1] else dt_line_box
-            yield leading + node_marker, node
-
-        level += 1
-        if node.children:
-            idxlast = len(node.children)-1
-            for idx, child in enumerate(node.children):
-                is_last.append(idx == idxlast)
-                for item in self.__draw_tree(child, draw_type, is_last, level):
-                    yield item
-                is_last.pop()
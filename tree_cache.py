@@ -0,0 +1,58 @@
+import hashlib
+import os
+import pickle
+
+import config
+from tree import PathTree
+
+
+CACHE_VERSION = 2
+CACHE_PATH = config.CREDS_PATH.joinpath('cache')
+
+
+def cache_file(root=None, token=None):
+    key = hashlib.sha1('{}\0{}'.format(token or '', root or '').encode()).hexdigest()
+    return CACHE_PATH.joinpath('tree_{}.pickle'.format(key))
+
+
+def iter_entries(tree):
+    """
+    Yield (path, meta) for every node below the root, parents before children,
+    so the listing can be fed straight back into PathTree.bulk_insert.
+    """
+    stack = [(tree.get_path().rstrip('/'), child) for child in reversed(tree.children)]
+    while stack:
+        parent_path, node = stack.pop()
+        node_path = '{}/{}'.format(parent_path, node.value)
+        yield node_path, node.meta
+        stack.extend((node_path, child) for child in reversed(node.children))
+
+
+def save_snapshot(path, tree, cursor):
+    snapshot = {
+        'version': CACHE_VERSION,
+        'cursor': cursor,
+        'entries': list(iter_entries(tree)),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(str(tmp), 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(str(tmp), str(path))
+
+
+def load_snapshot(path):
+    """
+    Return (tree, cursor) from a saved snapshot, or None if there is no usable
+    snapshot at `path`.
+    """
+    try:
+        with open(str(path), 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != CACHE_VERSION:
+        return None
+    tree = PathTree(root=True)
+    tree.bulk_insert(snapshot['entries'])
+    return tree, snapshot['cursor']
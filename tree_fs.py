@@ -1,11 +1,16 @@
 import cmd
-from itertools import zip_longest
+from itertools import islice, zip_longest
+import os
 import shlex
 import shutil
+import subprocess
+import sys
 import textwrap
+import threading
 
-from exceptions import InvalidPath
-from utils import DropboxUtils, Parser, set_docstring_from_parser
+from cli_utils import Parser, set_docstring_from_parser
+from exceptions import InvalidPath, ParserError
+from stats import LATENCY_BUCKETS, STATS
 from tree import PathTree
 
 
@@ -33,22 +38,124 @@ class TreeFSParsers:
         )
         return parser
 
+    @classmethod
+    def _tree_parser(cls):
+        parser = Parser(prog='tree')
+        parser.add_argument(
+            '-L', '--level',
+            type=int,
+            default=None,
+            help='Descend at most this many levels'
+        )
+        parser.add_argument(
+            '-d', '--dirs-only',
+            action='store_true',
+            default=False,
+            help='Only draw folders'
+        )
+        parser.add_argument(
+            '-n', '--limit',
+            type=int,
+            default=None,
+            help='Stop after drawing this many lines'
+        )
+        parser.add_argument(
+            '-p', '--pager',
+            action='store_true',
+            default=False,
+            help='Page the output through $PAGER (default: less)'
+        )
+        parser.add_argument(
+            'style',
+            nargs='?',
+            default='ascii-ex',
+            help='Draw style, one of: {}'.format(', '.join(PathTree.DRAW_TYPE))
+        )
+        return parser
+
+    @classmethod
+    def _du_parser(cls):
+        parser = Parser(prog='du')
+        parser.add_argument(
+            '-d', '--depth',
+            type=int,
+            default=1,
+            help='Show folders down to this many levels below the target'
+        )
+        parser.add_argument(
+            '-s', '--sort',
+            action='store_true',
+            default=False,
+            help='Sort folders by size, largest first'
+        )
+        parser.add_argument(
+            'path',
+            nargs='*',
+            help='Folder to report on (defaults to the current folder)'
+        )
+        return parser
+
+    @classmethod
+    def _stats_parser(cls):
+        parser = Parser(prog='stats')
+        parser.add_argument(
+            '-r', '--reset',
+            action='store_true',
+            default=False,
+            help='Clear the statistics after showing them'
+        )
+        return parser
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            break
+        size /= 1024
+    return '{:.0f} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+
 
 class TreeFS(cmd.Cmd):
     doc_header = 'Commands'
     undoc_header = 'No help available'
     ruler = '-'
 
-    def __init__(self, tree, *args, **kwargs):
+    def __init__(self, tree, *args, lock=None, loader=None, **kwargs):
         self.tree = tree
         self.current_node = self.tree
+        self.lock = lock or threading.RLock()
+        # LazyLoader filling in folders on first use, in --lazy mode
+        self.loader = loader
+        self.last_found = []
         super().__init__(*args, **kwargs)
 
     def onecmd(self, *args):
-        try:
-            super().onecmd(*args)
-        except InvalidPath as e:
-            self.fprint(str(e))
+        with self.lock:
+            if self.current_node.get_root() is not self.tree:
+                # The current folder was removed by a background update
+                self.current_node = self.tree
+            try:
+                return super().onecmd(*args)
+            except InvalidPath as e:
+                self.fprint(str(e))
+
+    def _find_path(self, path):
+        if self.loader is None:
+            return self.current_node.find_path(path)
+        return self.loader.find_path(self.current_node, path)
+
+    def _glob(self, pattern):
+        if self.loader is None:
+            return self.current_node.glob(pattern)
+        return self.loader.glob(self.current_node, pattern)
+
+    def _expand(self, node, recursive=False, depth=None):
+        if self.loader is None:
+            return
+        if depth is not None:
+            self.loader.expand_to_depth(node, depth)
+        else:
+            self.loader.expand(node, recursive=recursive)
 
     @property
     def prompt(self):
@@ -58,28 +165,71 @@ class TreeFS(cmd.Cmd):
         prefix = ' ' * 4
         print(textwrap.indent(line, prefix))
 
+    @set_docstring_from_parser(TreeFSParsers._tree_parser)
     def do_tree(self, args):
-        """
-        Pretty print tree.
+        parser = TreeFSParsers._tree_parser()
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
+        line_type = args.style if args.style in PathTree.DRAW_TYPE else 'ascii-ex'
+        expand = None
+        if args.limit is not None and self.loader is not None:
+            # List folders as they are drawn, so only what is shown gets listed
+            expand = self.loader.expand
+        else:
+            self._expand(self.current_node, recursive=True, depth=args.level)
+        lines = self.current_node.draw_lines(
+            line_type=line_type, max_depth=args.level, dirs_only=args.dirs_only, expand=expand)
+        if args.limit is not None:
+            lines = self._limit_lines(lines, args.limit)
+        if args.pager:
+            self._page_lines(lines)
+        else:
+            self._write_lines(lines, sys.stdout)
 
-        --> tree [style]
+    @staticmethod
+    def _limit_lines(lines, limit):
+        yield from islice(lines, limit)
+        if next(lines, None) is not None:
+            yield '... stopped after {} lines'.format(limit)
 
-        Draw Styles:
-            'ascii'    : plain ascii
-            'ascii-ex' : line drawing
-            'ascii-exr': line drawing, rounded corners
-            'ascii-em' : emphasis line drawing
-            'ascii-emv': vertical lines emphasized line drawing
-            'ascii-emh': horizontal lines emphasized line drawing
+    @staticmethod
+    def _write_lines(lines, out, batch_size=1000):
         """
-        default_style = 'ascii-ex'
-        line_type = args if args in PathTree.DRAW_TYPE.keys() else default_style
-        self.current_node.formated_print(line_type=line_type)
+        Write `lines` to `out` in batches rather than one write per line.
+        """
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) == batch_size:
+                out.write('\n'.join(batch) + '\n')
+                batch.clear()
+        if batch:
+            out.write('\n'.join(batch) + '\n')
+        out.flush()
+
+    def _page_lines(self, lines):
+        pager = subprocess.Popen(
+            os.environ.get('PAGER') or 'less',
+            shell=True,
+            stdin=subprocess.PIPE,
+            universal_newlines=True,
+            errors='replace',
+        )
+        try:
+            self._write_lines(lines, pager.stdin)
+            pager.stdin.close()
+        except BrokenPipeError:
+            # The pager was quit early; stop drawing
+            pass
+        pager.wait()
 
     def do_ls(self, args):
-        node = self.current_node.find_path(args.strip()) if args else self.current_node
+        node = self._find_path(args.strip()) if args else self.current_node
         if node is None:
             raise InvalidPath(args)
+        self._expand(node)
         method = self._ls_meta if node.meta and node.meta.get('type') != 'folder' else self._ls
         for line in method(node):
             self.fprint(line)
@@ -115,9 +265,10 @@ class TreeFS(cmd.Cmd):
             if self.current_node.parent:
                 self.current_node = self.current_node.parent
             return
-        node = self.current_node.find_path(next_node)
+        node = self._find_path(next_node)
         if node is None:
             raise InvalidPath(args)
+        self._expand(node)
         self.current_node = node
         if node.meta.get('type') == 'file':
             self.current_node = node.parent or node
@@ -133,7 +284,7 @@ class TreeFS(cmd.Cmd):
             return
         if not args.target:
             return
-        found = self._find(args)
+        found = self.last_found = self._find(args)
         if found:
             for line in sorted(_.get_path() for _ in found):
                 self.fprint(line)
@@ -142,8 +293,95 @@ class TreeFS(cmd.Cmd):
 
     def _find(self, args):
         target = ' '.join(args.target)
+        if args.relative:
+            self._expand(self.current_node, recursive=True)
         return self.current_node.search(target, exact=args.exact, relative=args.relative)
 
+    @set_docstring_from_parser(TreeFSParsers._du_parser)
+    def do_du(self, args):
+        parser = TreeFSParsers._du_parser()
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
+        path = ' '.join(args.path)
+        node = self._find_path(path) if path else self.current_node
+        if node is None:
+            raise InvalidPath(path)
+        # Totals only cover what has been listed
+        self._expand(node, recursive=True)
+        for line in self._du(node, depth=args.depth, sort=args.sort):
+            self.fprint(line)
+
+    def _du(self, node, depth=1, sort=False):
+        """
+        Report the size and file count of `node` and of its folders down to
+        `depth` levels, from the totals each node keeps for its subtree.
+        """
+        entry = '{:>10}  {:>8} files  {}'
+        stack = [(node, 0)]
+        while stack:
+            current, level = stack.pop()
+            if level:
+                yield entry.format(format_size(current.total_size), current.total_files, current.get_path())
+            if level < depth:
+                folders = [_ for _ in current.children if _.is_folder]
+                if sort:
+                    folders.sort(key=lambda _: _.total_size)
+                else:
+                    folders.reverse()
+                stack.extend((_, level + 1) for _ in folders)
+        yield entry.format(format_size(node.total_size), node.total_files, node.get_path())
+
+    @set_docstring_from_parser(TreeFSParsers._stats_parser)
+    def do_stats(self, args):
+        parser = TreeFSParsers._stats_parser()
+        try:
+            args = parser.parse_args(shlex.split(args, posix=True))
+        except ParserError:
+            return
+        for line in self.stats_report(STATS.snapshot()):
+            self.fprint(line)
+        if args.reset:
+            STATS.reset()
+
+    @staticmethod
+    def stats_report(snapshot):
+        """
+        Format a Stats snapshot: timings, API calls with their latency
+        histograms, listing throughput and bytes transferred.
+        """
+        counters = snapshot['counters']
+        if snapshot['timings']:
+            yield 'Timings'
+            for name, (count, total, longest) in sorted(snapshot['timings'].items()):
+                yield '    {:<20} {:>6} x {:>9.3f}s  max {:>8.3f}s'.format(name, count, total, longest)
+        if snapshot['api']:
+            yield 'API calls'
+            labels = ['<{:g}ms'.format(_ * 1000) for _ in LATENCY_BUCKETS]
+            labels.append('>{:g}ms'.format(LATENCY_BUCKETS[-1] * 1000))
+            for endpoint, call in sorted(snapshot['api'].items()):
+                count, total, longest = call['timing']
+                yield '    {:<36} {:>6} calls  avg {:>8.1f} ms  max {:>8.1f} ms'.format(
+                    endpoint, count, total / count * 1000, longest * 1000)
+                buckets = ('{} {}'.format(label, n) for label, n in zip(labels, call['histogram']) if n)
+                yield '        ' + '  '.join(buckets)
+        listing = snapshot['timings'].get('listing')
+        if counters.get('pages') and listing:
+            seconds = listing[1] or float('nan')
+            yield 'Listing'
+            yield '    {:,} pages, {:,} entries in {:.2f}s: {:,.1f} pages/s, {:,.0f} entries/s'.format(
+                counters['pages'], counters.get('entries', 0), listing[1],
+                counters['pages'] / seconds, counters.get('entries', 0) / seconds)
+        if any(_ in counters for _ in ('bytes received', 'bytes sent', 'files downloaded')):
+            yield 'Transfers'
+            yield '    received {}, sent {}, {} files downloaded'.format(
+                format_size(counters.get('bytes received', 0)), format_size(counters.get('bytes sent', 0)),
+                counters.get('files downloaded', 0))
+        if 'tree entries' in counters:
+            yield 'Tree'
+            yield '    {:,} entries inserted'.format(counters['tree entries'])
+
     def do_quit(self, args):
         return True
 
@@ -0,0 +1,396 @@
+from collections import OrderedDict
+import os
+import sqlite3
+
+from meta import EMPTY_META, FileMeta, FolderMeta
+from stats import STATS
+from tree import TreeNode
+
+
+ROOT_ID = 1
+CACHE_SIZE = 100000
+PARENT_CACHE_SIZE = 10000
+COLUMNS = 'id, parent_id, name, type, size, modified, dropbox_id, content_hash, total_size, total_files'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    path_lower TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    type TEXT,
+    size INTEGER,
+    modified TEXT,
+    dropbox_id TEXT,
+    content_hash TEXT,
+    total_size INTEGER NOT NULL DEFAULT 0,
+    total_files INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS nodes_parent_name ON nodes (parent_id, name);
+CREATE TABLE IF NOT EXISTS store_state (key TEXT PRIMARY KEY, value TEXT);
+'''
+
+# Not needed while inserting, so bulk_insert drops them and builds them again
+# afterwards, which is much faster than updating them row by row
+LOOKUP_INDEXES = {
+    'nodes_path_lower': 'nodes (path_lower)',
+    'nodes_name': 'nodes (name)',
+    'nodes_depth': 'nodes (depth)',
+}
+
+# Trigram index over the names for substring search.  As with NameIndex it is
+# only brought up to date by the first substring search after an insert, and
+# is left out where SQLite is built without FTS5
+NAME_SEARCH = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS name_search USING fts5(
+    name, content='nodes', content_rowid='id', tokenize='trigram case_sensitive 1'
+)
+'''
+
+
+class StoreNode(TreeNode):
+    """
+    A node of a TreeStore, with the read side of the PathTree API.  Nodes are
+    built from their row on first use and dropped again when they fall out of
+    the store's cache, so they are compared by row id rather than identity.
+    """
+    __slots__ = ('store', 'id', 'parent_id', 'value', 'meta', 'total_size', 'total_files', '_path')
+
+    def __init__(self, store, row):
+        self.store = store
+        self._load(row)
+
+    def _load(self, row):
+        node_id, self.parent_id, self.value, kind, size, modified, dropbox_id, content_hash, \
+            self.total_size, self.total_files = row
+        self.id = node_id
+        self._path = None
+        if kind == 'file':
+            self.meta = FileMeta(
+                id=dropbox_id or '', modified=modified or '', size='' if size is None else size,
+                content_hash=content_hash,
+            )
+        elif kind == 'folder':
+            self.meta = FolderMeta(id=dropbox_id or '')
+        else:
+            self.meta = EMPTY_META
+
+    def __repr__(self):
+        return "StoreNode('{}')".format(self.value)
+
+    def __eq__(self, other):
+        return isinstance(other, StoreNode) and other.store is self.store and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    @property
+    def parent(self):
+        if self.parent_id is None:
+            return None
+        return self.store.node(self.parent_id)
+
+    @property
+    def children(self):
+        return self.store.children(self.id)
+
+    @property
+    def is_folder(self):
+        return self.meta.get('type') == 'folder' or self.store.has_children(self.id)
+
+    def get_child(self, identifier):
+        return self.store.child(self.id, identifier)
+
+    def get_root(self):
+        return self.store.root
+
+    def is_within(self, node):
+        return self == node or any(_ == node for _ in self.get_ancestors())
+
+    def get_path(self):
+        path = self._path
+        if path is None:
+            parent = self.parent
+            if parent is None:
+                path = '/'
+            else:
+                head = parent.get_path()
+                path = head + self.value if head.endswith('/') else head + '/' + self.value
+            self._path = path
+        return path
+
+    def find_path(self, node_path):
+        if node_path == '/':
+            return self.store.root
+        if node_path.startswith('/'):
+            path = self.store.root._absolute_path(node_path)
+            for node in self.store.nodes_by_path_lower(path.lower()):
+                if node.get_path() == path:
+                    return node
+            return None
+        node, parts = self._origin_from_path(node_path)
+        return self._find_node(node, parts)
+
+    def find_path_lower(self, node_path):
+        if not node_path.startswith('/'):
+            node_path = self.get_path().rstrip('/') + '/' + node_path
+        path = self.store.root._absolute_path(node_path)
+        return next(iter(self.store.nodes_by_path_lower(path.lower())), None)
+
+    def search(self, target, exact=False, relative=False):
+        found = self.store.search(target, exact)
+        if relative and not self.is_root:
+            found = [_ for _ in found if _.is_within(self)]
+        return found
+
+    def bulk_insert(self, entries):
+        return self.store.bulk_insert(entries)
+
+    def mark_folders(self):
+        """
+        Nothing to do: the store gives parents folder metadata as it inserts
+        their children.
+        """
+
+
+def remove_database(db_path, journal_only=False):
+    """
+    Delete the database at `db_path` with its WAL files, or only the WAL
+    files with `journal_only`.
+    """
+    paths = (db_path + '-wal', db_path + '-shm') if journal_only else (db_path, db_path + '-wal', db_path + '-shm')
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class TreeStore:
+    """
+    A tree kept in an SQLite database rather than in memory, for accounts too
+    large to hold as PathTree nodes.  `root` is a StoreNode, and nodes are read
+    from the database as they are visited, with at most `cache_size` of them
+    kept in an LRU cache; the root is always kept.
+
+    The tree is filled with bulk_insert, which takes the (path, meta) pairs of
+    PathTree.bulk_insert, and is otherwise read-only.
+    """
+
+    def __init__(self, db_path, cache_size=CACHE_SIZE, reset=False):
+        if reset:
+            remove_database(db_path)
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        self.db.executescript(SCHEMA)
+        self._create_indexes()
+        try:
+            self.db.execute(NAME_SEARCH)
+            self.name_search = True
+        except sqlite3.OperationalError:
+            self.name_search = False
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        row = self._row(ROOT_ID)
+        if row is None:
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO nodes (id, parent_id, name, path_lower, depth) VALUES (?, NULL, '/', '/', 0)",
+                    (ROOT_ID,))
+            row = self._row(ROOT_ID)
+        self.root = StoreNode(self, row)
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM nodes').fetchone()[0]
+
+    def close(self):
+        self.cache.clear()
+        self.db.close()
+
+    def _row(self, node_id):
+        return self.db.execute('SELECT {} FROM nodes WHERE id = ?'.format(COLUMNS), (node_id,)).fetchone()
+
+    def _node(self, row):
+        """
+        The cached node for `row`, or a new one added to the cache.
+        """
+        node_id = row[0]
+        if node_id == ROOT_ID:
+            return self.root
+        node = self.cache.get(node_id)
+        if node is not None:
+            self.cache.move_to_end(node_id)
+            return node
+        node = self.cache[node_id] = StoreNode(self, row)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return node
+
+    def _nodes(self, query, args):
+        return [self._node(row) for row in self.db.execute(query, args)]
+
+    def node(self, node_id):
+        if node_id == ROOT_ID:
+            return self.root
+        node = self.cache.get(node_id)
+        if node is not None:
+            self.cache.move_to_end(node_id)
+            return node
+        row = self._row(node_id)
+        return self._node(row) if row is not None else None
+
+    def children(self, node_id):
+        return self._nodes('SELECT {} FROM nodes WHERE parent_id = ? ORDER BY id'.format(COLUMNS), (node_id,))
+
+    def child(self, node_id, name):
+        row = self.db.execute(
+            'SELECT {} FROM nodes WHERE parent_id = ? AND name = ?'.format(COLUMNS), (node_id, name)).fetchone()
+        return self._node(row) if row is not None else None
+
+    def has_children(self, node_id):
+        return self.db.execute('SELECT 1 FROM nodes WHERE parent_id = ? LIMIT 1', (node_id,)).fetchone() is not None
+
+    def nodes_by_path_lower(self, path_lower):
+        return self._nodes('SELECT {} FROM nodes WHERE path_lower = ? ORDER BY id'.format(COLUMNS), (path_lower,))
+
+    def _state(self, key):
+        row = self.db.execute('SELECT value FROM store_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_state(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO store_state (key, value) VALUES (?, ?)', (key, value))
+
+    def _index_names(self):
+        with self.db:
+            self.db.execute("INSERT INTO name_search (name_search) VALUES ('rebuild')")
+            self._set_state('name_search', 'ready')
+
+    @STATS.timed('store.search')
+    def search(self, target, exact=False):
+        if exact:
+            return self._nodes('SELECT {} FROM nodes WHERE name = ?'.format(COLUMNS), (target,))
+        if self.name_search and len(target) >= 3:
+            if self._state('name_search') == 'stale':
+                self._index_names()
+            query = (
+                'SELECT {} FROM nodes WHERE id IN (SELECT rowid FROM name_search WHERE name_search MATCH ?)'
+            ).format(COLUMNS)
+            return self._nodes(query, ('"{}"'.format(target.replace('"', '""')),))
+        return self._nodes('SELECT {} FROM nodes WHERE instr(name, ?) > 0'.format(COLUMNS), (target,))
+
+    @STATS.timed('store.bulk_insert')
+    def bulk_insert(self, entries):
+        """
+        Insert an iterable of (path, meta) pairs, as PathTree.bulk_insert does,
+        and return the number of entries processed.  Paths are taken from the
+        root.  Missing parents are created, and parents that were listed as
+        files become folders.  Folder totals and the lookup indexes are brought
+        up to date once all the entries are in.
+        """
+        # Recently used parent paths -> (id, depth), so runs of siblings don't look their parent up again
+        parents = OrderedDict()
+        count = 0
+        with self.db:
+            for name in LOOKUP_INDEXES:
+                self.db.execute('DROP INDEX IF EXISTS {}'.format(name))
+            for node_path, meta in entries:
+                if not node_path.startswith('/'):
+                    node_path = '/' + node_path
+                node_path = node_path.rstrip('/')
+                if not node_path:
+                    continue
+                head, _, name = node_path.rpartition('/')
+                parent_id, depth = self._parent(head or '/', parents)
+                if meta is None:
+                    self._get_or_create(parent_id, name, node_path, depth + 1)
+                else:
+                    self._upsert(parent_id, name, node_path, depth + 1, meta)
+                    if meta.get('type') != 'folder':
+                        parents.pop(node_path, None)
+                count += 1
+            self._create_indexes()
+            self._update_totals()
+            self._set_state('name_search', 'stale')
+        self.db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self._refresh()
+        STATS.add('tree entries', count)
+        return count
+
+    def _create_indexes(self):
+        for name, columns in LOOKUP_INDEXES.items():
+            self.db.execute('CREATE INDEX IF NOT EXISTS {} ON {}'.format(name, columns))
+
+    def _parent(self, path, parents):
+        """
+        (id, depth) of the folder at `path`, creating it and any missing
+        parents, and turning it into a folder if it was listed as a file.
+        """
+        if path == '/':
+            return ROOT_ID, 0
+        found = parents.get(path)
+        if found is not None:
+            parents.move_to_end(path)
+            return found
+        head, _, name = path.rpartition('/')
+        parent_id, depth = self._parent(head or '/', parents)
+        found = parents[path] = self._get_or_create(parent_id, name, path, depth + 1, 'folder'), depth + 1
+        if len(parents) > PARENT_CACHE_SIZE:
+            parents.popitem(last=False)
+        return found
+
+    def _get_or_create(self, parent_id, name, path, depth, kind=None):
+        """
+        Id of the child `name` of `parent_id`, created if missing.  An existing
+        node is changed to `kind` unless that is None.
+        """
+        row = self.db.execute(
+            'SELECT id, type FROM nodes WHERE parent_id = ? AND name = ?', (parent_id, name)).fetchone()
+        if row is None:
+            return self.db.execute(
+                'INSERT INTO nodes (parent_id, name, path_lower, depth, type) VALUES (?, ?, ?, ?, ?)',
+                (parent_id, name, path.lower(), depth, kind)).lastrowid
+        node_id, current = row
+        if kind is not None and current != kind:
+            self.db.execute(
+                'UPDATE nodes SET type = ?, size = NULL, modified = NULL, content_hash = NULL WHERE id = ?',
+                (kind, node_id))
+        return node_id
+
+    def _upsert(self, parent_id, name, path, depth, meta):
+        kind = meta.get('type')
+        size = meta.get('size')
+        values = (
+            parent_id, name, path.lower(), depth, kind,
+            size if isinstance(size, int) else None, meta.get('modified') or None, meta.get('id') or None,
+            meta.get('content_hash'),
+        )
+        self.db.execute(
+            'INSERT INTO nodes (parent_id, name, path_lower, depth, type, size, modified, dropbox_id, content_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (parent_id, name) DO UPDATE SET type = excluded.type, size = excluded.size, '
+            'modified = excluded.modified, dropbox_id = excluded.dropbox_id, content_hash = excluded.content_hash',
+            values)
+
+    def _update_totals(self):
+        """
+        Recompute every node's total_size and total_files, one depth at a time
+        from the deepest, each level adding its totals to its parents.
+        """
+        self.db.execute(
+            "UPDATE nodes SET total_size = CASE WHEN type = 'file' THEN COALESCE(size, 0) ELSE 0 END, "
+            "total_files = type IS 'file'")
+        deepest = self.db.execute('SELECT MAX(depth) FROM nodes').fetchone()[0] or 0
+        for depth in range(deepest, 0, -1):
+            self.db.execute(
+                'UPDATE nodes SET total_size = nodes.total_size + level.size, '
+                'total_files = nodes.total_files + level.files '
+                'FROM (SELECT parent_id, SUM(total_size) AS size, SUM(total_files) AS files '
+                '      FROM nodes WHERE depth = ? GROUP BY parent_id) AS level '
+                'WHERE nodes.id = level.parent_id',
+                (depth,))
+
+    def _refresh(self):
+        # Cached nodes may hold metadata and totals from before the last insert
+        self.cache.clear()
+        self.root._load(self._row(ROOT_ID))
@@ -1,130 +1,203 @@
-import argparse
-from contextlib import redirect_stdout
-from io import StringIO
-import itertools
-import threading
-import time
-import sys
+import asyncio
 
 import dropbox
 
-from exceptions import ParserError
+from cli_utils import wait_animation
+from meta import FileMeta, FolderMeta
+from stats import STATS
+from transport import Transport
 from tree import PathTree
-
-
-def wait_animation(func):
-    def wrapper(*args, **kwargs):
-        done = False
-        pulse = (
-            '[-------]', '[⌃------]', '[⌄^-----]', '[-⌄^----]',
-            '[--⌄^---]', '[---⌄^--]', '[----⌄^-]', '[-----⌄^]',
-            '[------⌄]'
-        )
-
-        def animate():
-            for c in itertools.cycle(pulse):
-                if done:
-                    break
-                sys.stdout.write('\rloading ' + c)
-                sys.stdout.flush()
-                time.sleep(0.1)
-
-        t = threading.Thread(target=animate)
-        t.start()
-        result = func(*args, **kwargs)
-        done = True
-        sys.stdout.write('\n')
-        return result
-    return wrapper
-
-
-class Parser(argparse.ArgumentParser):
-
-    def error(self, message):
-        print(message, '\n')
-        self.print_help()
-        raise ParserError(message)
-
-    def exit(self, *args, **kwargs):
-        pass
-
-
-class cached_property:
-    """
-    A property that is only computed once per instance and then replaces itself
-    with an ordinary attribute. Deleting the attribute resets the property.
-    Source: https://github.com/bottlepy/bottle/commit/fa7733e075da0d790d809aa3d2f53071897e6f76
-    """  # noqa
-
-    def __init__(self, func):
-        self.__doc__ = getattr(func, '__doc__')
-        self.func = func
-
-    def __get__(self, obj, cls):
-        if obj is None:
-            return self
-        value = obj.__dict__[self.func.__name__] = self.func(obj)
-        return value
+import tree_cache
 
 
 class DropboxUtils:
 
-    def __init__(self, token=None, client=None, root=None):
+    def __init__(self, token=None, client=None, root=None, keep_pages=False, list_workers=1, transport=None):
         self.root = root
-        self.client = client or dropbox.Dropbox(token)
+        self.token = token
+        self.transport = transport or Transport(token=token, client=client)
+        self.client = self.transport.client
+        self.keep_pages = keep_pages
+        # More than one worker lists the top-level folders concurrently
+        self.list_workers = list_workers
+        self.pages = []
+        self.cursor = None
 
     def do_process(self, delta_response):
         return (delta_response is None) or delta_response.has_more
 
     def get_changes(self, cursor):
-        if cursor is None:
-            root = self.root if self.root else ''
-            return self.client.files_list_folder(root, recursive=True)
-        return self.client.files_list_folder_continue(cursor)
-
-    def get_cursor(self, delta_response):
-        if delta_response:
-            return delta_response.cursor
-        return None
-
-    def get_all_files(self):
+        with STATS.timer('listing'):
+            if cursor is None:
+                root = self.root if self.root else ''
+                response = self.client.files_list_folder(root, recursive=True)
+            else:
+                response = self.client.files_list_folder_continue(cursor)
+        self._count_page(response)
+        return response
+
+    @staticmethod
+    def _count_page(response):
+        STATS.add('pages')
+        STATS.add('entries', len(response.entries))
+
+    def get_all_files(self, cursor=None):
         delta_response = None
         while self.do_process(delta_response):
-            cursor = self.get_cursor(delta_response)
             delta_response = self.get_changes(cursor)
+            cursor = self.cursor = delta_response.cursor
             yield delta_response
 
-    @wait_animation
+    def list_folder_pages(self, path, recursive=False):
+        """
+        Yield the pages of a single listing of `path`, following has_more.
+        Unlike get_all_files this leaves self.cursor alone.
+        """
+        with STATS.timer('listing'):
+            response = self.client.files_list_folder(path, recursive=recursive)
+        self._count_page(response)
+        yield response
+        while response.has_more:
+            with STATS.timer('listing'):
+                response = self.client.files_list_folder_continue(response.cursor)
+            self._count_page(response)
+            yield response
+
+    def list_folder(self, path, recursive=False):
+        for response in self.list_folder_pages(path, recursive=recursive):
+            yield from response.entries
+
+    @STATS.timed('tree build')
     def get_tree(self):
+        if self.list_workers > 1:
+            return self.get_tree_sharded(self.list_workers)
         tree = PathTree(root=True)
-        for response in self.contents:
-            for entry in response.entries:
-                tree.insert_path(entry.path_display)
-                node = tree.find_path(entry.path_display)
-                if isinstance(entry, dropbox.files.FileMetadata):
-                    node.meta = {
-                        'type': 'file',
-                        'id': entry.id,
-                        'modified': entry.server_modified,
-                        'size': entry.size
-                    }
-                if isinstance(entry, dropbox.files.FolderMetadata):
-                    node.meta = {
-                        'type': 'folder',
-                        'id': entry.id
-                    }
+        entries = (entry for response in self.iter_pages() for entry in response.entries)
+        tree.bulk_insert((entry.path_display, self.get_meta(entry)) for entry in entries)
         return tree
 
-    @cached_property
-    def contents(self):
-        return list(self.get_all_files())
+    def get_tree_sharded(self, workers):
+        """
+        List the root without recursion, then list each top-level folder
+        recursively, up to `workers` at a time, inserting pages as they arrive.
+
+        The cursor for later refreshes is taken for the whole root before any
+        shard starts.  Replaying changes since then over the shards' listings
+        gives the current state, so one cursor serves the snapshot and the
+        watcher as it does for the sequential listing.
+        """
+        root = self.root or ''
+        self.cursor = self.client.files_list_folder_get_latest_cursor(root, recursive=True).cursor
+        tree = PathTree(root=True)
+        folders = []
+        for entry in self.list_folder(root):
+            if isinstance(entry, dropbox.files.FolderMetadata):
+                folders.append(entry.path_lower)
+            tree.insert_path(entry.path_display).meta = self.get_meta(entry)
+        self.transport.run(self._list_shards(tree, folders, workers))
+        return tree
 
+    async def _list_shards(self, tree, folders, workers):
+        # Pages are inserted on the event loop thread, so the tree needs no lock
+        limit = asyncio.Semaphore(workers)
+
+        async def list_page(method, *args, **kwargs):
+            # Each page request is timed on its own, as in list_folder_pages
+            with STATS.timer('listing'):
+                return await self.transport.call(method, *args, **kwargs)
+
+        async def list_shard(path):
+            async with limit:
+                response = await list_page('files_list_folder', path, recursive=True)
+                while True:
+                    self._count_page(response)
+                    if self.keep_pages:
+                        self.pages.append(response)
+                    tree.bulk_insert((entry.path_display, self.get_meta(entry)) for entry in response.entries)
+                    if not response.has_more:
+                        break
+                    response = await list_page('files_list_folder_continue', response.cursor)
+
+        await asyncio.gather(*(list_shard(path) for path in folders))
 
-def set_docstring_from_parser(parser):
-    def wrapper(func):
-        out = StringIO()
-        with redirect_stdout(out):
-            parser().print_help()
-        func.__doc__ = out.getvalue()
-        return func
-    return wrapper
+    @wait_animation
+    @STATS.timed('tree load')
+    def load_tree(self, use_cache=True):
+        """
+        Build the tree from the local snapshot plus the changes since its cursor,
+        falling back to a full listing when there is no snapshot or the cursor
+        has expired.
+        """
+        cache_file = tree_cache.cache_file(self.root, self.token)
+        snapshot = tree_cache.load_snapshot(cache_file) if use_cache else None
+        tree = None
+        if snapshot is not None:
+            tree, cursor = snapshot
+            try:
+                self.refresh(tree, cursor)
+            except dropbox.exceptions.ApiError as e:
+                if not self.is_reset_error(e):
+                    raise
+                tree = None
+        if tree is None:
+            tree = self.get_tree()
+        if use_cache:
+            tree_cache.save_snapshot(cache_file, tree, self.cursor)
+        return tree
+
+    def refresh(self, tree, cursor):
+        for response in self.get_all_files(cursor):
+            self.apply_changes(tree, response.entries)
+        return tree
+
+    def apply_changes(self, tree, entries):
+        """
+        Apply listing entries to `tree`.  Entries are placed by path_lower, as
+        only the last component of path_display is reliably cased, so a parent
+        whose case differs in the entry doesn't grow a second copy of itself.
+        """
+        for entry in entries:
+            if isinstance(entry, dropbox.files.DeletedMetadata):
+                node = tree.find_path_lower(entry.path_lower)
+                if node is not None and not node.is_root:
+                    node.remove()
+                continue
+            head = entry.path_lower.rpartition('/')[0]
+            parent = tree.find_path_lower(head or '/')
+            if parent is None:
+                parent = tree.insert_path(entry.path_display.rpartition('/')[0] or '/')
+            node = parent.find_path_lower(entry.name)
+            if node is None:
+                node = parent.insert_path(entry.name)
+            elif node.value != entry.name:
+                node.move_to(parent, entry.name)  # Renamed by case only
+            node.meta = self.get_meta(entry)
+
+    @staticmethod
+    def is_reset_error(error):
+        route_error = getattr(error, 'error', None)
+        reset_types = (dropbox.files.ListFolderContinueError, dropbox.files.ListFolderLongpollError)
+        return isinstance(route_error, reset_types) and route_error.is_reset()
+
+    def iter_pages(self):
+        """
+        Stream listing pages so each one can be dropped once its entries are in
+        the tree.  With keep_pages set they are also collected in self.pages.
+        """
+        for response in self.get_all_files():
+            if self.keep_pages:
+                self.pages.append(response)
+            yield response
+
+    @staticmethod
+    def get_meta(entry):
+        if isinstance(entry, dropbox.files.FileMetadata):
+            return FileMeta(
+                id=entry.id,
+                modified=entry.server_modified,
+                size=entry.size,
+                content_hash=entry.content_hash
+            )
+        if isinstance(entry, dropbox.files.FolderMetadata):
+            return FolderMeta(id=entry.id)
+        return None
@@ -0,0 +1,59 @@
+import sys
+import threading
+
+
+class TreeWatcher(threading.Thread):
+    """
+    Keep a live PathTree in step with the account.
+
+    Blocks on files_list_folder_longpoll with the DropboxUtils cursor and, when
+    changes are reported, fetches them with files_list_folder_continue and
+    applies each page to the tree while holding `lock`.  Errors are retried
+    after `retry_delay` seconds, except an expired cursor, which stops the
+    watcher with a notice on stderr.
+    """
+
+    def __init__(self, dbutil, tree, lock, timeout=30, retry_delay=5):
+        assert dbutil.cursor is not None, 'Tree must be listed before it can be watched'
+        super().__init__(name='tree-watcher', daemon=True)
+        self.dbutil = dbutil
+        self.tree = tree
+        self.lock = lock
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.error = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def run(self):
+        while not self.stopped:
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.error = e
+                if self.dbutil.is_reset_error(e):
+                    # An expired cursor can't be recovered without a full relist
+                    self.stop()
+                    sys.stderr.write('\nStopped watching for changes, the listing cursor expired; '
+                                     'restart to list the account again\n')
+                else:
+                    self._stopped.wait(self.retry_delay)
+
+    def poll_once(self):
+        result = self.dbutil.client.files_list_folder_longpoll(self.dbutil.cursor, timeout=self.timeout)
+        if result.changes:
+            self.apply_pending()
+        if result.backoff:
+            self._stopped.wait(result.backoff)
+        return result.changes
+
+    def apply_pending(self):
+        for response in self.dbutil.get_all_files(self.dbutil.cursor):
+            with self.lock:
+                self.dbutil.apply_changes(self.tree, response.entries)